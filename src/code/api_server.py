@@ -4,109 +4,523 @@ Flask API Server for Plant Talker Web UI
 Provides REST API and WebSocket for real-time updates
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, ConnectionRefusedError, emit, join_room
+import argparse
+import functools
+import gzip
+import hmac
+import json
+import math
+import multiprocessing
+import signal
+import socket
 import threading
 import time
 import sys
 import os
+import zlib
+from collections import OrderedDict
+from werkzeug.serving import make_server
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Add libs to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'libs'))
 
-from iot.libs.dht_sensor import DHTSensor
-from iot.libs.uart_handler import UARTHandler
-from iot.libs.led_controller import LEDController
-from iot.libs.button_handler import ButtonHandler
-from iot.libs.servo_controller import ServoController
-from iot.libs.system_state import SystemState
+from iot.libs.local_hardware import LocalHardware
+from iot.libs.system_state import RemoteSystemState, SharedSystemState
+from iot.libs.shared_state import SharedStateReader, DEFAULT_PATH as DEFAULT_STATE_SEGMENT
 from iot.libs.llm_interface import LLMInterface
+from iot.libs.sensor_recording import SensorRecorder, SensorReplay
+from iot.libs.health_monitor import HealthMonitor, llm_probe, hardware_probe
+from iot.libs.watchdog import Watchdog
+from iot.libs.hardware_ipc import (HardwareClient, RemoteServoController, RemoteLEDController, RemoteIrrigationLog,
+                                   RemoteScheduler, RemoteAlertEngine, HardwareError)
+from iot.libs.history_export import CONTENT_TYPES as EXPORT_CONTENT_TYPES, export as export_history, parse_time
+from iot.libs.knowledge_base import KnowledgeBase
+from iot.libs.rate_limiter import RateLimiter, AdmissionGate, load_limits
+from iot.libs.alerts import WebhookSink, FileSink
+from iot.libs.profiling import SamplingProfiler, LockTracer
+from iot.libs.event_bus import (EventBus, READING, STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED,
+                                BUTTON_PRESS, ALERT, CONFIG_RELOADED)
+
+
+
+class RawJSON:
+    """A value that is already JSON text, sent in Socket.IO packets as-is"""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class PacketJSON:
+    """json module for python-socketio that splices RawJSON arguments into
+    the packet instead of encoding them again"""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        if isinstance(obj, list) and any(isinstance(item, RawJSON) for item in obj):
+            return '[' + ','.join(
+                item.text if isinstance(item, RawJSON) else json.dumps(item, **kwargs) for item in obj
+            ) + ']'
+        return json.dumps(obj, **kwargs)
+
+    loads = staticmethod(json.loads)
+
+
+class FrameCache:
+    """Encoded status_update frames for the latest state versions, so each
+    version is encoded once per format however many clients receive it"""
+
+    FORMATS = ('json', 'msgpack') if msgpack is not None else ('json',)
+
+    def __init__(self, size=4):
+        self.size = size
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.encodes = 0
+
+    def get(self, snapshot, fmt='json'):
+        key = (snapshot['version'], fmt)
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.hits += 1
+                return frame
+
+            if fmt == 'msgpack':
+                frame = msgpack.packb(snapshot['state'])
+            else:
+                frame = RawJSON(snapshot['payload'].decode('utf-8'))
+            self.encodes += 1
+            self.frames[key] = frame
+            while len(self.frames) > self.size * len(self.FORMATS):
+                self.frames.popitem(last=False)
+            return frame
+
+
+class ResponseCache:
+    """Encoded bodies of recent cacheable responses keyed by ETag, with their
+    compressed variants, so repeat requests for an unchanged resource skip the
+    query, the JSON encoding and the compression"""
+
+    ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def __init__(self, size=16):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.compressions = 0
+
+    def get(self, tag, build, encoding=None):
+        with self.lock:
+            entry = self.entries.get(tag)
+            if entry is None:
+                entry = {None: build()}
+                self.builds += 1
+                self.entries[tag] = entry
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.move_to_end(tag)
+                self.hits += 1
+
+            body = entry.get(encoding)
+            if body is None:
+                if encoding == 'br':
+                    body = brotli.compress(entry[None], quality=5)
+                else:
+                    body = gzip.compress(entry[None], compresslevel=6)
+                self.compressions += 1
+                entry[encoding] = body
+            return body
+
 
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=False, engineio_logger=False)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=False, engineio_logger=False,
+                    json=PacketJSON)
+frame_cache = FrameCache()
+response_cache = ResponseCache()
+
+# Token buckets per client IP, plus concurrency caps for the routes that
+# hold a thread for seconds; cheap reads only pass the 'default' bucket
+rate_limiter = RateLimiter()
+chat_gate = AdmissionGate('chat', max_active=1, max_waiting=2, timeout=30.0, retry_after=5.0)
+irrigation_gate = AdmissionGate('irrigation', max_active=1, max_waiting=1, timeout=60.0, retry_after=10.0)
+
+# Socket.IO clients that asked for MessagePack frames (?format=msgpack)
+msgpack_clients = set()
+
+# Started on demand from /api/admin/profile; samples every thread of this process
+profiler = SamplingProfiler()
+# Bearer token for the /api/admin routes; without it they only answer the Pi itself
+ADMIN_TOKEN_ENV = 'PLANTTALKER_ADMIN_TOKEN'
 
 # Global system instance
 plant_system = None
 broadcast_thread = None
 
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'iot', 'knowledge')
+
+# Longest a long-poll or an idle event stream holds a request open
+LONG_POLL_TIMEOUT = 30
+STREAM_KEEPALIVE = 15
+# Plain /api/status reuses the latest encoded version while it is this fresh
+STATUS_MAX_AGE = 2
+
+# Part of every ETag: versions restart from zero with the process, so a tag
+# from before a restart must never match
+ETAG_EPOCH = '%x' % int(time.time())
+# Smaller bodies are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+# A worker that keeps failing at startup is retried this often, not in a tight loop
+WORKER_RESTART_DELAY = 5
+# Socket.IO transports served with --workers; clients must connect with these
+WORKER_TRANSPORTS = ['websocket']
+
+
+def not_modified(tag):
+    """304 response if the client already holds representation `tag`"""
+    if not request.if_none_match.contains_weak(tag):
+        return None
+    response = Response(status=304)
+    response.set_etag(tag, weak=True)
+    return response
+
+
+def cacheable_response(tag, build, cache_control):
+    """JSON response for representation `tag`, built by build() only when it
+    is not cached yet and compressed when large and the client accepts it"""
+    response = not_modified(tag)
+    if response is None:
+        body = response_cache.get(tag, build)
+        encoding = None
+        if len(body) >= COMPRESS_MIN_SIZE:
+            encoding = request.accept_encodings.best_match(ResponseCache.ENCODINGS)
+            if encoding:
+                body = response_cache.get(tag, build, encoding)
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(tag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def too_many_requests(message, retry_after):
+    response = jsonify({'success': False, 'error': message, 'retry_after': round(retry_after, 2)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limited(rule, gate=None):
+    """Limit a route with the client's token bucket for `rule` and, for
+    expensive routes, an admission gate held while the view runs"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            retry_after = rate_limiter.check(rule, request.remote_addr)
+            if retry_after:
+                return too_many_requests(f"Rate limit exceeded for {rule} requests", retry_after)
+            if gate is None:
+                return view(*args, **kwargs)
+            if not gate.acquire():
+                return too_many_requests(f"Too many {gate.name} requests in progress", gate.retry_after)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release()
+        return wrapper
+    return decorator
+
+
+def admin_only(view):
+    """Allow a route with the admin bearer token, or from the Pi itself
+    while no token is configured"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.environ.get(ADMIN_TOKEN_ENV)
+        if token:
+            allowed = hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                                          f'Bearer {token}'.encode('utf-8'))
+        else:
+            allowed = request.remote_addr in ('127.0.0.1', '::1')
+        if not allowed:
+            return jsonify({'success': False, 'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def json_body(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
 
 class PlantTalkerAPI:
-    def __init__(self):
+    def __init__(self, recorder=None, replay=None, dht_device=None, serial_port=None, llm_client=None,
+                 fast_start=False, self_test=True, state_dir=None, irrigation_profiles=None, knowledge_dir=None,
+                 hardware_socket=None, state_segment=None, worker=None, alert_rules=None, alert_sinks=None):
         print("[API] Initializing Plant Talker API...")
 
-        self.dht_sensor = DHTSensor(read_interval=10)
-        self.uart_handler = UARTHandler(read_interval=1)
-        self.led_controller = LEDController()
-        self.button_handler = ButtonHandler()
-        self.servo_controller = ServoController()
-        self.system_state = SystemState()
-        self.llm_interface = LLMInterface(self.system_state)
-
-        self.system_state.set_components(
-            self.dht_sensor,
-            self.uart_handler,
-            self.led_controller,
-            self.button_handler,
-            self.servo_controller
-        )
+        self.init_started = time.time()
+        self.ready_time = None
+        self.recorder = recorder
+        self.replay = replay
+        self.hardware = None
+        self.local = None
+        self.state_reader = None
+        self.worker = worker
+        self.state_dir = state_dir
+        self.journal = None
+        self.irrigation_log = None
+        self.history_store = None
+        self.alert_outbox = None
+        # Components publish on the bus; the LEDs, logger, stores and
+        # WebSocket broadcast subscribe to it
+        self.event_bus = EventBus()
+        self.health_monitor = HealthMonitor()
+        # Restarts stalled or dead worker loops and reopens failed devices
+        self.watchdog = Watchdog()
 
-        self.button_handler.set_callback(self._on_button_pressed)
+        if hardware_socket:
+            self._connect_hardware(hardware_socket, state_segment)
+        else:
+            self._create_hardware(dht_device, serial_port, fast_start, self_test, state_dir, irrigation_profiles,
+                                  alert_rules, alert_sinks)
+
+        self.llm_interface = LLMInterface(self.system_state, client=llm_client)
+        self.llm_interface.set_event_bus(self.event_bus)
+
+        # Plant-care notes retrieved into chat prompts
+        self.knowledge_base = None
+        if knowledge_dir:
+            # Workers index into files of their own rather than contend for one
+            index_name = f'knowledge-{worker}.db' if worker else 'knowledge.db'
+            index_path = os.path.join(state_dir, index_name) if state_dir else ':memory:'
+            self.knowledge_base = KnowledgeBase(index_path)
+            self.knowledge_base.sync(knowledge_dir)
+            self.llm_interface.set_knowledge_base(self.knowledge_base)
+
+        self.health_monitor.add_probe('llm', llm_probe(self.llm_interface), interval=30, critical=False)
         self.running = False
 
-        print("[API] System initialized")
-
-    def _on_button_pressed(self):
-        print("[API] Button pressed - triggering irrigation check")
-        time.sleep(0.2)
-        
-        state = self.system_state.get_full_state()
-        soil_moisture = state['soil_moisture']
-        
-        if soil_moisture is None:
-            time.sleep(2)
-            state = self.system_state.get_full_state()
-            soil_moisture = state['soil_moisture']
-        
-        if soil_moisture is not None and soil_moisture > 0:
-            # Update LEDs before irrigation
-            print(f"[API] Updating LEDs for moisture: {soil_moisture}%")
-            self.led_controller.update_leds(soil_moisture)
-            
-            result = self.servo_controller.irrigate()
-            print(f"[API] Irrigation triggered: {result}")
-            
-            # Broadcast irrigation event
-            socketio.emit('irrigation_event', {
-                'timestamp': time.time(),
-                'moisture': soil_moisture,
-                'success': result
-            })
+        # Component locks, traced on demand from /api/admin/locks
+        self.lock_tracer = LockTracer()
+        for name, component, attribute in (('system_state', self.system_state, 'lock'),
+                                           ('servo', self.servo_controller, 'lock'),
+                                           ('servo_motion', self.servo_controller, 'motion_lock'),
+                                           ('llm', self.llm_interface, 'lock'),
+                                           ('uart', self.uart_handler, 'lock'),
+                                           ('dht', self.dht_sensor, 'lock')):
+            # Thin clients have no local servo, UART or DHT lock
+            if hasattr(component, attribute):
+                self.lock_tracer.register(name, component, attribute)
+
+        if self.replay:
+            self.replay.attach(self.uart_handler, self.dht_sensor, self.button_handler)
+
+        print(f"[API] System initialized in {time.time() - self.init_started:.2f}s")
+
+    def _create_hardware(self, dht_device, serial_port, fast_start, self_test, state_dir, irrigation_profiles,
+                         alert_rules, alert_sinks):
+        """Drive the sensors, LEDs, button and valve from this process"""
+        if self.replay:
+            dht_device = self.replay.dht_device
+            serial_port = self.replay.serial_port
+
+        # Sample and broadcast faster while irrigating or when readings move,
+        # back off while they are flat
+        self.local = LocalHardware.create(self.event_bus, dht_device=dht_device, serial_port=serial_port,
+                                          recorder=self.recorder, self_test=self_test,
+                                          irrigation_profiles=irrigation_profiles, fast_start=fast_start,
+                                          state_dir=state_dir, alert_rules=alert_rules,
+                                          on_sampling_mode=self._on_sampling_mode)
+        # Alert notifications reach the WebSocket clients through the bus
+        self.local.add_alert_outbox(os.path.join(state_dir, 'alerts.db') if state_dir else ':memory:',
+                                    alert_sinks or ())
+        self.local.expose(self)
+
+        self.local.add_probes(self.health_monitor)
+        if not self.replay:
+            # Replayed readings do not come from the handlers' own loops
+            self.local.watch(self.watchdog)
+
+    def _connect_hardware(self, socket_path, state_segment=None):
+        """Thin client of the hardware daemon: state, events and commands
+        go over its socket and the devices stay in the daemon's process.
+        With state_segment, state reads come from the daemon's shared memory."""
+        name = f'api-worker-{self.worker}' if self.worker else 'api-server'
+        self.hardware = HardwareClient(socket_path, name=name)
+        self.hardware.connect(wait=10)
+        self.hardware.set_event_bus(self.event_bus)
+        self.hardware.subscribe((READING, STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS, ALERT,
+                                 CONFIG_RELOADED))
+
+        self.dht_sensor = None
+        self.uart_handler = None
+        self.button_handler = None
+        self.led_controller = RemoteLEDController(self.hardware)
+        self.servo_controller = RemoteServoController(self.hardware)
+        # Also refreshes the profiles /api/irrigate checks against after a daemon reload
+        self.event_bus.subscribe_callback(self.servo_controller.handle_event,
+                                          types=(IRRIGATION_FINISHED, CONFIG_RELOADED), name='irrigation-callbacks')
+        self.irrigation_log = RemoteIrrigationLog(self.hardware)
+        self.event_bus.subscribe_callback(self.irrigation_log.handle_event, types=(IRRIGATION_FINISHED,),
+                                          name='irrigation-log-version')
+        self.scheduler = RemoteScheduler(self.hardware)
+        # Rules are evaluated once, in the daemon; its alerts arrive as events
+        self.alert_engine = RemoteAlertEngine(self.hardware)
+        if state_segment:
+            self.state_reader = SharedStateReader(state_segment)
+            self.system_state = SharedSystemState(lambda: self.hardware.call('get_state'), self.state_reader.read)
+        else:
+            self.system_state = RemoteSystemState(lambda: self.hardware.call('get_state'))
+        self.system_state.set_event_bus(self.event_bus)
+        # The daemon already paces readings to its sampling mode
+        self.broadcast_interval = 0.5
+        self.health_monitor.add_probe('hardware', hardware_probe(self.hardware), interval=5)
+
+    def _on_sampling_mode(self, mode, intervals):
+        self.broadcast_interval = intervals['broadcast']
 
     def start(self):
         print("[API] Starting system components...")
-        self.dht_sensor.start()
-        self.uart_handler.start()
-        self.button_handler.start()
+        if self.hardware:
+            # The daemon runs the devices
+            pass
+        elif self.replay:
+            # Replayed readings are pushed straight into the handlers
+            self.replay.start()
+        else:
+            self.dht_sensor.start()
+            self.uart_handler.start()
+        if self.button_handler:
+            self.button_handler.start()
+        if self.journal:
+            self.journal.start()
+        if self.alert_outbox:
+            self.alert_engine.start()
+            self.alert_outbox.start()
+        self.health_monitor.start()
+        self.watchdog.start()
         self.running = True
         print("[API] All components started")
 
     def stop(self):
         print("[API] Stopping system components...")
         self.running = False
-        self.dht_sensor.stop()
-        self.uart_handler.stop()
-        self.button_handler.stop()
-        self.led_controller.cleanup()
+        # Park the valve first: a running cycle is cut short with the valve
+        # closed, and no new one starts while the rest shuts down
         self.servo_controller.cleanup()
+        if self.button_handler:
+            self.button_handler.stop()
+        self.watchdog.stop()
+        self.health_monitor.stop()
+        if self.hardware:
+            self.hardware.close()
+        elif self.replay:
+            self.replay.stop()
+        else:
+            self.dht_sensor.stop()
+            self.uart_handler.stop()
+        self.led_controller.cleanup()
+        self.event_bus.close()
+        if self.alert_outbox:
+            self.alert_engine.stop()
+            self.alert_outbox.stop()
+        if self.journal:
+            self.journal.stop()
+        if self.irrigation_log:
+            self.irrigation_log.close()
+        if self.history_store:
+            self.history_store.close()
+        if self.knowledge_base:
+            self.knowledge_base.close()
+        if self.recorder:
+            self.recorder.close()
         print("[API] System stopped")
 
+    def reload(self):
+        """Re-read the irrigation profiles and alert rules; the devices stay
+        open. A file that does not load keeps its previous settings."""
+        if self.hardware:
+            # Profiles and alert rules live in the daemon
+            try:
+                self.hardware.call('reload')
+            except HardwareError as e:
+                print(f"[API] Could not reload the hardware daemon: {e}")
+            return
+        self.local.reload()
+
     def get_state(self):
         return self.system_state.get_full_state()
 
-    def irrigate(self):
-        return self.servo_controller.irrigate()
+    def get_readiness(self):
+        report = self.health_monitor.get_report()
+        if self.hardware:
+            # From the cached hardware probe; health checks never wait on the daemon
+            hardware = report['checks'].get('hardware', {})
+            uart_ready = hardware.get('soil_moisture_received', False)
+            dht_ready = hardware.get('temperature_received', False)
+        else:
+            uart_ready = self.uart_handler.first_data_event.is_set()
+            dht_ready = self.dht_sensor.first_data_event.is_set()
+        ready = self.running and uart_ready and dht_ready and report['ready']
+
+        if ready and self.ready_time is None:
+            self.ready_time = time.time()
+
+        return {
+            'ready': ready,
+            'running': self.running,
+            'soil_moisture_received': uart_ready,
+            'temperature_received': dht_ready,
+            'ready_after_s': self.ready_time - self.init_started if self.ready_time else None,
+            'checks': report['checks']
+        }
+
+    def get_liveness(self):
+        threads = {
+            'health_monitor': self.health_monitor.is_alive(),
+            'watchdog': self.watchdog.is_alive(),
+            'status_broadcast': broadcast_thread is not None and broadcast_thread.is_alive()
+        }
+        if self.hardware:
+            # Alive while reconnecting: a daemon restart is not a reason to restart this process
+            threads['hardware_client'] = self.hardware.thread is not None and self.hardware.thread.is_alive()
+        elif self.replay:
+            threads['replay'] = self.replay.thread is not None and self.replay.thread.is_alive()
+        else:
+            threads['dht_sensor'] = self.dht_sensor.thread is not None and self.dht_sensor.thread.is_alive()
+            threads['uart_handler'] = self.uart_handler.thread is not None and self.uart_handler.thread.is_alive()
+
+        return {
+            'alive': self.running and all(threads.values()),
+            'threads': threads
+        }
+
+    def irrigate(self, profile='standard', source='api'):
+        return self.servo_controller.irrigate(profile=profile, source=source)
+
+    def start_irrigation(self, profile='standard', source='api', on_complete=None):
+        return self.servo_controller.start_irrigation(profile=profile, source=source, on_complete=on_complete)
 
     def chat(self, message):
         return self.llm_interface.chat(message)
@@ -117,42 +531,123 @@ class PlantTalkerAPI:
 
 # REST API Endpoints
 
+@app.after_request
+def default_cache_control(response):
+    """Responses that did not choose a caching policy (health probes, chat,
+    irrigation commands) must not be stored"""
+    response.headers.setdefault('Cache-Control', 'no-store')
+    return response
+
+
 @app.route('/api/status', methods=['GET'])
+@rate_limited('default')
 def get_status():
-    """Get current system status"""
+    """Get current system status
+
+    With ?since=<version> this is a long-poll: the request blocks until a
+    state version other than <version> exists (204 after ?timeout seconds).
+    The ETag is the state version, so pollers sending If-None-Match get 304
+    while nothing changed.
+    """
     if plant_system is None:
         return jsonify({'error': 'System not initialized'}), 500
 
-    state = plant_system.get_state()
-    return jsonify({
-        'success': True,
-        'data': state,
-        'timestamp': time.time()
-    })
+    since = request.args.get('since', type=int)
+    if since is not None:
+        timeout = min(request.args.get('timeout', LONG_POLL_TIMEOUT, type=float), LONG_POLL_TIMEOUT)
+        snapshot = plant_system.system_state.wait_for_snapshot(since, timeout)
+        if snapshot is None:
+            return Response(status=204)
+    else:
+        snapshot = plant_system.system_state.get_snapshot(max_age=STATUS_MAX_AGE)
+
+    tag = f"status-{ETAG_EPOCH}-{snapshot['version']}"
+    response = not_modified(tag)
+    if response is None:
+        # Splice the shared encoding of this version into the envelope
+        body = b'{"success":true,"version":%d,"timestamp":%r,"data":%s}' % (
+            snapshot['version'], time.time(), snapshot['payload'])
+        response = Response(body, mimetype='application/json')
+        response.set_etag(tag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/stream', methods=['GET'])
+@rate_limited('default')
+def stream_status():
+    """Server-Sent Events stream of state versions
+
+    Resumes after the Last-Event-ID header (or ?since=) and sends a comment
+    as keep-alive while nothing changes.
+    """
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    system = plant_system
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('since', '0'))
+    version = int(last_event_id) if last_event_id.isdigit() else 0
+
+    def generate():
+        nonlocal version
+        while system.running:
+            snapshot = system.system_state.wait_for_snapshot(version, STREAM_KEEPALIVE)
+            if snapshot is None:
+                yield b': keep-alive\n\n'
+                continue
+            version = snapshot['version']
+            yield b'id: %d\nevent: status\ndata: %s\n\n' % (version, snapshot['payload'])
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/api/irrigate', methods=['POST'])
+@rate_limited('irrigate')
 def trigger_irrigation():
-    """Manually trigger irrigation"""
+    """Manually trigger irrigation
+
+    Optional JSON body: {"profile": "pulsed", "wait": false}. With wait=false
+    the cycle runs in the background and 202 is returned immediately.
+    """
     if plant_system is None:
         return jsonify({'error': 'System not initialized'}), 500
 
-    print("[API] Manual irrigation requested via API")
+    data = request.get_json(silent=True) or {}
+    profile = data.get('profile', 'standard')
+    wait = data.get('wait', True)
+
+    if profile not in plant_system.servo_controller.profiles:
+        return jsonify({'error': f"Unknown irrigation profile '{profile}'"}), 400
+
+    print(f"[API] Manual irrigation requested via API (profile: {profile})")
     
     # Update LEDs before irrigation
     state = plant_system.get_state()
     if state and state.get('soil_moisture') is not None:
         print(f"[API] Updating LEDs for moisture: {state['soil_moisture']}%")
         plant_system.led_controller.update_leds(state['soil_moisture'])
-    
-    result = plant_system.irrigate()
-    
-    # Broadcast to all clients
-    socketio.emit('irrigation_event', {
-        'timestamp': time.time(),
-        'manual': True,
-        'success': result
-    })
+
+    # Either way the result is broadcast from the irrigation_finished event
+    if not wait:
+        try:
+            job_id = plant_system.start_irrigation(profile=profile)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if job_id is None:
+            return jsonify({'success': False, 'message': 'Irrigation already in progress'}), 409
+        return jsonify({'success': True, 'job_id': job_id, 'message': 'Irrigation started'}), 202
+
+    # Waiting requests hold a server thread for the whole cycle
+    if not irrigation_gate.acquire():
+        return too_many_requests("Too many irrigation requests in progress", irrigation_gate.retry_after)
+    try:
+        result = plant_system.irrigate(profile=profile)
+    except ValueError as e:
+        # The profile was removed or made invalid by a reload since the check above
+        return jsonify({'error': str(e)}), 400
+    finally:
+        irrigation_gate.release()
 
     return jsonify({
         'success': result,
@@ -160,7 +655,142 @@ def trigger_irrigation():
     })
 
 
+# Not rate limited: stopping the water must always work
+@app.route('/api/irrigate/cancel', methods=['POST'])
+def cancel_irrigation():
+    """Cancel the running irrigation; {"emergency": true} closes the valve at once"""
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    data = request.get_json(silent=True) or {}
+    cancelled = plant_system.servo_controller.cancel(emergency=bool(data.get('emergency', False)))
+    return jsonify({
+        'success': cancelled,
+        'message': 'Irrigation cancelled' if cancelled else 'No irrigation in progress'
+    })
+
+
+@app.route('/api/irrigation/profiles', methods=['GET'])
+@rate_limited('default')
+def irrigation_profiles():
+    """List irrigation profiles and the valve calibration"""
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    # Thin clients keep the daemon's version, refreshed on config_reloaded
+    return cacheable_response(
+        f"profiles-{ETAG_EPOCH}-{plant_system.servo_controller.profiles_version}",
+        lambda: json_body({'success': True, 'data': plant_system.servo_controller.get_profiles()}),
+        'max-age=300'
+    )
+
+
+@app.route('/api/irrigations', methods=['GET'])
+@rate_limited('default')
+def list_irrigations():
+    """List irrigation cycles, newest first, paginated with ?before=<id>
+
+    Revalidated with the log's write version; large pages are compressed.
+    """
+    if plant_system is None or plant_system.irrigation_log is None:
+        return jsonify({'error': 'Irrigation log not available'}), 503
+
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        before = request.args.get('before', type=int)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    irrigation_log = plant_system.irrigation_log
+    source = request.args.get('source')
+
+    def build():
+        events, next_cursor = irrigation_log.list_events(limit=limit, before=before, source=source)
+        return json_body({
+            'success': True,
+            'data': events,
+            'next_cursor': next_cursor,
+            'timestamp': time.time()
+        })
+
+    query = zlib.crc32(repr((limit, before, source)).encode('utf-8'))
+    return cacheable_response(f"irrigations-{ETAG_EPOCH}-{irrigation_log.version}-{query:x}", build, 'no-cache')
+
+
+@app.route('/api/irrigations/stats', methods=['GET'])
+@rate_limited('default')
+def irrigation_stats():
+    """Aggregated irrigation statistics"""
+    if plant_system is None or plant_system.irrigation_log is None:
+        return jsonify({'error': 'Irrigation log not available'}), 503
+
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    irrigation_log = plant_system.irrigation_log
+    return cacheable_response(
+        f"irrigation-stats-{ETAG_EPOCH}-{irrigation_log.version}-{days}",
+        lambda: json_body({
+            'success': True,
+            'data': irrigation_log.get_stats(days=days),
+            'timestamp': time.time()
+        }),
+        'max-age=30'
+    )
+
+
+@app.route('/api/alerts', methods=['GET'])
+@rate_limited('default')
+def list_alerts():
+    """Firing alerts, most recent first, and alert engine counters"""
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    return jsonify({
+        'success': True,
+        'data': plant_system.alert_engine.get_alerts(),
+        'stats': plant_system.alert_engine.get_stats(),
+        'timestamp': time.time()
+    })
+
+
+@app.route('/api/export', methods=['GET'])
+@rate_limited('export')
+def export_data():
+    """Stream sensor readings or irrigation cycles as CSV, NDJSON or Arrow
+
+    Rows are read and encoded a page at a time, so memory use does not grow
+    with the export. Rows come in id order; ?after=<id> resumes after the
+    last complete row received.
+    """
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+    if not plant_system.state_dir:
+        return jsonify({'error': 'History not available'}), 503
+
+    table = request.args.get('table', 'readings')
+    fmt = request.args.get('format', 'csv')
+    fields = request.args.get('fields')
+    if plant_system.history_store and table == 'readings':
+        plant_system.history_store.flush()
+    try:
+        chunks = export_history(
+            plant_system.state_dir, table, fmt, fields.split(',') if fields else None,
+            parse_time(request.args.get('start')), parse_time(request.args.get('end')),
+            request.args.get('after', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': f'No {table} recorded yet'}), 404
+
+    return Response(chunks, mimetype=EXPORT_CONTENT_TYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{table}.{fmt}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/api/chat', methods=['POST'])
+@rate_limited('chat', gate=chat_gate)
 def chat():
     """Chat with LLM"""
     if plant_system is None:
@@ -183,6 +813,7 @@ def chat():
 
 
 @app.route('/api/chat/reset', methods=['POST'])
+@rate_limited('default')
 def reset_chat():
     """Reset chat conversation history"""
     if plant_system is None:
@@ -196,80 +827,446 @@ def reset_chat():
     })
 
 
+@app.route('/api/knowledge/reindex', methods=['POST'])
+@rate_limited('default')
+def reindex_knowledge():
+    """Re-index changed plant-care notes"""
+    if plant_system is None or plant_system.knowledge_base is None:
+        return jsonify({'error': 'Knowledge base not available'}), 503
+
+    return jsonify({
+        'success': True,
+        'data': plant_system.knowledge_base.sync()
+    })
+
+
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe: 200 while the worker threads are running"""
+    if plant_system is None:
+        return jsonify({'alive': True, 'reason': 'initializing', 'timestamp': time.time()})
+
+    liveness = plant_system.get_liveness()
+    liveness['timestamp'] = time.time()
+    return jsonify(liveness), 200 if liveness['alive'] else 503
+
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once sensor data has arrived and cached probes pass"""
+    if plant_system is None:
+        return jsonify({'ready': False, 'reason': 'initializing', 'timestamp': time.time()}), 503
+
+    readiness = plant_system.get_readiness()
+    readiness['timestamp'] = time.time()
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    readiness = plant_system.get_readiness() if plant_system else {'ready': False, 'checks': {}}
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if readiness['ready'] else 'degraded',
         'running': plant_system.running if plant_system else False,
+        'checks': readiness['checks'],
+        'rate_limits': rate_limiter.get_stats(),
+        'admission': {gate.name: gate.get_stats() for gate in (chat_gate, irrigation_gate)},
+        'sampling': plant_system.scheduler.get_stats() if plant_system else None,
+        'worker': {'number': plant_system.worker, 'pid': os.getpid()} if plant_system and plant_system.worker else None,
+        'state_segment': plant_system.state_reader.get_stats() if plant_system and plant_system.state_reader else None,
+        'watchdog': plant_system.watchdog.get_stats() if plant_system else None,
         'timestamp': time.time()
     })
 
 
+def profiling_call(local, command, *args):
+    """Run local(*args) here, or the daemon command with ?process=daemon"""
+    if request.args.get('process') == 'daemon':
+        if plant_system.hardware is None:
+            raise ValueError("Not connected to a hardware daemon")
+        return plant_system.hardware.call(command, *args)
+    return local(*args)
+
+
+def collapsed_response(profile):
+    response = Response(profile['collapsed'], mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(profile['stats']['samples'])
+    response.headers['X-Profile-Running'] = 'true' if profile['stats']['running'] else 'false'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_only
+def start_profile():
+    """Sample all thread stacks for `seconds` (default 10) every `interval` s"""
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = min(max(float(data.get('seconds', 10)), 0.1), 600)
+        interval = min(max(float(data.get('interval', 0.01)), 0.001), 1.0)
+        started = profiling_call(profiler.start, 'start_profile', seconds, interval)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if not started:
+        return jsonify({'success': False, 'error': 'A profile is already running'}), 409
+    return jsonify({'success': True, 'seconds': seconds, 'interval': interval}), 202
+
+
+@app.route('/api/admin/profile/stop', methods=['POST'])
+@admin_only
+def stop_profile():
+    """End the profile early; returns it as collapsed stacks"""
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+    try:
+        return collapsed_response(profiling_call(profiler.stop, 'stop_profile'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@app.route('/api/admin/profile', methods=['GET'])
+@admin_only
+def get_profile():
+    """The running or last profile as collapsed stacks for flamegraph.pl or speedscope"""
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+    try:
+        return collapsed_response(profiling_call(profiler.get_profile, 'get_profile'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@app.route('/api/admin/locks', methods=['GET', 'POST'])
+@admin_only
+def lock_stats():
+    """Lock wait/hold histograms; POST {"enabled": true|false} switches tracing"""
+    if plant_system is None:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    try:
+        if request.method == 'POST':
+            enabled = bool((request.get_json(silent=True) or {}).get('enabled', True))
+            stats = profiling_call(plant_system.lock_tracer.set_enabled, 'trace_locks', enabled)
+        else:
+            stats = profiling_call(plant_system.lock_tracer.get_stats, 'lock_stats')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'data': stats, 'timestamp': time.time()})
+
+
 # WebSocket Events
 
 @socketio.on('connect')
 def handle_connect():
-    print('[API] Client connected to WebSocket')
-    emit('connected', {'message': 'Connected to Plant Talker API'})
+    retry_after = rate_limiter.check('ws_connect', request.remote_addr)
+    if retry_after:
+        raise ConnectionRefusedError({'error': 'Rate limit exceeded', 'retry_after': round(retry_after, 2)})
+    fmt = request.args.get('format', 'json')
+    if fmt not in FrameCache.FORMATS:
+        fmt = 'json'
+    if fmt == 'msgpack':
+        msgpack_clients.add(request.sid)
+    join_room(fmt)
+    print(f'[API] Client connected to WebSocket (format: {fmt})')
+    emit('connected', {'message': 'Connected to Plant Talker API', 'format': fmt})
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    msgpack_clients.discard(request.sid)
     print('[API] Client disconnected from WebSocket')
 
 
 @socketio.on('request_status')
 def handle_status_request():
     """Client requests current status"""
+    retry_after = rate_limiter.check('ws_message', request.remote_addr)
+    if retry_after:
+        emit('rate_limited', {'event': 'request_status', 'retry_after': round(retry_after, 2)})
+        return
     if plant_system:
-        state = plant_system.get_state()
-        emit('status_update', state)
+        snapshot = plant_system.system_state.get_snapshot(max_age=STATUS_MAX_AGE)
+        fmt = 'msgpack' if request.sid in msgpack_clients else 'json'
+        emit('status_update', frame_cache.get(snapshot, fmt))
 
 
-def broadcast_status():
-    """Broadcast system status to all connected clients periodically"""
-    global plant_system
-    
+def broadcast_status(system, subscription):
+    """Push the system status to all connected clients whenever an event changes it.
+
+    Bursts of plain readings go out at most once per broadcast interval of the
+    current sampling mode; any other event is sent straight away.
+    """
     print("[API] Starting status broadcast thread")
-    
-    while plant_system and plant_system.running:
+
+    last_sent = 0.0
+    for event in subscription:
+        events = [event]
+        while events[-1].type == READING:
+            remaining = last_sent + system.broadcast_interval - time.time()
+            if remaining <= 0:
+                break
+            item = subscription.get(timeout=remaining)
+            if item is None:
+                break
+            events.append(item)
+        # Everything that queued up while we were waiting becomes one update
+        events += subscription.drain()
+        for item in events:
+            if item.type == ALERT:
+                socketio.emit('alert', item.data)
+        if all(item.type == ALERT for item in events):
+            continue
+        last_sent = time.time()
         try:
-            state = plant_system.get_state()
-            
-            # Update LEDs based on soil moisture
-            soil_moisture = state.get('soil_moisture')
-            if soil_moisture is not None:
-                plant_system.led_controller.update_leds(soil_moisture)
-            
-            socketio.emit('status_update', state)
-            time.sleep(2)  # Update every 2 seconds
+            # One new version per burst, shared with /api/stream and long-polls
+            snapshot = system.system_state.take_snapshot()
+            for item in events:
+                if item.type == IRRIGATION_FINISHED:
+                    socketio.emit('irrigation_event', {
+                        'timestamp': item.timestamp,
+                        'manual': item.data['source'] == 'api',
+                        'source': item.data['source'],
+                        'profile': item.data['profile'],
+                        'moisture': snapshot['state']['soil_moisture'],
+                        'success': item.data['success']
+                    })
+
+            socketio.emit('status_update', frame_cache.get(snapshot, 'json'), to='json')
+            if msgpack_clients:
+                socketio.emit('status_update', frame_cache.get(snapshot, 'msgpack'), to='msgpack')
         except Exception as e:
             print(f"[API] Broadcast error: {e}")
-            time.sleep(5)
-    
+
     print("[API] Status broadcast thread stopped")
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Plant Talker API Server")
+    parser.add_argument('--record', metavar='PATH',
+                        help="Record raw UART lines, DHT readings and button presses to PATH")
+    parser.add_argument('--replay', metavar='PATH',
+                        help="Replay a recording instead of reading the DHT22 and ESP32")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Replay speed multiplier, 0 replays as fast as possible (default: 1)")
+    parser.add_argument('--fast-start', action='store_true',
+                        help="Bring components up concurrently and serve before sensor data arrives")
+    parser.add_argument('--skip-self-test', action='store_true',
+                        help="Skip the LED blink test and servo test move at startup")
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR,
+                        help="Directory for persisted counters (default: %(default)s)")
+    parser.add_argument('--irrigation-profiles', metavar='PATH',
+                        help="JSON file with irrigation profiles and valve calibration")
+    parser.add_argument('--rate-limits', metavar='PATH',
+                        help="JSON file overriding the per-client rate limits (null disables a rule)")
+    parser.add_argument('--knowledge-dir', default=DEFAULT_KNOWLEDGE_DIR,
+                        help="Plant-care notes (.md/.txt) retrieved into chat prompts, '' to disable "
+                             "(default: %(default)s)")
+    parser.add_argument('--hardware-socket', metavar='PATH',
+                        help="Use the devices of a running hardware daemon (iot/hardware_daemon.py) "
+                             "through its Unix socket instead of driving them from this process")
+    parser.add_argument('--alert-rules', metavar='PATH',
+                        help="JSON file overriding the alert rules (null disables a rule)")
+    parser.add_argument('--alert-webhook', metavar='URL',
+                        help="Also POST alert notifications to URL")
+    parser.add_argument('--alert-log', metavar='PATH',
+                        help="Also append alert notifications to a JSON lines file")
+    parser.add_argument('--state-segment', default=DEFAULT_STATE_SEGMENT,
+                        help="With --hardware-socket, read the state from the daemon's shared memory "
+                             "(default: %(default)s, '' to ask the daemon on every read)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Serve from this many processes sharing the port (needs --hardware-socket)")
+    args = parser.parse_args(argv)
+    if args.hardware_socket and (args.record or args.replay):
+        parser.error("--record and --replay need the devices in this process, not --hardware-socket")
+    if args.hardware_socket and (args.alert_rules or args.alert_webhook or args.alert_log):
+        parser.error("with --hardware-socket, alerts are configured on the hardware daemon")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and not args.hardware_socket:
+        parser.error("--workers needs --hardware-socket: only one process can drive the devices")
+    return args
+
+
+def start_system(fast_start=False, self_test=True, **components):
+    """Create and start the plant system, then begin broadcasting its status"""
+    global plant_system
+
+    system = PlantTalkerAPI(fast_start=fast_start, self_test=self_test, **components)
+    updates = system.event_bus.subscribe(
+        types=(READING, STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS, ALERT), name='websocket'
+    )
+    system.start()
+
+    if fast_start:
+        # Import the LLM client in the background instead of on the first chat
+        threading.Thread(target=system.llm_interface.warm_up, daemon=True).start()
+    else:
+        # Wait for initial sensor data
+        print("[API] Waiting for initial sensor data (up to 3 seconds)...")
+        deadline = time.time() + 3
+        for handler in (system.uart_handler, system.dht_sensor):
+            if handler:
+                handler.first_data_event.wait(max(0.0, deadline - time.time()))
+
+    plant_system = system
+
+    start_broadcast(system, updates)
+    # A restarted thread picks up the same subscription, so updates queued
+    # meanwhile still go out. It ends by itself once the system stops.
+    system.watchdog.watch('status_broadcast', lambda reason: start_broadcast(system, updates),
+                          alive=lambda: not system.running or broadcast_thread.is_alive())
+    return system
+
+
+def start_broadcast(system, subscription):
+    """Start the status broadcast thread"""
+    global broadcast_thread
+    broadcast_thread = threading.Thread(target=broadcast_status, args=(system, subscription), daemon=True)
+    broadcast_thread.start()
+
+
+def reload_configuration(rate_limits=None):
+    """SIGHUP: re-read the rate limits, irrigation profiles and alert rules
+    in place, without restarting or reopening the devices"""
+    print("[API] Reloading configuration")
+    if rate_limits:
+        try:
+            rate_limiter.configure(load_limits(rate_limits))
+        except (OSError, ValueError) as e:
+            print(f"[API] Could not reload rate limits: {e}")
+    if plant_system:
+        plant_system.reload()
+
+
+def on_reload_signal(rate_limits):
+    """SIGHUP handler running the reload off the signal-handling thread"""
+    def handler(sig, frame):
+        threading.Thread(target=reload_configuration, args=(rate_limits,), daemon=True).start()
+    return handler
+
+
+def run_worker(listener, number, rate_limits, etag_epoch, system_options):
+    """Body of an API worker process: a thin-client system serving
+    requests accepted from the listening socket shared by all workers"""
+    global ETAG_EPOCH
+    # State versions are shared through the segment, so ETags must be too
+    ETAG_EPOCH = etag_epoch
+    # The parent coordinates shutdown and stops workers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def stop(sig, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, on_reload_signal(rate_limits))
+
+    if rate_limits:
+        rate_limiter.configure(load_limits(rate_limits))
+    # The kernel hands each connection to any worker and workers share no
+    # Socket.IO sessions, so the requests of one long-polling session would
+    # land on different workers. A WebSocket keeps its session on one
+    # connection, and so on one worker.
+    socketio.server.eio.transports = WORKER_TRANSPORTS
+    server = make_server('0.0.0.0', listener.getsockname()[1], app, threaded=True, fd=listener.fileno())
+    try:
+        start_system(worker=number, **system_options)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if plant_system:
+            plant_system.stop()
+
+
+def serve_workers(count, rate_limits, system_options, port=5000):
+    """Serve from count worker processes that accept on one listening
+    socket, so JSON encoding and chat handling are spread over the cores.
+    A worker that exits is restarted, at most once per WORKER_RESTART_DELAY."""
+    listener = socket.create_server(('0.0.0.0', port), backlog=128)
+    context = multiprocessing.get_context('spawn')
+    workers = {}
+    stop_event = threading.Event()
+
+    def start_worker(number):
+        process = context.Process(target=run_worker, args=(listener, number, rate_limits, ETAG_EPOCH, system_options),
+                                  name=f'api-worker-{number}')
+        process.start()
+        workers[number] = (process, time.time())
+        print(f"[API] Worker {number} started (pid {process.pid})")
+
+    def shutdown(sig, frame):
+        print("\n[API] Shutting down...")
+        stop_event.set()
+
+    def reload(sig, frame):
+        for process, _ in workers.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGHUP, reload)
+
+    for number in range(1, count + 1):
+        start_worker(number)
+    while not stop_event.wait(1):
+        for number, (process, started_at) in list(workers.items()):
+            if not process.is_alive() and time.time() - started_at >= WORKER_RESTART_DELAY:
+                print(f"[API] Worker {number} exited with code {process.exitcode}, restarting")
+                start_worker(number)
+
+    for process, _ in workers.values():
+        if process.is_alive():
+            process.terminate()
+    for process, _ in workers.values():
+        process.join(timeout=10)
+    listener.close()
+    print("[API] Workers stopped")
+
+
 def main():
-    global plant_system, broadcast_thread
+    args = parse_args()
+    if args.rate_limits:
+        rate_limiter.configure(load_limits(args.rate_limits))
 
     print("=" * 70)
     print("Plant Talker API Server")
     print("=" * 70)
     print()
 
-    # Initialize system
-    plant_system = PlantTalkerAPI()
-    plant_system.start()
+    recorder = SensorRecorder(args.record) if args.record else None
+    replay = SensorReplay(args.replay, speed=args.speed) if args.replay else None
+    alert_sinks = []
+    if args.alert_webhook:
+        alert_sinks.append(WebhookSink(args.alert_webhook))
+    if args.alert_log:
+        alert_sinks.append(FileSink(args.alert_log))
 
-    # Wait for initial sensor data
-    print("[API] Waiting for initial sensor data (3 seconds)...")
-    time.sleep(3)
+    system_options = {
+        'fast_start': args.fast_start,
+        'self_test': not args.skip_self_test,
+        'state_dir': args.state_dir,
+        'irrigation_profiles': args.irrigation_profiles,
+        'knowledge_dir': args.knowledge_dir,
+        'hardware_socket': args.hardware_socket,
+        'state_segment': args.state_segment if args.hardware_socket else None,
+        'alert_rules': args.alert_rules,
+        'alert_sinks': alert_sinks,
+        'recorder': recorder,
+        'replay': replay
+    }
 
-    # Start broadcast thread
-    broadcast_thread = threading.Thread(target=broadcast_status, daemon=True)
-    broadcast_thread.start()
+    if args.workers > 1:
+        # Each worker brings up its own thin-client system
+        pass
+    elif args.fast_start:
+        # Serve right away; /api/health/ready flips once sensor data arrives
+        threading.Thread(target=start_system, kwargs=system_options, daemon=True).start()
+    else:
+        start_system(**system_options)
 
     print()
     print("=" * 70)
@@ -279,18 +1276,41 @@ def main():
     print("WebSocket: ws://0.0.0.0:5000")
     print()
     print("Endpoints:")
-    print("  GET  /api/status      - Get current system status")
-    print("  POST /api/irrigate    - Trigger irrigation")
+    print("  GET  /api/status      - Get current system status (?since=<version> long-polls)")
+    print("  GET  /api/stream      - Server-Sent Events stream of status versions")
+    print("  POST /api/irrigate    - Trigger irrigation (optional profile, wait)")
+    print("  POST /api/irrigate/cancel - Cancel or emergency-stop irrigation")
+    print("  GET  /api/irrigation/profiles - Irrigation profiles")
+    print("  GET  /api/irrigations - Irrigation history (?limit, ?before, ?source)")
+    print("  GET  /api/irrigations/stats - Irrigation statistics")
+    print("  GET  /api/alerts      - Firing alerts")
+    print("  GET  /api/export      - Stream history as CSV/NDJSON/Arrow (?table, ?format, ?fields, ?start, ?end, ?after)")
     print("  POST /api/chat        - Chat with LLM")
     print("  POST /api/chat/reset  - Reset conversation")
+    print("  POST /api/knowledge/reindex - Re-index changed plant-care notes")
     print("  GET  /api/health      - Health check")
+    print("  GET  /api/health/live - Liveness (worker threads running)")
+    print("  GET  /api/health/ready - Readiness (sensor data fresh, probes passing)")
+    print("  POST /api/admin/profile - Start a sampling profile (admin; GET returns collapsed stacks)")
+    print("  GET  /api/admin/locks - Lock wait/hold histograms (admin; POST switches tracing)")
     print()
     print("WebSocket Events:")
     print("  status_update        - Real-time status updates")
     print("  irrigation_event     - Irrigation notifications")
+    print("  alert                - Alert fired or resolved")
     print("=" * 70)
     print()
 
+    if args.workers > 1:
+        serve_workers(args.workers, args.rate_limits, system_options)
+        return
+
+    def terminate(sig, frame):
+        # systemd stops with SIGTERM: shut down as cleanly as on Ctrl+C
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGHUP, on_reload_signal(args.rate_limits))
+
     try:
         # Start Flask-SocketIO server
         socketio.run(app, host='0.0.0.0', port=5000, debug=False, allow_unsafe_werkzeug=True, use_reloader=False)
@@ -0,0 +1,80 @@
+"""
+Alert engine benchmarks: per-reading evaluation cost as the rule count
+grows across many plants, which should stay flat because a reading only
+touches the rules on its plant and fields, and outbox delivery throughput.
+"""
+
+import random
+import time
+
+from benchmarks.harness import quiet, summarize_latencies, time_calls
+from iot.libs.alerts import AlertEngine, AlertOutbox, CallbackSink, THRESHOLD, RATE, STALE
+
+FIELDS = ('soil_moisture', 'temperature_c', 'humidity', 'light_lux', 'soil_ec')
+
+
+def make_rules(count, plants):
+    """count rules spread evenly over plants and FIELDS"""
+    rules = {}
+    for index in range(count):
+        plant = f'plant-{index % plants}'
+        field = FIELDS[index // plants % len(FIELDS)]
+        kind = index // (plants * len(FIELDS)) % 3
+        if kind == 0:
+            rule = {'type': THRESHOLD, 'below': 20 + index % 10, 'for': 60}
+        elif kind == 1:
+            rule = {'type': RATE, 'below': -5, 'window': 3600}
+        else:
+            rule = {'type': STALE, 'after': 600}
+        rules[f'rule-{index}'] = dict(rule, field=field, plant=plant, cooldown=0, message="{field} {value}")
+    return rules
+
+
+def bench_alert_engine(api_server, system, args):
+    """Reading evaluation latency for growing rule counts and outbox deliveries/s"""
+    plants = args.alert_plants
+    result = {}
+    evaluations = {}
+    rng = random.Random(7)
+    for count in args.alert_rules_count:
+        with quiet():
+            engine = AlertEngine(make_rules(count, plants))
+        clock = [time.time()]
+
+        def reading():
+            # A soil reading of a random plant every 10 simulated seconds
+            clock[0] += 10
+            engine.observe(f'plant-{rng.randrange(plants)}', {'soil_moisture': rng.uniform(15, 60)}, clock[0])
+
+        with quiet():
+            samples, rate = time_calls(reading, args.iterations)
+        stats = engine.get_stats()
+        result.update(summarize_latencies(samples, prefix=f'observe_{count}r_'))
+        result[f'observe_{count}r_per_s'] = rate
+        evaluations[count] = round(stats['evaluations'] / stats['events'], 2)
+
+    delivered = []
+    with quiet():
+        outbox = AlertOutbox()
+        outbox.add_sink(CallbackSink('bench', delivered.append))
+        notification = {'rule': 'soil_dry', 'plant': 'default', 'state': 'firing', 'severity': 'warning',
+                        'value': 20, 'message': "Plant is dehydrated (20% soil moisture)", 'timestamp': time.time()}
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            outbox.enqueue(notification)
+        while outbox.deliver_due(limit=500):
+            pass
+        elapsed = time.perf_counter() - start
+        outbox.stop()
+    result['outbox_deliveries_per_s'] = len(delivered) / elapsed
+
+    counts = args.alert_rules_count
+    result['config'] = {
+        'rule_counts': counts,
+        'plants': plants,
+        'fields': len(FIELDS),
+        'evaluations_per_reading': evaluations,
+        'slowdown': round(result[f'observe_{counts[-1]}r_p50_ms'] / result[f'observe_{counts[0]}r_p50_ms'], 2),
+        'delivered': len(delivered)
+    }
+    return result
@@ -0,0 +1,274 @@
+"""
+API server benchmarks: REST status polling and long-polling, WebSocket
+fan-out and the irrigation endpoint, all served in-process through Flask's
+test clients.
+"""
+
+import threading
+import time
+
+from benchmarks.harness import quiet, summarize_latencies, time_calls
+from benchmarks.sim import advance_state
+from iot.libs.rate_limiter import load_limits
+
+# Pollers in the caching benchmark see a new version every this many requests
+CHANGE_EVERY = 10
+
+
+def bench_api_status(api_server, system, args):
+    """GET /api/status requests/s, sequential and from concurrent pollers"""
+    client = api_server.app.test_client()
+
+    def request():
+        response = client.get('/api/status')
+        assert response.status_code == 200
+
+    with quiet():
+        samples, rate = time_calls(request, args.iterations)
+
+        counts = [0] * args.threads
+        deadline = time.perf_counter() + args.duration
+
+        def poller(index):
+            thread_client = api_server.app.test_client()
+            while time.perf_counter() < deadline:
+                thread_client.get('/api/status')
+                counts[index] += 1
+
+        threads = [threading.Thread(target=poller, args=(i,)) for i in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    result = {
+        'requests_per_s': rate,
+        'concurrent_requests_per_s': sum(counts) / elapsed,
+        'config': {'threads': args.threads}
+    }
+    result.update(summarize_latencies(samples))
+    return result
+
+
+def bench_websocket_fanout(api_server, system, args):
+    """Wall and CPU time to push one status update to N Socket.IO clients,
+    encoding the state dict per broadcast (legacy) versus the cached frame"""
+    result = {'config': {'clients': args.clients}}
+    state = system.system_state
+
+    def legacy():
+        api_server.socketio.emit('status_update', system.get_state())
+
+    def frame():
+        snapshot = state.take_snapshot()
+        api_server.socketio.emit('status_update', api_server.frame_cache.get(snapshot), to='json')
+
+    with quiet():
+        for count in args.clients:
+            clients = [api_server.socketio.test_client(api_server.app) for _ in range(count)]
+            for client in clients:
+                client.get_received()
+
+            for mode, broadcast in (('legacy', legacy), ('frame', frame)):
+                samples = []
+                cpu = []
+                for _ in range(args.broadcasts):
+                    # Every broadcast carries a new state version
+                    system.uart_handler._handle_line("Moisture = 45%")
+                    start = time.perf_counter()
+                    cpu_start = time.process_time()
+                    broadcast()
+                    cpu.append(time.process_time() - cpu_start)
+                    samples.append(time.perf_counter() - start)
+                    for client in clients:
+                        client.get_received()
+
+                result.update(summarize_latencies(samples, prefix=f'{count}_clients_{mode}_'))
+                result[f'{count}_clients_{mode}_cpu_ms'] = sum(cpu) / len(cpu) * 1000
+                result[f'{count}_clients_{mode}_deliveries_per_s'] = count / (sum(samples) / len(samples))
+
+            for client in clients:
+                client.disconnect()
+
+    return result
+
+
+def bench_status_longpoll(api_server, system, args):
+    """Time from a new state version to its delivery to N blocked long-poll clients"""
+    result = {'config': {'clients': args.clients, 'rounds': args.longpoll_rounds}}
+    state = system.system_state
+
+    with quiet():
+        for count in args.clients:
+            clients = [api_server.app.test_client() for _ in range(count)]
+            samples = []
+            for _ in range(args.longpoll_rounds):
+                since = state.get_snapshot()['version']
+                delivered = [None] * count
+
+                def poll(index):
+                    response = clients[index].get(f'/api/status?since={since}&timeout=5')
+                    assert response.status_code == 200
+                    delivered[index] = time.perf_counter()
+
+                threads = [threading.Thread(target=poll, args=(i,)) for i in range(count)]
+                for thread in threads:
+                    thread.start()
+                # Give every poller time to block before the new version appears
+                time.sleep(0.05 + count * 0.001)
+                published_at = time.perf_counter()
+                advance_state(system)
+                for thread in threads:
+                    thread.join()
+                samples.extend(at - published_at for at in delivered)
+
+            result.update(summarize_latencies(samples, prefix=f'{count}_clients_'))
+
+    return result
+
+
+def bench_http_caching(api_server, system, args):
+    """Body bytes and server CPU per request for pollers of /api/status and a
+    200-row /api/irrigations page: unconditional requests, ETag revalidation,
+    and revalidation with gzip. The resource changes every CHANGE_EVERY
+    requests."""
+    irrigation_log = system.irrigation_log
+    if irrigation_log is None:
+        raise RuntimeError("http_caching needs the system built with a state_dir")
+
+    def add_irrigation():
+        irrigation_log.record_irrigation('bench', time.time(), 4.0, True, 30)
+
+    with quiet():
+        events, _ = irrigation_log.list_events(limit=200)
+        for _ in range(200 - len(events)):
+            add_irrigation()
+
+    endpoints = (
+        ('status', '/api/status', lambda: advance_state(system)),
+        ('history', '/api/irrigations?limit=200', add_irrigation),
+    )
+    result = {'config': {'requests': args.poll_requests, 'change_every': CHANGE_EVERY}}
+
+    with quiet():
+        for name, url, change in endpoints:
+            for mode in ('plain', 'etag', 'etag_gzip'):
+                client = api_server.app.test_client()
+                etag = None
+                body_bytes = 0
+                not_modified = 0
+                cpu = 0.0
+                for i in range(args.poll_requests):
+                    if i % CHANGE_EVERY == 0:
+                        change()
+                    headers = {}
+                    if mode != 'plain' and etag:
+                        headers['If-None-Match'] = etag
+                    if mode == 'etag_gzip':
+                        headers['Accept-Encoding'] = 'gzip'
+
+                    cpu_start = time.process_time()
+                    response = client.get(url, headers=headers)
+                    body = response.get_data()
+                    cpu += time.process_time() - cpu_start
+
+                    assert response.status_code in (200, 304)
+                    not_modified += response.status_code == 304
+                    etag = response.headers.get('ETag', etag)
+                    body_bytes += len(body)
+
+                prefix = f'{name}_{mode}_'
+                result[prefix + 'bytes_per_req'] = body_bytes / args.poll_requests
+                result[prefix + 'cpu_us_per_req'] = cpu / args.poll_requests * 1e6
+                result['config'][prefix + 'not_modified'] = not_modified
+
+    return result
+
+
+def client_address(index):
+    return f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'
+
+
+def bench_rate_limits(api_server, system, args):
+    """/api/status latency from many pollers, idle and while /api/chat is
+    flooded both from one address (token bucket) and from rotating addresses
+    (admission gate), with the default limits"""
+    addresses = iter(range(1, 1 << 24))
+    flooders = max(2, args.threads)
+
+    def sample_status(seconds):
+        client = api_server.app.test_client()
+        samples = []
+        limited = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.get('/api/status', environ_overrides={'REMOTE_ADDR': client_address(next(addresses))})
+            samples.append(time.perf_counter() - start)
+            limited += response.status_code == 429
+        return samples, limited
+
+    counts = {'ok': 0, 'bucket': 0, 'gate': 0}
+    counts_lock = threading.Lock()
+
+    def flood(index, deadline):
+        client = api_server.app.test_client()
+        while time.perf_counter() < deadline:
+            # Flooder 0 keeps one address; the others look like many clients
+            address = client_address(0 if index == 0 else next(addresses))
+            response = client.post('/api/chat', json={'message': 'Water?'}, environ_overrides={'REMOTE_ADDR': address})
+            if response.status_code == 200:
+                outcome = 'ok'
+            else:
+                assert response.status_code == 429 and 'Retry-After' in response.headers
+                outcome = 'gate' if 'in progress' in response.get_json()['error'] else 'bucket'
+            with counts_lock:
+                counts[outcome] += 1
+
+    with quiet():
+        api_server.rate_limiter.configure(load_limits())
+        try:
+            idle, _ = sample_status(args.duration)
+
+            deadline = time.perf_counter() + args.duration
+            threads = [threading.Thread(target=flood, args=(i, deadline)) for i in range(flooders)]
+            for thread in threads:
+                thread.start()
+            loaded, status_limited = sample_status(args.duration)
+            for thread in threads:
+                thread.join()
+        finally:
+            api_server.rate_limiter.configure({})
+            system.llm_interface.reset_conversation()
+
+    if status_limited:
+        raise AssertionError(f"{status_limited} status reads were rate limited")
+
+    result = summarize_latencies(idle, prefix='status_idle_')
+    result.update(summarize_latencies(loaded, prefix='status_chat_flood_'))
+    result['chat_admitted_per_s'] = counts['ok'] / args.duration
+    result['config'] = {
+        'flooders': flooders,
+        'chat_admitted': counts['ok'],
+        'chat_rejected_bucket': counts['bucket'],
+        'chat_rejected_gate': counts['gate']
+    }
+    return result
+
+
+def bench_irrigation(api_server, system, args):
+    """End-to-end latency of POST /api/irrigate including the servo cycle"""
+    client = api_server.app.test_client()
+
+    def request():
+        response = client.post('/api/irrigate')
+        assert response.status_code == 200
+
+    with quiet():
+        samples, _ = time_calls(request, args.irrigations)
+
+    result = summarize_latencies(samples)
+    result['config'] = {'irrigations': args.irrigations}
+    return result
@@ -0,0 +1,120 @@
+"""
+Button benchmarks: bounce patterns driven through a gpiozero mock pin must
+produce exactly the expected gestures, without blocking the GPIO thread.
+"""
+
+import time
+from threading import Lock
+
+from benchmarks.harness import quiet, summarize_latencies
+from iot.libs.button_handler import GESTURES, ButtonHandler
+
+# A spare GPIO so the bench handler does not clash with the system's button
+BENCH_PIN = 21
+
+DEBOUNCE = 0.03
+LONG_PRESS = 0.4
+DOUBLE_PRESS_WINDOW = 0.2
+
+
+def bounce(pressed, count=5, spacing=0.001):
+    """Contact chatter ending in the `pressed` level"""
+    steps = []
+    for i in range(count):
+        steps.append((pressed if i % 2 == 0 else not pressed, spacing))
+    steps.append((pressed, 0))
+    return steps
+
+
+def click(hold=0.08, chatter=True):
+    steps = bounce(True) if chatter else [(True, 0)]
+    steps.append((True, hold))
+    steps.extend(bounce(False) if chatter else [(False, 0)])
+    return steps
+
+
+def idle(seconds):
+    return [(False, seconds)]
+
+
+# (name, pin levels as (pressed, hold seconds), expected gestures)
+SCENARIOS = [
+    ('clean_press', click(chatter=False) + idle(0.4), ['press']),
+    ('bouncy_press', click() + idle(0.4), ['press']),
+    ('glitch', [(True, DEBOUNCE / 4), (False, 0.4)], []),
+    ('double_press', click() + idle(0.08) + click() + idle(0.4), ['double_press']),
+    ('slow_presses', click() + idle(0.4) + click() + idle(0.4), ['press', 'press']),
+    ('long_press', bounce(True) + [(True, LONG_PRESS + 0.1)] + bounce(False) + idle(0.4), ['long_press']),
+]
+
+
+class GestureLog:
+    def __init__(self, handler):
+        self.lock = Lock()
+        self.gestures = []
+        for gesture in GESTURES:
+            handler.set_callback(lambda gesture=gesture: self._add(gesture), gesture=gesture)
+
+    def _add(self, gesture):
+        with self.lock:
+            self.gestures.append((gesture, time.monotonic()))
+
+    def take(self):
+        with self.lock:
+            gestures, self.gestures = self.gestures, []
+        return gestures
+
+
+def play(pin, steps, edge_samples):
+    for pressed, hold in steps:
+        started = time.perf_counter()
+        # Button has pull_up=True, so a press drives the pin low
+        if pressed:
+            pin.drive_low()
+        else:
+            pin.drive_high()
+        edge_samples.append(time.perf_counter() - started)
+        if hold:
+            time.sleep(hold)
+
+
+def bench_button_gestures(api_server, system, args):
+    """Gesture detection over bounce patterns and GPIO-side edge cost"""
+    from gpiozero import Device
+
+    handler = ButtonHandler(BENCH_PIN, debounce=DEBOUNCE, long_press=LONG_PRESS,
+                            double_press_window=DOUBLE_PRESS_WINDOW)
+    pin = Device.pin_factory.pin(BENCH_PIN)
+    log = GestureLog(handler)
+    edge_samples = []
+    long_press_latencies = []
+    mismatches = {}
+
+    with quiet():
+        handler.start()
+        try:
+            for _ in range(args.button_rounds):
+                for name, steps, expected in SCENARIOS:
+                    started = time.monotonic()
+                    play(pin, steps, edge_samples)
+                    detected = log.take()
+                    if [gesture for gesture, _ in detected] != expected:
+                        mismatches[name] = [gesture for gesture, _ in detected]
+                    if name == 'long_press' and detected:
+                        long_press_latencies.append(detected[0][1] - started - LONG_PRESS)
+        finally:
+            handler.stop()
+            handler.button.close()
+
+    if mismatches:
+        raise AssertionError(f"unexpected gestures: {mismatches}")
+
+    stats = handler.get_stats()
+    result = {
+        'gesture_errors': len(mismatches),
+        'bounce_edges_filtered': stats['raw_edges'] - 2 * stats['presses'],
+        'long_press_overshoot_ms': max(long_press_latencies) * 1000 if long_press_latencies else None,
+        'config': {'rounds': args.button_rounds, 'debounce_s': DEBOUNCE}
+    }
+    result.update(summarize_latencies(edge_samples, prefix='edge_callback_'))
+    return result
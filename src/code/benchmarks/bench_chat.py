@@ -0,0 +1,40 @@
+"""
+Chat benchmarks against the stub LLM: request throughput and
+time-to-first-token for streamed replies.
+"""
+
+import time
+
+from benchmarks.harness import quiet, summarize_latencies, time_calls
+
+
+def bench_chat(api_server, system, args):
+    """POST /api/chat throughput and LLMInterface.chat_stream TTFT"""
+    client = api_server.app.test_client()
+
+    def request():
+        response = client.post('/api/chat', json={'message': 'How is my plant doing?'})
+        assert response.status_code == 200
+
+    with quiet():
+        samples, rate = time_calls(request, args.chats)
+
+        first_token = []
+        full_reply = []
+        for _ in range(args.chats):
+            start = time.perf_counter()
+            stream = system.llm_interface.chat_stream('Does my plant need water?')
+            next(stream)
+            first_token.append(time.perf_counter() - start)
+            for _ in stream:
+                pass
+            full_reply.append(time.perf_counter() - start)
+
+        system.llm_interface.reset_conversation()
+
+    result = {'chats_per_s': rate}
+    result.update(summarize_latencies(samples))
+    result.update(summarize_latencies(first_token, prefix='ttft_'))
+    result.update(summarize_latencies(full_reply, prefix='stream_'))
+    result['config'] = {'token_delay_s': args.token_delay, 'chats': args.chats}
+    return result
@@ -0,0 +1,95 @@
+"""
+History export benchmarks: rows/s and peak RSS of the export command for
+each format over a large readings store, and rows/s of /api/export.
+"""
+
+import importlib.util
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import quiet
+from iot.libs.history_export import CONTENT_TYPES
+from iot.libs.history_store import HistoryStore
+
+EXPORT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'iot', 'libs', 'history_export.py')
+# Runs the script given as first argument and prints the process's peak RSS
+# in kB. VmHWM, unlike ru_maxrss, does not count pages from before the exec.
+MEASURE = ("import runpy, sys\n"
+           "sys.argv = sys.argv[1:]\n"
+           "if sys.argv: runpy.run_path(sys.argv[0], run_name='__main__')\n"
+           "else: import argparse, csv, json, sqlite3\n"
+           "print(open('/proc/self/status').read().split('VmHWM:')[1].split()[0])")
+
+
+def fill_history(directory, rows):
+    """rows readings, soil and DHT alternating every 5 s, generated inside SQLite"""
+    with quiet():
+        HistoryStore(os.path.join(directory, 'history.db')).close()
+    db = sqlite3.connect(os.path.join(directory, 'history.db'))
+    db.execute(
+        "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+        "INSERT INTO readings (timestamp, sensor, soil_moisture, temperature_c, humidity) "
+        "SELECT ? + i * 5, CASE i % 2 WHEN 0 THEN 'soil_moisture' ELSE 'dht' END, "
+        "CASE i % 2 WHEN 0 THEN 30 + i % 40 END, CASE i % 2 WHEN 1 THEN 18 + (i % 97) / 10.0 END, "
+        "CASE i % 2 WHEN 1 THEN 40 + (i % 211) / 10.0 END FROM n",
+        (rows - 1, time.time() - rows * 5)
+    )
+    db.commit()
+    db.close()
+
+
+def run_measured(*argv):
+    """Seconds taken and peak RSS (MB) of a Python process running argv, or
+    of one only importing what the export needs when argv is empty"""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', MEASURE, *argv], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start, int(process.stdout.split()[-1]) / 1024
+
+
+def bench_history_export(api_server, system, args):
+    """Export rows/s and peak RSS per format, and /api/export rows/s"""
+    rows = args.export_rows
+    result = {}
+    formats = [fmt for fmt in CONTENT_TYPES if fmt != 'arrow' or importlib.util.find_spec('pyarrow')]
+    with tempfile.TemporaryDirectory(prefix='planttalker-export-') as directory:
+        fill_history(directory, rows)
+        database_mb = os.path.getsize(os.path.join(directory, 'history.db')) / 2 ** 20
+
+        # What the interpreter and the modules the export needs take on their own
+        _, baseline_mb = run_measured()
+        for fmt in formats:
+            elapsed, peak_mb = run_measured(EXPORT_SCRIPT, '--state-dir', directory, '--format', fmt,
+                                            '--output', os.devnull)
+            result[f'cli_{fmt}_rows_per_s'] = rows / elapsed
+            result[f'cli_{fmt}_peak_rss_mb'] = peak_mb
+
+        # Same export streamed through the API, consumed chunk by chunk
+        http_rows = min(rows, args.iterations * 500)
+        state_dir = system.state_dir
+        system.state_dir = directory
+        try:
+            client = api_server.app.test_client()
+            start = time.perf_counter()
+            response = client.get(f'/api/export?format=csv&after={rows - http_rows}', buffered=False)
+            received = sum(len(chunk) for chunk in response.response)
+            elapsed = time.perf_counter() - start
+            response.close()
+        finally:
+            system.state_dir = state_dir
+        result['api_csv_rows_per_s'] = http_rows / elapsed
+
+    result['config'] = {
+        'rows': rows,
+        'database_mb': round(database_mb, 1),
+        'formats': formats,
+        'interpreter_rss_mb': round(baseline_mb, 1),
+        'api_rows': http_rows,
+        'api_bytes': received
+    }
+    return result
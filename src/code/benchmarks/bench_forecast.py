@@ -0,0 +1,106 @@
+"""
+Forecast benchmarks: replay a multi-week soil moisture trace through the
+moisture forecaster, timing each update and scoring time-to-dry
+predictions against when the trace actually crossed the threshold.
+"""
+
+import math
+import random
+import time
+
+from benchmarks.harness import quiet, summarize_latencies
+from iot.libs.moisture_forecast import MoistureForecaster
+
+THRESHOLD = 35
+INTERVAL = 60.0
+
+
+def moisture_trace(days, seed=0):
+    """Simulated soil moisture, one reading per minute: drying towards 10%
+    at a rate that peaks in the afternoon, watered a few hours after it
+    turns dry. Returns (readings, true values, watering times)."""
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    moisture = 70.0
+    readings = []
+    truth = []
+    waterings = []
+    water_at = None
+    ramp = 0
+    for minute in range(int(days * 24 * 60)):
+        timestamp = start + minute * INTERVAL
+        hour = (timestamp / 3600) % 24
+        rate = 0.012 * (1 + 0.5 * math.sin(2 * math.pi * (hour - 9) / 24))
+        moisture -= rate * (moisture - 10) / 60
+
+        if moisture < THRESHOLD - 2 and water_at is None:
+            water_at = timestamp + rng.uniform(0, 6) * 3600
+        if water_at is not None and timestamp >= water_at:
+            waterings.append(timestamp)
+            water_at = None
+            ramp = 5
+        if ramp:
+            # Water soaks in over a few minutes
+            moisture += 7.0
+            ramp -= 1
+
+        truth.append((timestamp, moisture))
+        readings.append((timestamp, round(moisture + rng.gauss(0, 0.4))))
+    return readings, truth, waterings
+
+
+def dry_crossings(truth):
+    """For each index, when the true moisture next falls below THRESHOLD"""
+    crossings = [None] * len(truth)
+    next_crossing = None
+    for index in range(len(truth) - 1, 0, -1):
+        if truth[index][1] < THRESHOLD <= truth[index - 1][1]:
+            next_crossing = truth[index][0]
+        elif truth[index][1] > truth[index - 1][1] + 1:
+            # A watering: crossings after it belong to the next cycle
+            next_crossing = None
+        crossings[index - 1] = next_crossing
+    return crossings
+
+
+def bench_moisture_forecast(api_server, system, args):
+    """Per-reading forecaster update cost and time-to-dry accuracy over a replayed trace"""
+    readings, truth, waterings = moisture_trace(args.forecast_days)
+    crossings = dry_crossings(truth)
+    forecaster = MoistureForecaster(threshold=THRESHOLD, interval=INTERVAL)
+
+    samples = []
+    errors = []
+    relative_errors = []
+    with quiet():
+        for index, (timestamp, moisture) in enumerate(readings):
+            start = time.perf_counter()
+            forecaster.add_reading(moisture, timestamp)
+            samples.append(time.perf_counter() - start)
+
+            forecast = forecaster.get_forecast()
+            actual = crossings[index]
+            if not forecast or forecast['dry_at'] is None or actual is None or forecast['confidence'] < 0.5:
+                continue
+            horizon = actual - timestamp
+            if horizon < 3600:
+                continue
+            error = abs(forecast['dry_at'] - actual)
+            errors.append(error / 3600)
+            relative_errors.append(error / horizon)
+
+    errors.sort()
+    relative_errors.sort()
+    final = forecaster.get_forecast()
+    result = summarize_latencies(samples, prefix='update_')
+    result['updates_per_s'] = len(samples) / sum(samples)
+    result['forecast_median_error_hours'] = errors[len(errors) // 2] if errors else None
+    result['forecast_median_relative_error'] = relative_errors[len(relative_errors) // 2] if relative_errors else None
+    result['config'] = {
+        'days': args.forecast_days,
+        'readings': len(readings),
+        'waterings': len(waterings),
+        'scored_forecasts': len(errors),
+        'expected_recovery': final['expected_recovery'] if final else None
+    }
+    return result
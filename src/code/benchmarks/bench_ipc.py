@@ -0,0 +1,96 @@
+"""
+Hardware IPC benchmarks: command round trips and event subscription
+throughput between a HardwareServer and a HardwareClient over a Unix
+domain socket, as used by thin clients of the hardware daemon.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.harness import quiet, summarize_latencies, time_calls
+from iot.libs.event_bus import EventBus, BusEvent, READING
+from iot.libs.hardware_ipc import HardwareServer, HardwareClient, encode_event, CODECS
+
+
+def bench_hardware_ipc(api_server, system, args):
+    """Command round-trip latency and reading throughput over the daemon socket"""
+    events = args.ipc_events
+    # A bus of its own, so the stores and forecaster of the simulated system do not slow publishing
+    bus = EventBus()
+    with quiet(), tempfile.TemporaryDirectory(prefix='planttalker-ipc-') as directory:
+        path = os.path.join(directory, 'hardware.sock')
+        server = HardwareServer(path, bus, queue_size=events)
+        server.register('ping', lambda: True)
+        server.register('get_state', system.system_state.get_full_state)
+        server.start()
+
+        client_bus = EventBus()
+        client = HardwareClient(path, name='bench')
+        try:
+            client.connect(wait=2)
+            client.set_event_bus(client_bus)
+            client.subscribe((READING,))
+            received = client_bus.subscribe(types=(READING,), maxsize=events + 1)
+
+            ping_samples, ping_rate = time_calls(lambda: client.call('ping'), args.iterations)
+            state_samples, _ = time_calls(lambda: client.call('get_state'), args.iterations)
+            local_samples, _ = time_calls(system.system_state.get_full_state, args.iterations)
+
+            # Several server threads sharing one connection
+            per_thread = max(1, args.iterations // args.threads)
+
+            def worker():
+                for _ in range(per_thread):
+                    client.call('get_state')
+            threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            concurrent_elapsed = time.perf_counter() - start
+
+            # Soil and DHT readings alternating, as published by the sensor threads
+            start = time.perf_counter()
+            for index in range(events):
+                if index % 2:
+                    bus.publish(READING, sensor='dht', temperature_c=21.5, humidity=55.0, read_at=time.time())
+                else:
+                    bus.publish(READING, sensor='soil_moisture', soil_moisture=45, read_at=time.time())
+            delivered = 0
+            deadline = time.time() + 30
+            while delivered < events and time.time() < deadline:
+                if received.get(timeout=1) is not None:
+                    delivered += 1 + len(received.drain())
+            stream_elapsed = time.perf_counter() - start
+            codec = client.codec
+        finally:
+            client.close()
+            server.stop()
+            bus.close()
+            client_bus.close()
+
+    soil = BusEvent(1, READING, {'sensor': 'soil_moisture', 'soil_moisture': 45, 'read_at': time.time()}, time.time())
+    dht = BusEvent(2, READING, {'sensor': 'dht', 'temperature_c': 21.5, 'humidity': 55.0, 'read_at': time.time()},
+                   time.time())
+    encode = CODECS[codec][0]
+
+    result = summarize_latencies(ping_samples, prefix='ping_')
+    result.update(summarize_latencies(state_samples, prefix='get_state_'))
+    result.update(summarize_latencies(local_samples, prefix='local_state_'))
+    result['calls_per_s'] = ping_rate
+    result['concurrent_calls_per_s'] = per_thread * args.threads / concurrent_elapsed
+    result['readings_per_s'] = delivered / stream_elapsed
+    result['config'] = {
+        'codec': codec,
+        'threads': args.threads,
+        'events': events,
+        'delivered': delivered,
+        'soil_frame_bytes': len(encode_event(soil, encode)),
+        'dht_frame_bytes': len(encode_event(dht, encode)),
+        'json_event_bytes': len(json.dumps([dht.seq, dht.type, dht.timestamp, dht.data]))
+    }
+    return result
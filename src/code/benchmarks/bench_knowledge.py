@@ -0,0 +1,95 @@
+"""
+Knowledge base benchmarks: BM25 retrieval latency over a few thousand
+synthetic plant-care chunks, full index build and incremental re-sync.
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.harness import quiet, summarize_latencies
+from iot.libs.knowledge_base import KnowledgeBase
+
+SECTIONS_PER_DOC = 10
+
+SPECIES = ['basil', 'pothos', 'fern', 'cactus', 'aloe', 'orchid', 'tomato', 'pepper', 'mint', 'ficus',
+           'monstera', 'calathea', 'begonia', 'jade', 'ivy', 'lavender', 'rosemary', 'thyme', 'lily', 'palm']
+TOPICS = ['watering', 'light', 'humidity', 'temperature', 'repotting', 'fertilizer', 'pests', 'pruning',
+          'propagation', 'dormancy']
+WORDS = ('soil moisture water drain pot root leaf leaves yellow brown droop wilt crisp rot dry wet sun shade '
+         'bright indirect window mist tray pebble gnat mite aphid feed nitrogen season winter summer spring '
+         'morning evening gentle deep thorough weekly daily soak runoff compost perlite bark sand clay').split()
+
+QUERIES = [
+    "how often should I water my basil",
+    "why are the leaves of my pothos turning yellow",
+    "my cactus looks soft and brown near the soil",
+    "what humidity does a calathea need in winter",
+    "when should I repot a monstera",
+    "small flies around the soil of my fern",
+    "how much light does lavender need indoors",
+    "is it ok to mist an orchid every morning",
+]
+
+
+def write_corpus(directory, documents, seed=0):
+    rng = random.Random(seed)
+    for index in range(documents):
+        species = SPECIES[index % len(SPECIES)]
+        lines = [f"# {species.title()} guide {index}", ""]
+        for topic in TOPICS[:SECTIONS_PER_DOC]:
+            lines.append(f"## {species.title()} {topic}")
+            lines.append("")
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(60)) + f" {species} {topic}.")
+            lines.append("")
+        with open(os.path.join(directory, f"{species}_{index}.md"), 'w') as f:
+            f.write("\n".join(lines))
+
+
+def bench_knowledge_retrieval(api_server, system, args):
+    """Top-k retrieval latency, prompt context latency, and index build times"""
+    documents = max(1, args.knowledge_chunks // SECTIONS_PER_DOC)
+
+    with quiet(), tempfile.TemporaryDirectory(prefix='planttalker-kb-') as directory:
+        corpus = os.path.join(directory, 'notes')
+        os.mkdir(corpus)
+        write_corpus(corpus, documents)
+        knowledge_base = KnowledgeBase(os.path.join(directory, 'knowledge.db'))
+        try:
+            start = time.perf_counter()
+            counts = knowledge_base.sync(corpus)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            knowledge_base.sync()
+            resync_unchanged = time.perf_counter() - start
+
+            edited = os.path.join(corpus, sorted(os.listdir(corpus))[0])
+            with open(edited, 'a') as f:
+                f.write("\n## Late note\n\nWater less often in winter.\n")
+            start = time.perf_counter()
+            knowledge_base.sync()
+            resync_one_edit = time.perf_counter() - start
+
+            search_samples = []
+            context_samples = []
+            for _ in range(max(1, args.iterations // len(QUERIES))):
+                for query in QUERIES:
+                    start = time.perf_counter()
+                    knowledge_base.search(query, k=4)
+                    search_samples.append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    knowledge_base.build_context(query, max_tokens=400)
+                    context_samples.append(time.perf_counter() - start)
+        finally:
+            knowledge_base.close()
+
+    result = summarize_latencies(search_samples, prefix='search_')
+    result.update(summarize_latencies(context_samples, prefix='context_'))
+    result['build_ms'] = build * 1000
+    result['resync_unchanged_ms'] = resync_unchanged * 1000
+    result['resync_one_edit_ms'] = resync_one_edit * 1000
+    result['config'] = {'documents': documents, 'chunks': counts['chunks']}
+    return result
@@ -0,0 +1,71 @@
+"""
+Irrigation motion engine benchmarks on a VirtualServo: waveform accuracy
+per profile, caller blocking time and cancellation latency.
+"""
+
+import time
+from threading import Event
+
+from benchmarks.harness import quiet
+from benchmarks.sim import VirtualServo
+from iot.libs.servo_controller import ServoController, build_waveform
+
+# Short doses so the suite stays fast; timing accuracy does not depend on length
+TEST_PROFILES = {
+    'standard': {'duration': 0.4, 'opening': 1.0, 'prepare': 0.1, 'close_hold': 0.2},
+    'partial': {'volume_ml': 5, 'opening': 0.5, 'prepare': 0.1, 'close_hold': 0.2},
+    'pulsed': {'volume_ml': 6, 'opening': 1.0, 'pulses': 3, 'soak': 0.15, 'prepare': 0.1, 'close_hold': 0.2},
+}
+
+
+def verify_waveform(commands, expected):
+    """Return the largest hold-time error (s) after checking the command values"""
+    values = [value for _, value in commands]
+    expected_values = [value for value, _ in expected]
+    if values != expected_values:
+        raise AssertionError(f"commanded {values}, expected {expected_values}")
+
+    worst = 0.0
+    start = commands[0][0]
+    planned = 0.0
+    for (at, _), (_, hold) in zip(commands, expected):
+        worst = max(worst, abs((at - start) - planned))
+        planned += hold
+    return worst
+
+
+def bench_irrigation_motion(api_server, system, args):
+    """Commanded waveform accuracy, caller blocking and cancel latency"""
+    result = {}
+
+    with quiet():
+        servo = VirtualServo()
+        controller = ServoController(servo=servo, self_test=False)
+        controller.profiles = TEST_PROFILES
+
+        worst_error = 0.0
+        start_latencies = []
+        for name, profile in TEST_PROFILES.items():
+            servo.commands.clear()
+            done = Event()
+            call_start = time.perf_counter()
+            controller.start_irrigation(profile=name, on_complete=lambda ok: done.set())
+            start_latencies.append(time.perf_counter() - call_start)
+            done.wait()
+            error = verify_waveform(servo.commands, build_waveform(profile, controller.calibration))
+            result[f'{name}_max_timing_error_ms'] = error * 1000
+            worst_error = max(worst_error, error)
+
+        servo.commands.clear()
+        done = Event()
+        controller.start_irrigation(profile='standard', on_complete=lambda ok: done.set())
+        time.sleep(0.2)
+        cancel_start = time.monotonic()
+        controller.cancel(emergency=True)
+        closed_at = next(at for at, value in servo.commands if at >= cancel_start and value == -1.0)
+        done.wait()
+
+    result['max_timing_error_ms'] = worst_error * 1000
+    result['start_call_max_ms'] = max(start_latencies) * 1000
+    result['emergency_close_ms'] = (closed_at - cancel_start) * 1000
+    return result
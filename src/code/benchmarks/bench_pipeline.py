@@ -0,0 +1,94 @@
+"""
+Sensor pipeline benchmarks: UART line parsing, SystemState reads, event
+bus publishing and startup time.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.harness import quiet, summarize_latencies, time_calls
+
+
+def bench_uart_parse(api_server, system, args):
+    """Lines/s through UARTHandler._handle_line (parse + state update)"""
+    handler = system.uart_handler
+    lines = [f"Moisture = {i % 100}%" for i in range(args.iterations * 10)]
+    lines[::50] = ["garbage line"] * len(lines[::50])
+    iterator = iter(lines)
+
+    with quiet():
+        samples, rate = time_calls(lambda: handler._handle_line(next(iterator)), len(lines))
+
+    result = {'lines_per_s': rate}
+    result.update(summarize_latencies(samples))
+    return result
+
+
+def bench_state_contention(api_server, system, args):
+    """get_full_state() latency while readers and sensor writers contend"""
+    state = system.system_state
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            state.get_full_state()
+
+    def writer():
+        moisture = 0
+        while not stop.is_set():
+            moisture = (moisture + 1) % 100
+            system.uart_handler._handle_line(f"Moisture = {moisture}%")
+            system.dht_sensor._read_once()
+
+    with quiet():
+        threads = [threading.Thread(target=reader, daemon=True) for _ in range(args.threads)]
+        threads.append(threading.Thread(target=writer, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        time.sleep(0.1)
+        samples, rate = time_calls(state.get_full_state, args.iterations)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    result = {'calls_per_s': rate, 'config': {'contending_threads': args.threads + 1}}
+    result.update(summarize_latencies(samples))
+    return result
+
+
+def bench_event_publish(api_server, system, args):
+    """EventBus.publish() cost with the system's subscribers plus N queue subscribers"""
+    bus = system.event_bus
+    extra = [bus.subscribe(types=('reading',), maxsize=args.iterations, name=f'bench-{i}')
+             for i in range(args.threads)]
+
+    with quiet():
+        samples, rate = time_calls(lambda: bus.publish('reading', sensor='bench', soil_moisture=50), args.iterations)
+        for subscription in extra:
+            subscription.close()
+
+    result = {'events_per_s': rate, 'config': {'extra_subscribers': args.threads}}
+    result.update(summarize_latencies(samples))
+    return result
+
+
+def bench_startup(api_server, system, args):
+    """Time to the first answered request, legacy versus --fast-start"""
+    result = {}
+    for mode, flags in (('legacy', []), ('fast', ['--fast-start'])):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.startup_probe'] + flags,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            check=True, capture_output=True, text=True
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        for metric, value in timings.items():
+            if value is not None:
+                result[f'{mode}_{metric}'] = value
+    return result
@@ -0,0 +1,73 @@
+"""
+Profiling benchmarks: the cost of lock tracing when off and on, measured
+on SystemState.get_full_state and a bare lock, and the slowdown of a
+CPU-bound loop while the sampling profiler runs.
+"""
+
+import time
+from threading import Lock
+
+from benchmarks.harness import quiet, summarize_latencies, time_calls
+from iot.libs.profiling import SamplingProfiler, LockStats, TracedLock
+
+
+def spin(iterations=2000000):
+    total = 0
+    for index in range(iterations):
+        total += index * index % 7
+    return total
+
+
+def bench_lock_tracing(api_server, system, args):
+    """get_full_state latency with lock tracing off and on, and profiler overhead"""
+    result = {}
+    system_state = system.system_state
+
+    off_samples, _ = time_calls(system_state.get_full_state, args.iterations)
+    with quiet():
+        system.lock_tracer.enable()
+    try:
+        on_samples, _ = time_calls(system_state.get_full_state, args.iterations)
+    finally:
+        with quiet():
+            system.lock_tracer.disable()
+    result.update(summarize_latencies(off_samples, prefix='state_tracing_off_'))
+    result.update(summarize_latencies(on_samples, prefix='state_tracing_on_'))
+
+    # A bare acquire/release pair, plain and traced
+    lock = Lock()
+    traced = TracedLock(lock, LockStats())
+    rounds = args.iterations * 50
+
+    def pairs(target):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            with target:
+                pass
+        return (time.perf_counter() - start) / rounds * 1e9
+    result['lock_plain_ns'] = pairs(lock)
+    result['lock_traced_ns'] = pairs(traced)
+
+    # The same loop with and without 100 Hz stack sampling
+    baseline = min(_timed(spin) for _ in range(3))
+    profiler = SamplingProfiler()
+    with quiet():
+        profiler.start(seconds=60, interval=0.01)
+        profiled = min(_timed(spin) for _ in range(3))
+        profile = profiler.stop()
+    result['spin_ms'] = baseline * 1000
+    result['spin_profiled_ms'] = profiled * 1000
+
+    result['config'] = {
+        'locks': list(system.lock_tracer.locks),
+        'profiler_overhead': round(profiled / baseline - 1, 3),
+        'profile_samples': profile['stats']['samples'],
+        'profile_stacks': profile['stats']['stacks']
+    }
+    return result
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
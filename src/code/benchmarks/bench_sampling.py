@@ -0,0 +1,176 @@
+"""
+Sampling benchmarks: run a simulated day of soil, temperature and humidity
+changes with waterings in virtual time, once on the fixed schedule (UART
+polled every 1 s, DHT22 every 10 s, status broadcast every 2 s) and once
+driven by the adaptive scheduler, and compare thread wakeups, sample counts
+and how closely the latest soil sample tracks the true moisture.
+"""
+
+import heapq
+import math
+import random
+import time
+
+from benchmarks.bench_forecast import moisture_trace
+from benchmarks.harness import quiet, summarize_latencies
+from iot.libs.adaptive_scheduler import AdaptiveScheduler
+from iot.libs.event_bus import BusEvent
+
+FIXED_INTERVALS = {'uart': 1, 'dht': 10, 'broadcast': 2}
+IRRIGATION_SECONDS = 60
+
+
+class Environment:
+    """True conditions at any time of the simulated run"""
+
+    def __init__(self, days, seed=0):
+        _, self.truth, self.waterings = moisture_trace(days, seed=seed)
+        self.start = self.truth[0][0]
+        self.end = self.truth[-1][0]
+        self.random = random.Random(seed)
+
+    def moisture(self, timestamp):
+        minute = min(int((timestamp - self.start) // 60), len(self.truth) - 1)
+        return self.truth[minute][1]
+
+    def soil_reading(self, timestamp):
+        return round(self.moisture(timestamp) + self.random.gauss(0, 0.4))
+
+    def dht_reading(self, timestamp):
+        hour = (timestamp / 3600) % 24
+        daylight = math.sin(2 * math.pi * (hour - 9) / 24)
+        temperature = 21 + 3 * daylight + self.random.gauss(0, 0.1)
+        humidity = 55 - 8 * daylight + self.random.gauss(0, 0.5)
+        if 18 <= hour < 19:
+            # A window opened for an hour every evening
+            temperature -= 2.5
+            humidity += 6
+        return round(temperature, 1), round(humidity, 1)
+
+
+def simulate(environment, scheduler=None):
+    """Replay the environment on the fixed schedule, or the adaptive one
+    when a scheduler is given. Returns counts and scheduler update times."""
+    intervals = dict(FIXED_INTERVALS)
+    if scheduler:
+        intervals.update(scheduler.get_intervals())
+
+        def on_mode(mode, new_intervals):
+            intervals.update(new_intervals)
+        scheduler.set_callback(on_mode)
+
+    counts = {'uart_samples': 0, 'dht_samples': 0, 'broadcasts': 0,
+              'uart_wakeups': 0, 'dht_wakeups': 0, 'broadcast_wakeups': 0}
+    update_samples = []
+    latest_soil = [None]
+    sequence = [0]
+
+    def deliver(event_type, timestamp, **data):
+        # The event-driven broadcast thread wakes once per event
+        if scheduler:
+            sequence[0] += 1
+            event = BusEvent(sequence[0], event_type, data, timestamp)
+            start = time.perf_counter()
+            scheduler.handle_event(event)
+            update_samples.append(time.perf_counter() - start)
+            counts['broadcast_wakeups'] += 1
+            broadcast.offer(event_type, timestamp)
+
+    class Broadcast:
+        """Readings go out at most once per broadcast interval, other events at once"""
+        last_sent = -math.inf
+        deadline = None
+
+        def offer(self, event_type, timestamp):
+            if event_type == 'reading' and timestamp < self.last_sent + intervals['broadcast']:
+                if self.deadline is None:
+                    self.deadline = self.last_sent + intervals['broadcast']
+                    push(self.deadline, 'broadcast_flush')
+                return
+            self.send(timestamp)
+
+        def send(self, timestamp):
+            counts['broadcasts'] += 1
+            self.last_sent = timestamp
+            self.deadline = None
+
+    broadcast = Broadcast()
+    queue = []
+
+    def push(timestamp, kind):
+        heapq.heappush(queue, (timestamp, kind))
+
+    push(environment.start, 'uart')
+    push(environment.start, 'dht')
+    push(environment.start, 'tracking')
+    if not scheduler:
+        push(environment.start, 'broadcast')
+    for watered_at in environment.waterings:
+        push(watered_at - 1, 'irrigation_started')
+        push(watered_at - 1 + IRRIGATION_SECONDS, 'irrigation_finished')
+
+    tracking_errors = []
+    while queue:
+        timestamp, kind = heapq.heappop(queue)
+        if timestamp > environment.end:
+            break
+
+        if kind == 'uart':
+            counts['uart_wakeups'] += 1
+            counts['uart_samples'] += 1
+            latest_soil[0] = environment.soil_reading(timestamp)
+            deliver('reading', timestamp, sensor='soil_moisture', soil_moisture=latest_soil[0], read_at=timestamp)
+            push(timestamp + intervals['uart'], 'uart')
+        elif kind == 'dht':
+            counts['dht_wakeups'] += 1
+            counts['dht_samples'] += 1
+            temperature, humidity = environment.dht_reading(timestamp)
+            deliver('reading', timestamp, sensor='dht', temperature_c=temperature, humidity=humidity,
+                    read_at=timestamp)
+            push(timestamp + intervals['dht'], 'dht')
+        elif kind == 'broadcast':
+            # Fixed schedule: the loop wakes and broadcasts every interval
+            counts['broadcast_wakeups'] += 1
+            counts['broadcasts'] += 1
+            push(timestamp + FIXED_INTERVALS['broadcast'], 'broadcast')
+        elif kind == 'broadcast_flush':
+            if broadcast.deadline == timestamp:
+                counts['broadcast_wakeups'] += 1
+                broadcast.send(timestamp)
+        elif kind in ('irrigation_started', 'irrigation_finished'):
+            deliver(kind, timestamp, source='button', profile='standard', success=True)
+        elif kind == 'tracking':
+            if latest_soil[0] is not None:
+                tracking_errors.append(abs(latest_soil[0] - environment.moisture(timestamp)))
+            push(timestamp + 60, 'tracking')
+
+    counts['soil_tracking_error'] = sum(tracking_errors) / len(tracking_errors)
+    return counts, update_samples
+
+
+def bench_adaptive_sampling(api_server, system, args):
+    """Wakeups and samples per hour, fixed versus adaptive sampling, over a simulated trace"""
+    hours = args.sampling_days * 24
+    with quiet():
+        fixed, _ = simulate(Environment(args.sampling_days))
+        environment = Environment(args.sampling_days)
+        scheduler = AdaptiveScheduler()
+        adaptive, update_samples = simulate(environment, scheduler)
+        stats = scheduler.get_stats(now=environment.end)
+
+    result = summarize_latencies(update_samples, prefix='scheduler_update_')
+    for name, counts in (('fixed', fixed), ('adaptive', adaptive)):
+        wakeups = counts['uart_wakeups'] + counts['dht_wakeups'] + counts['broadcast_wakeups']
+        result[f'{name}_wakeups_per_hour'] = wakeups / hours
+        result[f'{name}_uart_samples'] = counts['uart_samples']
+        result[f'{name}_dht_samples'] = counts['dht_samples']
+        result[f'{name}_broadcasts'] = counts['broadcasts']
+        result[f'{name}_soil_tracking_error'] = counts['soil_tracking_error']
+    result['config'] = {
+        'days': args.sampling_days,
+        'waterings': len(environment.waterings),
+        'wakeup_reduction': round(1 - result['adaptive_wakeups_per_hour'] / result['fixed_wakeups_per_hour'], 3),
+        'mode_changes': stats['mode_changes'],
+        'mode_hours': {mode: round(seconds / 3600, 2) for mode, seconds in stats['mode_seconds'].items()}
+    }
+    return result
@@ -0,0 +1,106 @@
+"""
+Shutdown benchmarks: how long stop() takes for the API system and the
+hardware daemon on simulated hardware, idle, during the async startup
+self-tests and in the middle of an irrigation cycle, whether the valve
+was closed before the servo was released, and how long a configuration
+reload takes. Each case runs in a fresh process, as the GPIO pins can
+only be claimed once per process.
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import sim
+from benchmarks.harness import quiet
+from iot.libs.hardware_ipc import HardwareClient
+from iot.libs.servo_controller import VALVE_CLOSED
+
+IOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'iot')
+CASES = ('api_idle', 'api_self_test', 'api_irrigating', 'daemon_irrigating')
+
+
+def parked(servo):
+    """The PWM ended off, and the last position commanded was closed"""
+    values = [value for _, value in servo.commands]
+    positions = [value for value in values if value is not None]
+    return bool(values) and values[-1] is None and bool(positions) and positions[-1] == VALVE_CLOSED
+
+
+def run_case(case, state_dir, results):
+    sim.install_mock_pins()
+    result = {}
+    with quiet():
+        if case.startswith('daemon'):
+            sys.path.insert(0, IOT_DIR)
+            from hardware_daemon import HardwareDaemon
+            socket_path = os.path.join(state_dir, 'hardware.sock')
+            system = HardwareDaemon(socket_path=socket_path, state_dir=state_dir, self_test=False,
+                                    state_segment=None, dht_device=sim.SimulatedDHTDevice(),
+                                    serial_port=sim.SimulatedSerial())
+            system.start()
+            client = HardwareClient(socket_path, name='shutdown-bench')
+            client.connect(wait=5)
+        else:
+            import api_server
+            system = api_server.PlantTalkerAPI(
+                dht_device=sim.SimulatedDHTDevice(), serial_port=sim.SimulatedSerial(),
+                llm_client=sim.StubLLMClient(), state_dir=state_dir,
+                fast_start=case == 'api_self_test', self_test=case == 'api_self_test'
+            )
+            system.start()
+            client = None
+        servo = system.servo_controller.servo = sim.VirtualServo()
+
+        if case == 'api_idle':
+            system.uart_handler.wait_for_data(timeout=2)
+            start = time.perf_counter()
+            system.reload()
+            result['reload_ms'] = (time.perf_counter() - start) * 1000
+        elif case.endswith('irrigating'):
+            if client:
+                client.call('start_irrigation', 'standard', 'bench')
+            else:
+                system.start_irrigation('standard', source='bench')
+            # Into the open step of the cycle
+            time.sleep(1.0)
+
+        start = time.perf_counter()
+        system.stop()
+        result['stop_ms'] = (time.perf_counter() - start) * 1000
+        if client:
+            client.close()
+    if case.endswith('irrigating'):
+        result['parked'] = parked(servo)
+    results.put(result)
+
+
+def bench_shutdown(api_server, system, args):
+    """stop() time per case and configuration reload time"""
+    context = multiprocessing.get_context('spawn')
+    result = {}
+    parked_cases = {}
+    for case in CASES:
+        samples = []
+        for _ in range(args.shutdown_rounds):
+            with tempfile.TemporaryDirectory(prefix='planttalker-shutdown-') as state_dir:
+                results = context.Queue()
+                process = context.Process(target=run_case, args=(case, state_dir, results))
+                process.start()
+                outcome = results.get(timeout=60)
+                process.join()
+            samples.append(outcome['stop_ms'])
+            if 'reload_ms' in outcome:
+                result['reload_ms'] = outcome['reload_ms']
+            if 'parked' in outcome:
+                parked_cases[case] = parked_cases.get(case, True) and outcome['parked']
+        result[f'{case}_stop_ms'] = sum(samples) / len(samples)
+        result[f'{case}_stop_max_ms'] = max(samples)
+
+    result['config'] = {
+        'rounds': args.shutdown_rounds,
+        'valve_parked': parked_cases
+    }
+    return result
@@ -0,0 +1,136 @@
+"""
+Watchdog benchmarks: inject faults into simulated devices and the status
+broadcast thread and time how long the watchdog takes to get data flowing
+again. Faults: the serial adapter unplugged (every poll fails), a serial
+read that never returns, a DHT22 read that never returns, a DHT22 that
+fails every read, and the broadcast thread dying.
+"""
+
+import threading
+import time
+
+from benchmarks import sim
+from benchmarks.harness import quiet
+from iot.libs.alerts import RESOLVED
+from iot.libs.dht_sensor import DHTSensor
+from iot.libs.event_bus import ALERT
+from iot.libs.uart_handler import UARTHandler
+from iot.libs.watchdog import Watchdog, watch_uart, watch_dht
+
+# Fast enough that a fault is noticed within a few polls
+TICK = 0.02
+READ_INTERVAL = 0.05
+STALL_GRACE = 0.25
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.002)
+    return False
+
+
+def recovery_time(inject, recovered, rounds):
+    """Mean seconds from inject() until recovered(injected_at) holds"""
+    times = []
+    for _ in range(rounds):
+        injected_at = time.time()
+        inject()
+        if not wait_for(lambda: recovered(injected_at)):
+            raise RuntimeError("watchdog did not recover the fault")
+        times.append(time.time() - injected_at)
+        # Let the watchdog see the worker healthy before the next fault
+        time.sleep(TICK * 5)
+    return sum(times) / len(times)
+
+
+def bench_watchdog_recovery(api_server, system, args):
+    """Mean recovery time per injected fault, and the recoveries it took"""
+    rounds = args.watchdog_rounds
+    result = {}
+    serial_port = sim.SimulatedSerial(line_interval=0.01)
+    dht_device = sim.SimulatedDHTDevice()
+    with quiet():
+        uart_handler = UARTHandler(read_interval=READ_INTERVAL, serial_port=serial_port)
+        dht_sensor = DHTSensor(read_interval=READ_INTERVAL, max_retries=1, dht_device=dht_device)
+        watchdog = Watchdog(tick=TICK, backoff_base=TICK, backoff_max=TICK * 10)
+        watch_uart(watchdog, uart_handler, stale_after=1.0, max_errors=3, stall_grace=STALL_GRACE)
+        watch_dht(watchdog, dht_sensor, max_failures=3, stall_grace=STALL_GRACE)
+
+        # The API's own broadcast thread, killed by an emit that raises
+        updates = system.event_bus.subscribe(types=(ALERT,), name='watchdog-bench')
+        api_server.start_broadcast(system, updates)
+        watchdog.watch('status_broadcast', lambda reason: api_server.start_broadcast(system, updates),
+                       alive=lambda: api_server.broadcast_thread.is_alive())
+
+        uart_handler.start()
+        dht_sensor.start()
+        watchdog.start()
+    emit = api_server.socketio.emit
+    excepthook = threading.excepthook
+
+    def uart_fresh(injected_at):
+        return (uart_handler.get_data()['last_update_time'] or 0) > injected_at
+
+    def dht_fresh(injected_at):
+        return (dht_sensor.get_data()['last_read_time'] or 0) > injected_at
+
+    def kill_broadcast():
+        thread = api_server.broadcast_thread
+
+        def failing_emit(*emit_args, **kwargs):
+            api_server.socketio.emit = emit
+            raise RuntimeError("injected emit failure")
+        api_server.socketio.emit = failing_emit
+        # The thread dies of it; keep its traceback out of the report
+        threading.excepthook = lambda hook_args: None
+        system.event_bus.publish(ALERT, {'state': RESOLVED, 'rule': 'watchdog-bench'})
+        wait_for(lambda: not thread.is_alive())
+        kill_broadcast.thread = thread
+
+    try:
+        with quiet():
+            wait_for(lambda: uart_fresh(0) and dht_fresh(0))
+
+            def unplug():
+                serial_port.fault = 'disconnected'
+            result['serial_disconnect_recovery_ms'] = recovery_time(unplug, uart_fresh, rounds) * 1000
+
+            def hang():
+                serial_port.fault = 'hang'
+            result['serial_hang_recovery_ms'] = recovery_time(hang, uart_fresh, rounds) * 1000
+
+            def wedge():
+                dht_device.fault = 'wedged'
+            result['dht_wedge_recovery_ms'] = recovery_time(wedge, dht_fresh, rounds) * 1000
+
+            def fail():
+                dht_device.fault = 'failing'
+            result['dht_failing_recovery_ms'] = recovery_time(fail, dht_fresh, rounds) * 1000
+
+            def broadcast_restarted(injected_at):
+                thread = api_server.broadcast_thread
+                return thread is not kill_broadcast.thread and thread.is_alive()
+            result['broadcast_restart_ms'] = recovery_time(kill_broadcast, broadcast_restarted, rounds) * 1000
+    finally:
+        api_server.socketio.emit = emit
+        threading.excepthook = excepthook
+        with quiet():
+            watchdog.stop()
+            uart_handler.stop()
+            dht_sensor.stop()
+            updates.close()
+            api_server.broadcast_thread.join()
+
+    stats = watchdog.get_stats()
+    result['config'] = {
+        'rounds': rounds,
+        'tick_s': TICK,
+        'read_interval_s': READ_INTERVAL,
+        'stall_grace_s': STALL_GRACE,
+        'recoveries': {name: entry['recoveries'] for name, entry in stats.items()},
+        'recovery_errors': {name: entry['recovery_errors'] for name, entry in stats.items()}
+    }
+    return result
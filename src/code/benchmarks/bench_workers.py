@@ -0,0 +1,192 @@
+"""
+API worker benchmarks: /api/status req/s served by 1 to N api_server worker
+processes sharing one listening socket, each reading the state from the
+shared-memory segment of a simulated hardware daemon, and the cost of a
+state read from the segment versus a round trip to the daemon.
+"""
+
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+
+from benchmarks import sim
+from benchmarks.harness import quiet, summarize_latencies, time_calls
+from iot.libs.hardware_ipc import HardwareClient
+from iot.libs.rate_limiter import DEFAULT_LIMITS
+from iot.libs.shared_state import SharedStateReader
+
+IOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'iot')
+LOAD_CLIENTS = 8
+
+
+def run_daemon(socket_path, segment_path, state_dir, ready, stop):
+    """Hardware daemon on simulated devices, in a process of its own"""
+    sys.path.insert(0, IOT_DIR)
+    sim.install_mock_pins()
+    from hardware_daemon import HardwareDaemon
+
+    with quiet():
+        daemon = HardwareDaemon(socket_path=socket_path, state_dir=state_dir, self_test=False,
+                                state_segment=segment_path, dht_device=sim.SimulatedDHTDevice(),
+                                serial_port=sim.SimulatedSerial())
+        daemon.start()
+        ready.set()
+        stop.wait()
+        daemon.stop()
+
+
+def run_worker(listener, number, limits_path, etag_epoch, system_options):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with quiet():
+        import api_server
+        api_server.run_worker(listener, number, limits_path, etag_epoch,
+                              dict(system_options, llm_client=sim.StubLLMClient()))
+
+
+def run_load(port, start_at, duration, results):
+    """Request /api/status on a new connection each time, so the kernel
+    spreads the requests over the workers"""
+    time.sleep(max(0.0, start_at - time.time()))
+    requests = errors = 0
+    deadline = start_at + duration
+    while time.time() < deadline:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            connection.request('GET', '/api/status')
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                requests += 1
+            else:
+                errors += 1
+        except OSError:
+            errors += 1
+        finally:
+            connection.close()
+    results.put((requests, errors))
+
+
+def wait_for_workers(port, count, timeout=60):
+    """Until /api/health has been answered by count different worker processes"""
+    pids = set()
+    deadline = time.time() + timeout
+    while len(pids) < count and time.time() < deadline:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('GET', '/api/health')
+            response = connection.getresponse()
+            health = json.loads(response.read())
+            if response.status == 200 and health['worker'] and health['state_segment']['version']:
+                pids.add(health['worker']['pid'])
+        except (OSError, ValueError, KeyError, TypeError):
+            time.sleep(0.2)
+        finally:
+            connection.close()
+    return len(pids) == count
+
+
+def measure_workers(context, count, directory, options, duration):
+    """Requests per second with count workers behind one listening socket"""
+    listener = socket.create_server(('127.0.0.1', 0), backlog=128)
+    port = listener.getsockname()[1]
+    limits_path = os.path.join(directory, 'no-limits.json')
+    workers = [context.Process(target=run_worker,
+                               args=(listener, number, limits_path, 'bench', options))
+               for number in range(1, count + 1)]
+    for worker in workers:
+        worker.start()
+    try:
+        if not wait_for_workers(port, count):
+            raise RuntimeError(f"{count} API workers did not come up")
+        results = context.Queue()
+        start_at = time.time() + 1.0
+        clients = [context.Process(target=run_load, args=(port, start_at, duration, results))
+                   for _ in range(LOAD_CLIENTS)]
+        for client in clients:
+            client.start()
+        totals = [results.get(timeout=duration + 30) for _ in clients]
+        for client in clients:
+            client.join()
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join(timeout=10)
+        listener.close()
+    requests = sum(requests for requests, _ in totals)
+    errors = sum(errors for _, errors in totals)
+    return requests / duration, errors
+
+
+def bench_api_workers(api_server, system, args):
+    """/api/status req/s for 1..N worker processes and shared versus IPC state reads"""
+    context = multiprocessing.get_context('spawn')
+    result = {}
+    with tempfile.TemporaryDirectory(prefix='planttalker-workers-') as directory:
+        socket_path = os.path.join(directory, 'hardware.sock')
+        segment_path = os.path.join(directory, 'state')
+        with open(os.path.join(directory, 'no-limits.json'), 'w') as f:
+            json.dump(dict.fromkeys(DEFAULT_LIMITS), f)
+
+        ready, stop = context.Event(), context.Event()
+        daemon = context.Process(target=run_daemon, args=(socket_path, segment_path, directory, ready, stop))
+        daemon.start()
+        try:
+            if not ready.wait(30):
+                raise RuntimeError("Simulated hardware daemon did not start")
+
+            with quiet():
+                client = HardwareClient(socket_path, name='bench')
+                client.connect(wait=5)
+                reader = SharedStateReader(segment_path)
+                deadline = time.time() + 10
+                while reader.read() is None and time.time() < deadline:
+                    time.sleep(0.1)
+
+                shared_samples, _ = time_calls(reader.read, args.iterations)
+
+                def read_changed():
+                    # As after a daemon write: copy, CRC check and decode
+                    reader.sequence = None
+                    reader.read()
+                changed_samples, _ = time_calls(read_changed, args.iterations)
+                ipc_samples, _ = time_calls(lambda: client.call('get_state'), args.iterations)
+                client.close()
+                reader.close()
+
+            options = {
+                'fast_start': True,
+                'self_test': False,
+                'state_dir': directory,
+                'knowledge_dir': None,
+                'hardware_socket': socket_path,
+                'state_segment': segment_path
+            }
+            errors = 0
+            for count in args.api_workers:
+                rate, failed = measure_workers(context, count, directory, options, args.duration)
+                result[f'status_{count}w_req_per_s'] = rate
+                errors += failed
+        finally:
+            stop.set()
+            daemon.join(timeout=15)
+
+    result.update(summarize_latencies(shared_samples, prefix='shared_read_'))
+    result.update(summarize_latencies(changed_samples, prefix='shared_read_changed_'))
+    result.update(summarize_latencies(ipc_samples, prefix='ipc_read_'))
+    counts = args.api_workers
+    result['config'] = {
+        'workers': counts,
+        'cpus': os.cpu_count(),
+        'load_clients': LOAD_CLIENTS,
+        'connection': 'new per request',
+        'errors': errors,
+        'speedup': round(result[f'status_{counts[-1]}w_req_per_s'] / result[f'status_{counts[0]}w_req_per_s'], 2)
+    }
+    return result
@@ -0,0 +1,114 @@
+"""
+Shared helpers for the Plant Talker benchmarks: timing, percentiles,
+JSON result files and baseline comparison.
+"""
+
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize_latencies(samples, prefix=''):
+    """Summarize a list of durations (seconds) as millisecond metrics"""
+    return {
+        f'{prefix}mean_ms': statistics.mean(samples) * 1000 if samples else 0.0,
+        f'{prefix}p50_ms': percentile(samples, 50) * 1000,
+        f'{prefix}p99_ms': percentile(samples, 99) * 1000,
+        f'{prefix}max_ms': max(samples) * 1000 if samples else 0.0,
+    }
+
+
+def time_calls(fn, iterations):
+    """Call fn repeatedly, returning per-call durations and the throughput"""
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    return samples, iterations / elapsed if elapsed > 0 else 0.0
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the component print() logging while a benchmark runs"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def build_report(results):
+    return {
+        'meta': {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+
+def compare_reports(current, baseline, threshold=0.10):
+    """Compare two reports metric by metric.
+
+    Returns a list of (benchmark, metric, baseline, current, change, regressed)
+    rows. change is the relative difference, signed so that positive always
+    means "worse".
+    """
+    rows = []
+    for name, metrics in current['results'].items():
+        base_metrics = baseline.get('results', {}).get(name)
+        if not base_metrics:
+            continue
+        for metric, value in metrics.items():
+            base_value = base_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base_value, (int, float)) or base_value == 0:
+                continue
+            change = (value - base_value) / abs(base_value)
+            if higher_is_better(metric):
+                change = -change
+            rows.append((name, metric, base_value, value, change, change > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"{'benchmark':<22} {'metric':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    print("-" * 87)
+    for name, metric, base_value, value, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<22} {metric:<28} {base_value:>12.3f} {value:>12.3f} {change:>+8.1%}{flag}")
+    regressions = sum(1 for row in rows if row[5])
+    print("-" * 87)
+    print(f"{regressions} regression(s) above {threshold:.0%} threshold")
+    return regressions
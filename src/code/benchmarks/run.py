@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Plant Talker benchmark runner
+
+Runs the benchmark suite offline on simulated hardware with a stub LLM and
+writes the results as JSON. With --compare, the results are checked against
+a stored baseline and the exit code is non-zero when a metric regressed.
+
+Run from src/code:
+    python3 -m benchmarks.run --output results.json
+    python3 -m benchmarks.run --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+
+from benchmarks.harness import (build_report, compare_reports, load_report, log,
+                                print_comparison, quiet, save_report)
+from benchmarks import (bench_alerts, bench_api, bench_button, bench_chat, bench_export, bench_forecast,
+                        bench_knowledge, bench_motion, bench_ipc, bench_pipeline, bench_profiling, bench_sampling,
+                        bench_shutdown, bench_watchdog, bench_workers)
+from benchmarks import sim
+
+
+BENCHMARKS = {
+    'uart_parse': bench_pipeline.bench_uart_parse,
+    'state_contention': bench_pipeline.bench_state_contention,
+    'event_publish': bench_pipeline.bench_event_publish,
+    'startup': bench_pipeline.bench_startup,
+    'api_status': bench_api.bench_api_status,
+    'websocket_fanout': bench_api.bench_websocket_fanout,
+    'status_longpoll': bench_api.bench_status_longpoll,
+    'http_caching': bench_api.bench_http_caching,
+    'rate_limits': bench_api.bench_rate_limits,
+    'irrigation': bench_api.bench_irrigation,
+    'irrigation_motion': bench_motion.bench_irrigation_motion,
+    'button_gestures': bench_button.bench_button_gestures,
+    'chat': bench_chat.bench_chat,
+    'knowledge_retrieval': bench_knowledge.bench_knowledge_retrieval,
+    'moisture_forecast': bench_forecast.bench_moisture_forecast,
+    'adaptive_sampling': bench_sampling.bench_adaptive_sampling,
+    'hardware_ipc': bench_ipc.bench_hardware_ipc,
+    'api_workers': bench_workers.bench_api_workers,
+    'alert_engine': bench_alerts.bench_alert_engine,
+    'history_export': bench_export.bench_history_export,
+    'lock_tracing': bench_profiling.bench_lock_tracing,
+    'watchdog_recovery': bench_watchdog.bench_watchdog_recovery,
+    'shutdown': bench_shutdown.bench_shutdown,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Plant Talker benchmark suite")
+    parser.add_argument('benchmarks', nargs='*', metavar='NAME',
+                        help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--output', metavar='PATH', help="Write the JSON report to PATH")
+    parser.add_argument('--compare', metavar='PATH', help="Compare against a baseline report")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative change counted as a regression (default: 0.10)")
+    parser.add_argument('--iterations', type=int, default=2000, help="Iterations for micro benchmarks")
+    parser.add_argument('--threads', type=int, default=4, help="Concurrent threads for contention benchmarks")
+    parser.add_argument('--duration', type=float, default=2.0, help="Seconds for timed load phases")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50],
+                        help="WebSocket client counts for the fan-out benchmark")
+    parser.add_argument('--broadcasts', type=int, default=50, help="Broadcasts per client count")
+    parser.add_argument('--longpoll-rounds', type=int, default=10, help="State versions per long-poll client count")
+    parser.add_argument('--poll-requests', type=int, default=500,
+                        help="Requests per endpoint and mode for the HTTP caching benchmark")
+    parser.add_argument('--irrigations', type=int, default=3, help="Irrigation cycles to time")
+    parser.add_argument('--button-rounds', type=int, default=2, help="Passes over the button bounce patterns")
+    parser.add_argument('--chats', type=int, default=10, help="Chat requests to time")
+    parser.add_argument('--knowledge-chunks', type=int, default=3000,
+                        help="Chunks in the synthetic knowledge base")
+    parser.add_argument('--forecast-days', type=float, default=21,
+                        help="Days of simulated soil moisture replayed through the forecaster")
+    parser.add_argument('--sampling-days', type=float, default=7,
+                        help="Days simulated for the fixed versus adaptive sampling comparison")
+    parser.add_argument('--ipc-events', type=int, default=20000,
+                        help="Readings streamed to the subscriber in the hardware IPC benchmark")
+    parser.add_argument('--api-workers', type=int, nargs='+', default=[1, 2, 3, 4],
+                        help="API worker process counts to measure /api/status req/s for")
+    parser.add_argument('--alert-rules-count', type=int, nargs='+', default=[100, 1000, 5000],
+                        help="Alert rule counts to time reading evaluation for")
+    parser.add_argument('--alert-plants', type=int, default=200, help="Plants the alert rules are spread over")
+    parser.add_argument('--export-rows', type=int, default=10_000_000,
+                        help="Readings in the store the history export benchmark exports")
+    parser.add_argument('--watchdog-rounds', type=int, default=5,
+                        help="Times each fault is injected in the watchdog benchmark")
+    parser.add_argument('--shutdown-rounds', type=int, default=3,
+                        help="Fresh processes started and stopped per shutdown case")
+    parser.add_argument('--token-delay', type=float, default=0.005, help="Stub LLM delay per token (s)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = args.benchmarks or list(BENCHMARKS)
+
+    state_dir = tempfile.TemporaryDirectory(prefix='planttalker-bench-')
+    with quiet():
+        api_server, system = sim.build_system(token_delay=args.token_delay, state_dir=state_dir.name)
+        sim.prime_readings(system)
+
+    results = {}
+    try:
+        for name in selected:
+            log(f"[BENCH] Running {name}...")
+            results[name] = BENCHMARKS[name](api_server, system, args)
+            log(f"[BENCH] {name}: {json.dumps({k: v for k, v in results[name].items() if k != 'config'})}")
+    finally:
+        with quiet():
+            system.stop()
+        state_dir.cleanup()
+
+    report = build_report(results)
+    if args.output:
+        save_report(report, args.output)
+        log(f"[BENCH] Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.compare:
+        rows = compare_reports(report, load_report(args.compare), args.threshold)
+        if print_comparison(rows, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Simulated hardware and a stub LLM so the benchmarks run offline on a laptop.
+
+The GPIO components (LEDs, button, servo) run on gpiozero's mock pin
+factory; the DHT22 and ESP32 are replaced by the device objects below.
+"""
+
+import random
+import threading
+import time
+
+
+class SimulatedSerial:
+    """serial.Serial stand-in producing ESP32-style moisture lines.
+
+    Set fault to 'disconnected' to fail every poll the way an unplugged
+    USB-serial adapter does, or 'hang' to block the next read until the
+    port is closed; reopening clears either.
+    """
+
+    def __init__(self, line_interval=1.0, start_moisture=50, seed=0):
+        self.line_interval = line_interval
+        self.moisture = start_moisture
+        self.random = random.Random(seed)
+        self.next_line_time = time.time()
+        self.written = []
+        self.fault = None
+        self.is_open = True
+        self.closed = threading.Event()
+
+    @property
+    def in_waiting(self):
+        if self.fault == 'disconnected' or not self.is_open:
+            raise OSError(5, "Input/output error")
+        if self.fault == 'hang':
+            return 1
+        return 1 if time.time() >= self.next_line_time else 0
+
+    def readline(self):
+        if self.fault == 'hang':
+            self.closed.wait()
+            raise OSError(9, "Bad file descriptor")
+        self.next_line_time = time.time() + self.line_interval
+        self.moisture = max(1, min(100, self.moisture + self.random.choice((-1, 0, 0, 1))))
+        return f"Moisture = {self.moisture}%\n".encode('utf-8')
+
+    def write(self, data):
+        self.written.append(data)
+        # Honour rate commands the way the ESP32 firmware does
+        command = data.decode('utf-8').split()
+        if len(command) == 2 and command[0] == 'RATE':
+            self.line_interval = float(command[1])
+        return len(data)
+
+    def open(self):
+        self.fault = None
+        self.is_open = True
+        self.closed.clear()
+
+    def close(self):
+        self.is_open = False
+        self.closed.set()
+
+
+class SimulatedDHTDevice:
+    """adafruit_dht.DHT22 stand-in with a configurable checksum failure rate.
+
+    Set fault to 'failing' to fail every read, or 'wedged' to block the
+    next read until exit(); exit() releases the sensor and clears either.
+    """
+
+    def __init__(self, temperature_c=22.0, humidity=55.0, failure_rate=0.0, seed=0):
+        self.temperature_c = temperature_c
+        self.humidity_value = humidity
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.fault = None
+        self.released = threading.Event()
+
+    @property
+    def temperature(self):
+        if self.fault == 'wedged':
+            self.released.wait()
+            self.released.clear()
+            raise RuntimeError("DHT sensor not found, check wiring")
+        if self.fault == 'failing' or self.random.random() < self.failure_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+        return self.temperature_c + self.random.uniform(-0.2, 0.2)
+
+    @property
+    def humidity(self):
+        return self.humidity_value + self.random.uniform(-0.5, 0.5)
+
+    def exit(self):
+        if self.fault == 'wedged':
+            self.released.set()
+        self.fault = None
+
+
+class VirtualServo:
+    """gpiozero.Servo stand-in recording every commanded value with its time"""
+
+    def __init__(self):
+        self._value = None
+        self.commands = []
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.commands.append((time.monotonic(), value))
+
+    def min(self):
+        self.value = -1.0
+
+    def mid(self):
+        self.value = 0.0
+
+    def max(self):
+        self.value = 1.0
+
+    def close(self):
+        pass
+
+
+class StubLLMClient:
+    """Mimics the ollama module's chat() with a fixed per-token delay"""
+
+    def __init__(self, token_delay=0.005, tokens=40):
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _tokens(self):
+        for i in range(self.tokens):
+            time.sleep(self.token_delay)
+            yield f"token{i} "
+
+    def chat(self, model, messages, stream=False):
+        with self.lock:
+            self.calls += 1
+        if stream:
+            return ({'message': {'content': token}} for token in self._tokens())
+        return {'message': {'content': "".join(self._tokens())}}
+
+    def list(self):
+        return {'models': [{'model': 'llama3.2:1b', 'name': 'llama3.2:1b'}]}
+
+
+def install_mock_pins():
+    from gpiozero import Device
+    from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+    Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+
+
+def build_system(token_delay=0.005, dht_failure_rate=0.0, state_dir=None):
+    """Create a PlantTalkerAPI on simulated hardware and install it as the
+    api_server's global system. Returns (api_server module, system)."""
+    install_mock_pins()
+
+    import api_server
+
+    if api_server.plant_system is not None:
+        api_server.plant_system.stop()
+
+    system = api_server.PlantTalkerAPI(
+        dht_device=SimulatedDHTDevice(failure_rate=dht_failure_rate),
+        serial_port=SimulatedSerial(),
+        llm_client=StubLLMClient(token_delay=token_delay),
+        state_dir=state_dir
+    )
+    api_server.plant_system = system
+    # Benchmarks drive the routes from one address far faster than a real
+    # client; the rate_limits benchmark turns the limits on for itself
+    api_server.rate_limiter.configure({})
+    return api_server, system
+
+
+def prime_readings(system, moisture=45):
+    """Push one reading through each sensor so the state is fully populated"""
+    system.uart_handler._handle_line(f"Moisture = {moisture}%")
+    system.dht_sensor._read_once()
+
+
+def advance_state(system, moisture=45):
+    """Take a new state version by pushing a fresh soil reading"""
+    system.uart_handler._handle_line(f"Moisture = {moisture}%")
+    return system.system_state.take_snapshot()
@@ -0,0 +1,70 @@
+"""
+Measure how long the API server takes to answer its first request.
+
+Runs one bring-up on simulated hardware and prints the timings as JSON.
+bench_startup runs it in a fresh process per mode so imports and GPIO
+setup are counted every time:
+
+    python3 -m benchmarks.startup_probe [--fast-start]
+"""
+
+import time
+
+PROBE_START = time.perf_counter()
+
+import argparse
+import json
+import threading
+
+from benchmarks.harness import quiet
+from benchmarks import sim
+
+
+def wait_for(client, path, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if client.get(path).status_code == 200:
+            return time.perf_counter() - PROBE_START
+        time.sleep(0.005)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plant Talker startup probe")
+    parser.add_argument('--fast-start', action='store_true')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    with quiet():
+        sim.install_mock_pins()
+        import api_server
+
+        options = {
+            'fast_start': args.fast_start,
+            'dht_device': sim.SimulatedDHTDevice(),
+            'serial_port': sim.SimulatedSerial(),
+            'llm_client': sim.StubLLMClient()
+        }
+
+        if args.fast_start:
+            threading.Thread(target=api_server.start_system, kwargs=options, daemon=True).start()
+        else:
+            api_server.start_system(**options)
+
+        # The server socket is listening from here on
+        serving = time.perf_counter() - PROBE_START
+        client = api_server.app.test_client()
+        first_status = wait_for(client, '/api/status', args.timeout)
+        ready = wait_for(client, '/api/health/ready', args.timeout)
+
+        api_server.plant_system.stop()
+
+    print(json.dumps({
+        'serving_ms': serving * 1000,
+        'first_status_ms': first_status * 1000 if first_status is not None else None,
+        'ready_ms': ready * 1000 if ready is not None else None
+    }))
+
+
+if __name__ == '__main__':
+    main()
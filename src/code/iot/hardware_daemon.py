@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Plant Talker Hardware Daemon
+Owns the sensors, LEDs, button and irrigation valve and serves their state,
+events and commands over a Unix domain socket, so the API server, the CLI
+and the chat tool can run side by side as thin clients
+"""
+
+import argparse
+import os
+import signal
+import threading
+import time
+from libs.local_hardware import LocalHardware
+from libs.health_monitor import HealthMonitor
+from libs.watchdog import Watchdog
+from libs.hardware_ipc import HardwareServer
+from libs.shared_state import SharedStateWriter, DEFAULT_PATH as DEFAULT_STATE_SEGMENT
+from libs.alerts import WebhookSink, FileSink
+from libs.profiling import SamplingProfiler, LockTracer
+from libs.event_bus import EventBus, READING, IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+DEFAULT_SOCKET = os.path.join(DEFAULT_STATE_DIR, 'hardware.sock')
+
+
+class HardwareDaemon:
+    def __init__(self, socket_path=DEFAULT_SOCKET, state_dir=DEFAULT_STATE_DIR, irrigation_profiles=None,
+                 self_test=True, state_segment=DEFAULT_STATE_SEGMENT, dht_device=None, serial_port=None,
+                 alert_rules=None, alert_sinks=None):
+        print("[DAEMON] Initializing hardware daemon...")
+        self.started_at = time.time()
+
+        # Latest state in shared memory for API workers, rewritten on every
+        # change; the LED state is part of it
+        self.state_segment = SharedStateWriter(state_segment) if state_segment else None
+        self.state_lock = threading.Lock()
+
+        self.event_bus = EventBus()
+        self.local = LocalHardware.create(self.event_bus, dht_device=dht_device, serial_port=serial_port,
+                                          self_test=self_test, irrigation_profiles=irrigation_profiles,
+                                          state_dir=state_dir, alert_rules=alert_rules,
+                                          on_leds_updated=self._publish_state)
+        # Alert rules evaluated once for all clients; alerts reach them as bus events
+        self.local.add_alert_outbox(os.path.join(state_dir, 'alerts.db'), alert_sinks or ())
+        self.local.expose(self)
+
+        if self.state_segment:
+            self.event_bus.subscribe_callback(self._publish_state,
+                                              types=(READING, IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS),
+                                              name='shared-state')
+
+        self.health_monitor = HealthMonitor()
+        self.local.add_probes(self.health_monitor)
+
+        # Restarts stalled or dead read loops and reopens failed devices
+        self.watchdog = Watchdog()
+        self.local.watch(self.watchdog)
+
+        # Profiled and traced on demand by clients (/api/admin/...?process=daemon)
+        self.profiler = SamplingProfiler()
+        self.lock_tracer = LockTracer()
+        self.lock_tracer.register('system_state', self.system_state)
+        self.lock_tracer.register('servo', self.servo_controller)
+        self.lock_tracer.register('servo_motion', self.servo_controller, 'motion_lock')
+        self.lock_tracer.register('uart', self.uart_handler)
+        self.lock_tracer.register('dht', self.dht_sensor)
+
+        self.server = HardwareServer(socket_path, self.event_bus)
+        self._register_commands()
+        self.running = False
+        self.stop_event = threading.Event()
+
+        print(f"[DAEMON] Initialized in {time.time() - self.started_at:.2f}s")
+
+    def _register_commands(self):
+        server = self.server
+        server.register('ping', lambda: {'pid': os.getpid(), 'uptime_s': time.time() - self.started_at})
+        server.register('get_state', self.system_state.get_full_state)
+        server.register('get_readiness', self.get_readiness)
+        server.register('get_liveness', self.get_liveness)
+        server.register('get_sampling', self.scheduler.get_stats)
+        server.register('get_servo_state', self.servo_controller.get_state)
+        server.register('get_profiles', self.servo_controller.get_profiles)
+        server.register('start_irrigation', lambda profile='standard', source='manual':
+                        self.servo_controller.start_irrigation(profile=profile, source=source))
+        # Holds a worker until the cycle has finished
+        server.register('irrigate', lambda profile='standard', source='manual':
+                        self.servo_controller.irrigate(profile=profile, source=source), blocking=True)
+        server.register('cancel_irrigation', lambda emergency=False: self.servo_controller.cancel(emergency=emergency))
+        server.register('get_led_state', self.led_controller.get_state)
+        server.register('update_leds', self.led_controller.update_leds)
+        server.register('list_irrigations', self.irrigation_log.list_events)
+        server.register('irrigation_stats', self.irrigation_log.get_stats)
+        server.register('irrigation_log_version', lambda: self.irrigation_log.version)
+        server.register('list_alerts', self.alert_engine.get_alerts)
+        server.register('alert_stats', self.alert_engine.get_stats)
+        server.register('start_profile', self.profiler.start)
+        server.register('stop_profile', self.profiler.stop)
+        server.register('get_profile', self.profiler.get_profile)
+        server.register('trace_locks', self.lock_tracer.set_enabled)
+        server.register('lock_stats', self.lock_tracer.get_stats)
+        server.register('reload', self.reload)
+        server.register('get_stats', lambda: {
+            'ipc': server.get_stats(),
+            'bus': self.event_bus.get_stats(),
+            'state_segment': self.state_segment.get_stats() if self.state_segment else None,
+            'alert_outbox': self.alert_outbox.get_stats(),
+            'watchdog': self.watchdog.get_stats()
+        })
+
+    def _publish_state(self, event=None):
+        # Called from the LED and shared-state subscribers' threads; snapshot
+        # and write together, so an older snapshot never overwrites a newer one
+        if self.state_segment:
+            with self.state_lock:
+                self.state_segment.write(self.system_state.take_snapshot())
+
+    def reload(self):
+        """Re-read the irrigation profiles and alert rules; the devices stay
+        open. A file that does not load keeps its previous settings.
+        Returns the errors, if any."""
+        return self.local.reload()
+
+    def get_readiness(self):
+        uart_ready = self.uart_handler.first_data_event.is_set()
+        dht_ready = self.dht_sensor.first_data_event.is_set()
+        report = self.health_monitor.get_report()
+        return {
+            'ready': self.running and uart_ready and dht_ready and report['ready'],
+            'running': self.running,
+            'soil_moisture_received': uart_ready,
+            'temperature_received': dht_ready,
+            'checks': report['checks']
+        }
+
+    def get_liveness(self):
+        threads = {
+            'health_monitor': self.health_monitor.is_alive(),
+            'watchdog': self.watchdog.is_alive(),
+            'dht_sensor': self.dht_sensor.thread is not None and self.dht_sensor.thread.is_alive(),
+            'uart_handler': self.uart_handler.thread is not None and self.uart_handler.thread.is_alive(),
+            'ipc_server': self.server.thread is not None and self.server.thread.is_alive()
+        }
+        return {
+            'alive': self.running and all(threads.values()),
+            'threads': threads
+        }
+
+    def start(self):
+        print("[DAEMON] Starting hardware components...")
+        self.dht_sensor.start()
+        self.uart_handler.start()
+        self.button_handler.start()
+        self.journal.start()
+        self.alert_engine.start()
+        self.alert_outbox.start()
+        self.health_monitor.start()
+        self.watchdog.start()
+        self.server.start()
+        self._publish_state()
+        self.running = True
+        print("[DAEMON] Hardware daemon running")
+
+    def stop(self):
+        print("[DAEMON] Stopping hardware daemon...")
+        self.running = False
+        self.stop_event.set()
+        # Park the valve first: a running cycle is cut short with the valve
+        # closed, and no new one starts while the rest shuts down
+        self.servo_controller.cleanup()
+        self.button_handler.stop()
+        self.server.stop()
+        self.watchdog.stop()
+        self.health_monitor.stop()
+        self.dht_sensor.stop()
+        self.uart_handler.stop()
+        self.led_controller.cleanup()
+        self.event_bus.close()
+        if self.state_segment:
+            self.state_segment.close()
+        self.alert_engine.stop()
+        self.alert_outbox.stop()
+        self.journal.stop()
+        self.irrigation_log.close()
+        self.history_store.close()
+        print("[DAEMON] Hardware daemon stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plant Talker hardware daemon")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help="Unix socket to serve clients on (default: %(default)s)")
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR,
+                        help="Directory for persisted counters and history (default: %(default)s)")
+    parser.add_argument('--irrigation-profiles', metavar='PATH',
+                        help="JSON file with irrigation profiles and valve calibration")
+    parser.add_argument('--alert-rules', metavar='PATH',
+                        help="JSON file overriding the alert rules (null disables a rule)")
+    parser.add_argument('--alert-webhook', metavar='URL',
+                        help="Also POST alert notifications to URL")
+    parser.add_argument('--alert-log', metavar='PATH',
+                        help="Also append alert notifications to a JSON lines file")
+    parser.add_argument('--state-segment', default=DEFAULT_STATE_SEGMENT,
+                        help="Shared-memory file the latest state is published in for API workers "
+                             "(default: %(default)s, '' to disable)")
+    parser.add_argument('--skip-self-test', action='store_true',
+                        help="Skip the LED blink test and servo test move at startup")
+    args = parser.parse_args()
+
+    alert_sinks = []
+    if args.alert_webhook:
+        alert_sinks.append(WebhookSink(args.alert_webhook))
+    if args.alert_log:
+        alert_sinks.append(FileSink(args.alert_log))
+
+    daemon = HardwareDaemon(socket_path=args.socket, state_dir=args.state_dir,
+                            irrigation_profiles=args.irrigation_profiles, self_test=not args.skip_self_test,
+                            state_segment=args.state_segment, alert_rules=args.alert_rules,
+                            alert_sinks=alert_sinks)
+
+    def shutdown(sig, frame):
+        print("\n[DAEMON] Shutdown signal received")
+        daemon.stop_event.set()
+
+    def reload(sig, frame):
+        print("\n[DAEMON] Reloading configuration")
+        threading.Thread(target=daemon.reload, daemon=True).start()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGHUP, reload)
+
+    daemon.start()
+    try:
+        daemon.stop_event.wait()
+    finally:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
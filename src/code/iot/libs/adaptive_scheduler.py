@@ -0,0 +1,145 @@
+import collections
+import time
+from threading import Lock
+
+
+ACTIVE = 'active'
+CHANGING = 'changing'
+STABLE = 'stable'
+
+# Seconds between soil readings, DHT reads and status broadcasts per mode
+DEFAULT_INTERVALS = {
+    ACTIVE: {'uart': 1, 'dht': 5, 'broadcast': 0.5},
+    CHANGING: {'uart': 2, 'dht': 10, 'broadcast': 2},
+    STABLE: {'uart': 30, 'dht': 60, 'broadcast': 30}
+}
+
+# Shift between the mean of the last change_window and the one before it
+# that counts as the signal changing
+DEFAULT_THRESHOLDS = {
+    'soil_moisture': 2,
+    'temperature_c': 0.5,
+    'humidity': 3.0
+}
+
+
+class AdaptiveScheduler:
+    """Chooses sampling and broadcast intervals from what the plant is doing.
+
+    The mode is ACTIVE while irrigating and for settle_time seconds after,
+    CHANGING while the mean of any reading over the last change_window
+    seconds differs from its mean over the window before by more than its
+    threshold (and for calm_after seconds since), and STABLE otherwise.
+    Comparing window means rather than single readings keeps sensor noise
+    from holding the fast rates. Modes are re-evaluated on each event, so no
+    timer thread is needed: in every mode some sensor keeps reporting.
+    """
+
+    def __init__(self, intervals=None, thresholds=None, change_window=300, calm_after=600, settle_time=600):
+        self.intervals = intervals or DEFAULT_INTERVALS
+        self.thresholds = thresholds or DEFAULT_THRESHOLDS
+        self.change_window = change_window
+        self.calm_after = calm_after
+        self.settle_time = settle_time
+        self.lock = Lock()
+        self.callback = None
+        # Per field: [recent readings, older readings, recent sum, older sum]
+        self.windows = {field: [collections.deque(), collections.deque(), 0.0, 0.0] for field in self.thresholds}
+        self.irrigating = False
+        self.last_irrigation = None
+        self.last_change = None
+        self.mode = CHANGING
+        self.mode_since = None
+        self.mode_changes = 0
+        self.mode_seconds = dict.fromkeys(self.intervals, 0.0)
+
+    def set_callback(self, callback):
+        """callback(mode, intervals) runs whenever the mode changes"""
+        with self.lock:
+            self.callback = callback
+
+    def get_intervals(self):
+        with self.lock:
+            return dict(self.intervals[self.mode])
+
+    def handle_event(self, event):
+        """Event bus subscriber for reading and irrigation events"""
+        now = event.data.get('read_at', event.timestamp)
+        if event.type == 'reading':
+            self.observe(event.data, now)
+        elif event.type == 'irrigation_started':
+            self.set_irrigating(True, now)
+        elif event.type == 'irrigation_finished':
+            self.set_irrigating(False, now)
+
+    def observe(self, reading, now):
+        with self.lock:
+            for field, threshold in self.thresholds.items():
+                value = reading.get(field)
+                if value is None:
+                    continue
+                window = self.windows[field]
+                recent, older = window[0], window[1]
+                recent.append((now, value))
+                window[2] += value
+                while recent[0][0] < now - self.change_window:
+                    item = recent.popleft()
+                    older.append(item)
+                    window[2] -= item[1]
+                    window[3] += item[1]
+                while older and older[0][0] < now - 2 * self.change_window:
+                    window[3] -= older.popleft()[1]
+                if older and abs(window[2] / len(recent) - window[3] / len(older)) >= threshold:
+                    self.last_change = now
+            self._update(now)
+
+    def set_irrigating(self, irrigating, now=None):
+        now = now if now is not None else time.time()
+        with self.lock:
+            self.irrigating = irrigating
+            self.last_irrigation = now
+            self._update(now)
+
+    def _update(self, now):
+        if self.mode_since is None:
+            self.mode_since = now
+        if self.irrigating or (self.last_irrigation is not None and now - self.last_irrigation < self.settle_time):
+            mode = ACTIVE
+        elif self.last_change is not None and now - self.last_change < self.calm_after:
+            mode = CHANGING
+        elif self.mode == ACTIVE or now - self.mode_since >= self.calm_after:
+            mode = STABLE
+        else:
+            # Starting up: sample at the changing rates until there is a baseline
+            mode = self.mode
+
+        if mode == self.mode:
+            return
+
+        self.mode_seconds[self.mode] += now - self.mode_since
+        previous = self.mode
+        self.mode = mode
+        self.mode_since = now
+        self.mode_changes += 1
+        callback = self.callback
+        intervals = dict(self.intervals[mode])
+
+        print(f"[SCHEDULER] Sampling mode {previous} -> {mode}: {intervals}")
+        if callback:
+            try:
+                callback(mode, intervals)
+            except Exception as e:
+                print(f"[SCHEDULER] Callback error: {e}")
+
+    def get_stats(self, now=None):
+        now = now if now is not None else time.time()
+        with self.lock:
+            seconds = dict(self.mode_seconds)
+            if self.mode_since is not None:
+                seconds[self.mode] += now - self.mode_since
+            return {
+                'mode': self.mode,
+                'intervals': dict(self.intervals[self.mode]),
+                'mode_changes': self.mode_changes,
+                'mode_seconds': {mode: round(value, 1) for mode, value in seconds.items()}
+            }
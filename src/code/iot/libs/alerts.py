@@ -0,0 +1,659 @@
+import collections
+import heapq
+import json
+import sqlite3
+import time
+import urllib.request
+from threading import Thread, Lock, Condition, Event
+
+
+THRESHOLD = 'threshold'
+RATE = 'rate'
+STALE = 'stale'
+IRRIGATION_FAILED = 'irrigation_failed'
+RULE_TYPES = (THRESHOLD, RATE, STALE, IRRIGATION_FAILED)
+
+OK = 'ok'
+PENDING = 'pending'
+FIRING = 'firing'
+RESOLVED = 'resolved'
+
+# Events without a plant field belong to the one plant of a single-pot setup
+DEFAULT_PLANT = 'default'
+ANY_PLANT = '*'
+# Pseudo-field irrigation_failed rules are indexed under
+IRRIGATION = 'irrigation'
+# Reading fields that are not measurements
+READING_META = frozenset(('sensor', 'read_at', 'plant'))
+
+# Rules by name. threshold and rate rules match while the value (rate: its
+# change per hour over `window` seconds) is below `below` and above `above`;
+# threshold rules must keep matching for `for` seconds. stale rules fire when
+# `field` has not been reported for `after` seconds. irrigation_failed fires
+# after `count` failed cycles in a row; cancelled cycles do not count.
+DEFAULT_RULES = {
+    'soil_dry': {'type': THRESHOLD, 'field': 'soil_moisture', 'below': 35, 'above': 0, 'for': 300,
+                 'severity': 'warning', 'message': "Plant is dehydrated ({value}% soil moisture)"},
+    'soil_sensor_out': {'type': THRESHOLD, 'field': 'soil_moisture', 'below': 1, 'for': 60,
+                        'severity': 'warning', 'message': "Soil sensor reads 0%, is it out of the soil?"},
+    'drying_fast': {'type': RATE, 'field': 'soil_moisture', 'below': -5, 'window': 3600,
+                    'severity': 'info', 'message': "Soil is drying fast ({value:.1f}%/h)"},
+    'temperature_high': {'type': THRESHOLD, 'field': 'temperature_c', 'above': 32, 'for': 600,
+                         'severity': 'warning', 'message': "Too hot for the plant ({value:.1f} °C)"},
+    'temperature_low': {'type': THRESHOLD, 'field': 'temperature_c', 'below': 10, 'for': 600,
+                        'severity': 'warning', 'message': "Too cold for the plant ({value:.1f} °C)"},
+    'soil_sensor_stale': {'type': STALE, 'field': 'soil_moisture', 'after': 300,
+                          'severity': 'critical', 'message': "No soil moisture reading for {value:.0f} s"},
+    'dht_stale': {'type': STALE, 'field': 'temperature_c', 'after': 900,
+                  'severity': 'warning', 'message': "No DHT22 reading for {value:.0f} s"},
+    'irrigation_failed': {'type': IRRIGATION_FAILED, 'count': 1,
+                          'severity': 'critical', 'message': "Irrigation failed {value} time(s) in a row"}
+}
+
+RULE_DEFAULTS = {'plant': ANY_PLANT, 'severity': 'warning', 'cooldown': 3600, 'for': 0, 'sinks': None}
+
+
+def load_rules(path=None):
+    """Return the alert rules, overriding the defaults from a JSON file.
+
+    The file maps rule names to rules; a rule set to null in the file is
+    removed, and a partial rule updates the default of the same name.
+    """
+    rules = {name: dict(rule) for name, rule in DEFAULT_RULES.items()}
+    if path:
+        with open(path) as f:
+            config = json.load(f)
+        for name, rule in config.items():
+            if rule is None:
+                rules.pop(name, None)
+            else:
+                rules.setdefault(name, {}).update(rule)
+    for name, rule in rules.items():
+        rule_type = rule.get('type')
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"alert rule '{name}' needs a type out of {', '.join(RULE_TYPES)}")
+        if rule_type != IRRIGATION_FAILED and not rule.get('field'):
+            raise ValueError(f"alert rule '{name}' needs a field")
+        if rule_type in (THRESHOLD, RATE) and rule.get('below') is None and rule.get('above') is None:
+            raise ValueError(f"alert rule '{name}' needs a below and/or above bound")
+        if rule_type == RATE and rule.get('window', 0) <= 0:
+            raise ValueError(f"alert rule '{name}' needs a window > 0")
+        if rule_type == STALE and rule.get('after', 0) <= 0:
+            raise ValueError(f"alert rule '{name}' needs an after > 0")
+    return rules
+
+
+class AlertRule:
+    __slots__ = ('name', 'type', 'field', 'plant', 'below', 'above', 'duration', 'window', 'after', 'count',
+                 'severity', 'cooldown', 'message', 'sinks')
+
+    def __init__(self, name, config):
+        config = dict(RULE_DEFAULTS, **config)
+        self.name = name
+        self.type = config['type']
+        self.field = IRRIGATION if self.type == IRRIGATION_FAILED else config['field']
+        self.plant = config['plant']
+        self.below = config.get('below')
+        self.above = config.get('above')
+        self.duration = config['for']
+        self.window = config.get('window')
+        self.after = config.get('after')
+        self.count = config.get('count', 1)
+        self.severity = config['severity']
+        self.cooldown = config['cooldown']
+        self.message = config.get('message') or f"{name} ({{value}})"
+        self.sinks = config['sinks']
+
+    def matches(self, value):
+        return (self.below is None or value < self.below) and (self.above is None or value > self.above)
+
+    def render(self, plant, value):
+        try:
+            return self.message.format(value=value, plant=plant, field=self.field)
+        except (ValueError, TypeError, KeyError, IndexError):
+            return f"{self.name}: {value}"
+
+
+class AlertState:
+    __slots__ = ('status', 'since', 'value', 'last_seen', 'count', 'history', 'scheduled_at', 'notified',
+                 'notified_at')
+
+    def __init__(self):
+        self.status = OK
+        self.since = None
+        self.value = None
+        self.last_seen = None
+        self.count = 0
+        self.history = None
+        self.scheduled_at = None
+        self.notified = False
+        self.notified_at = None
+
+
+class AlertEngine:
+    """Evaluates alert rules incrementally as readings and irrigation
+    events arrive.
+
+    Rules are indexed by (plant, field), so an event only touches the rules
+    that reference the fields it carries, however many rules there are.
+    Time-based conditions (a threshold held `for` seconds, a stale field)
+    sit in one deadline heap, served by a single timer thread; a rule has at
+    most one heap entry, which is moved forward lazily when it comes due.
+
+    A firing alert is notified once and then only again after it resolved
+    and `cooldown` seconds have passed since the last notification, so a
+    flapping reading does not flood the sinks. Firing alerts and cooldowns
+    are persisted through the state journal and survive restarts without
+    being notified twice. Stale rules for any plant start counting for the
+    default plant at start(), so a sensor that never reports is noticed.
+    """
+
+    def __init__(self, rules=None):
+        self.rules, self.index = self._build(load_rules() if rules is None else rules)
+        self.lock = Lock()
+        self.condition = Condition(self.lock)
+        self.states = {}
+        self.deadlines = []
+        # Firing alerts and cooldowns as persisted, kept up to date on each transition
+        self.saved = {}
+        self.dirty = False
+        self.outbox = None
+        self.journal = None
+        self.thread = None
+        self.running = False
+        self.events = 0
+        self.evaluations = 0
+        self.notifications = 0
+        self.suppressed = 0
+        print(f"[ALERTS] Loaded {len(self.rules)} alert rules")
+
+    @staticmethod
+    def _build(rules):
+        built = {}
+        index = collections.defaultdict(list)
+        for name, config in rules.items():
+            rule = AlertRule(name, config)
+            built[name] = rule
+            index[(rule.plant, rule.field)].append(rule)
+        return built, index
+
+    def set_rules(self, rules):
+        """Replace the rules, e.g. when the rules file is reloaded. Alerts of
+        rules kept under the same name carry on; those of removed rules are
+        dropped without a resolved notification."""
+        built, index = self._build(rules)
+        with self.lock:
+            self.rules, self.index = built, index
+            for key in [key for key in self.states if key[0] not in built]:
+                del self.states[key]
+                if self.saved.pop(f'{key[0]}@{key[1]}', None):
+                    self.dirty = True
+            if self.running:
+                self._schedule_stale(time.time())
+            self._commit()
+        print(f"[ALERTS] Reloaded {len(built)} alert rules")
+
+    def set_outbox(self, outbox):
+        """Notifications are handed to outbox.enqueue(notification, sinks)"""
+        self.outbox = outbox
+
+    def set_journal(self, journal):
+        """Restore firing alerts and cooldowns, and persist them from now on"""
+        restored = 0
+        with self.lock:
+            self.journal = journal
+            for key, saved in journal.get('alerts', {}).items():
+                name, _, plant = key.rpartition('@')
+                if name not in self.rules:
+                    continue
+                state = self._state(self.rules[name], plant)
+                state.status = saved['status']
+                state.since = saved['since']
+                state.value = saved['value']
+                state.notified = saved['notified']
+                state.notified_at = saved['notified_at']
+                self.saved[key] = saved
+                restored += state.status == FIRING
+        if restored:
+            print(f"[ALERTS] Restored {restored} firing alerts")
+
+    def _state(self, rule, plant):
+        key = (rule.name, plant)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = AlertState()
+        return state
+
+    def handle_event(self, event):
+        """Event bus subscriber for reading and irrigation_finished events"""
+        data = event.data
+        now = data.get('read_at', event.timestamp)
+        plant = data.get('plant', DEFAULT_PLANT)
+        if event.type == 'reading':
+            self.observe(plant, {field: value for field, value in data.items()
+                                 if field not in READING_META and value is not None}, now)
+        elif event.type == 'irrigation_finished' and not data.get('cancelled'):
+            self.observe(plant, {IRRIGATION: data.get('success', True)}, now)
+
+    def observe(self, plant, values, now=None):
+        """Evaluate the rules that reference any of the given field values"""
+        now = now if now is not None else time.time()
+        notifications = []
+        with self.lock:
+            self.events += 1
+            for field, value in values.items():
+                for key in ((plant, field), (ANY_PLANT, field)):
+                    for rule in self.index.get(key, ()):
+                        self._evaluate(rule, plant, value, now, notifications)
+            self._commit()
+        self._deliver(notifications)
+
+    def _evaluate(self, rule, plant, value, now, notifications):
+        self.evaluations += 1
+        state = self._state(rule, plant)
+
+        if rule.type == STALE:
+            state.last_seen = now
+            if state.status == FIRING:
+                self._resolve(rule, plant, state, now, 0.0, notifications)
+            self._schedule(rule, plant, state, now + rule.after)
+            return
+
+        if rule.type == IRRIGATION_FAILED:
+            state.count = 0 if value else state.count + 1
+            value = state.count
+            matched = value >= rule.count
+        else:
+            if rule.type == RATE:
+                history = state.history
+                if history is None:
+                    history = state.history = collections.deque()
+                history.append((now, value))
+                while history[0][0] < now - rule.window:
+                    history.popleft()
+                started, first = history[0]
+                # Wait for half a window of readings before judging the slope
+                if now - started < rule.window / 2:
+                    return
+                value = (value - first) / (now - started) * 3600
+            matched = rule.matches(value)
+
+        state.value = value
+        if not matched:
+            if state.status == FIRING:
+                self._resolve(rule, plant, state, now, value, notifications)
+            elif state.status == PENDING:
+                state.status = OK
+            return
+        if state.status == FIRING:
+            return
+        if rule.duration:
+            if state.status == OK:
+                state.status = PENDING
+                state.since = now
+                self._schedule(rule, plant, state, now + rule.duration)
+                return
+            if now < state.since + rule.duration:
+                return
+        self._fire(rule, plant, state, now, value, notifications)
+
+    def _schedule(self, rule, plant, state, at):
+        # One heap entry per state; a later deadline is picked up when the entry comes due
+        if state.scheduled_at is not None and state.scheduled_at <= at:
+            return
+        state.scheduled_at = at
+        earliest = not self.deadlines or at < self.deadlines[0][0]
+        heapq.heappush(self.deadlines, (at, rule.name, plant))
+        if earliest:
+            self.condition.notify()
+
+    def check_deadlines(self, now=None):
+        """Fire the held thresholds and stale fields that have come due"""
+        now = now if now is not None else time.time()
+        notifications = []
+        with self.lock:
+            self._check_deadlines(now, notifications)
+            self._commit()
+        self._deliver(notifications)
+
+    def _check_deadlines(self, now, notifications):
+        while self.deadlines and self.deadlines[0][0] <= now:
+            at, name, plant = heapq.heappop(self.deadlines)
+            rule = self.rules.get(name)
+            if rule is None:
+                # Removed by set_rules()
+                continue
+            state = self._state(rule, plant)
+            if state.scheduled_at != at:
+                continue
+            state.scheduled_at = None
+
+            if rule.type == STALE:
+                seen = state.last_seen if state.last_seen is not None else at - rule.after
+                if seen + rule.after > now:
+                    self._schedule(rule, plant, state, seen + rule.after)
+                elif state.status != FIRING:
+                    self._fire(rule, plant, state, now, now - seen, notifications)
+            elif state.status == PENDING:
+                if state.since + rule.duration > now:
+                    self._schedule(rule, plant, state, state.since + rule.duration)
+                else:
+                    self._fire(rule, plant, state, now, state.value, notifications)
+
+    def _fire(self, rule, plant, state, now, value, notifications):
+        if state.status != PENDING:
+            state.since = now
+        state.status = FIRING
+        state.value = value
+        if state.notified_at is not None and now - state.notified_at < rule.cooldown:
+            state.notified = False
+            self.suppressed += 1
+            print(f"[ALERTS] {rule.name}@{plant} firing again within its cooldown, not notified")
+        else:
+            state.notified = True
+            state.notified_at = now
+            notifications.append(self._notification(rule, plant, state, FIRING, now, value))
+        self._remember(rule, plant, state)
+
+    def _resolve(self, rule, plant, state, now, value, notifications):
+        state.status = OK
+        if state.notified:
+            state.notified = False
+            notifications.append(self._notification(rule, plant, state, RESOLVED, now, value))
+        self._remember(rule, plant, state)
+
+    def _remember(self, rule, plant, state):
+        self.saved[f'{rule.name}@{plant}'] = {
+            'status': state.status,
+            'since': state.since,
+            'value': state.value,
+            'notified': state.notified,
+            'notified_at': state.notified_at,
+            'cooldown': rule.cooldown
+        }
+        self.dirty = True
+
+    @staticmethod
+    def _notification(rule, plant, state, status, now, value):
+        return {
+            'rule': rule.name,
+            'plant': plant,
+            'state': status,
+            'severity': rule.severity,
+            'field': rule.field,
+            'value': value,
+            'message': rule.render(plant, value),
+            'since': state.since,
+            'timestamp': now,
+            'sinks': rule.sinks
+        }
+
+    def _commit(self):
+        # Called with the lock held; writes only after a firing or resolution
+        if not self.dirty or self.journal is None:
+            return
+        self.dirty = False
+        now = time.time()
+        for key, saved in list(self.saved.items()):
+            if saved['status'] != FIRING and (saved['notified_at'] is None
+                                              or now - saved['notified_at'] >= saved['cooldown']):
+                del self.saved[key]
+        self.journal.record({'alerts': dict(self.saved)})
+
+    def _deliver(self, notifications):
+        for notification in notifications:
+            self.notifications += 1
+            print(f"[ALERTS] {notification['state'].upper()} {notification['severity']}: "
+                  f"{notification['message']} ({notification['rule']}@{notification['plant']})")
+            if self.outbox:
+                self.outbox.enqueue(notification, notification.pop('sinks'))
+
+    def get_alerts(self):
+        """Firing alerts, most recent first"""
+        with self.lock:
+            alerts = [{
+                'rule': name,
+                'plant': plant,
+                'severity': self.rules[name].severity,
+                'field': self.rules[name].field,
+                'value': state.value,
+                'message': self.rules[name].render(plant, state.value),
+                'since': state.since,
+                'notified': state.notified
+            } for (name, plant), state in self.states.items() if state.status == FIRING]
+        alerts.sort(key=lambda alert: alert['since'] or 0, reverse=True)
+        return alerts
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'rules': len(self.rules),
+                'firing': sum(state.status == FIRING for state in self.states.values()),
+                'pending': sum(state.status == PENDING for state in self.states.values()),
+                'events': self.events,
+                'evaluations': self.evaluations,
+                'notifications': self.notifications,
+                'suppressed': self.suppressed,
+                'deadlines': len(self.deadlines)
+            }
+
+    def start(self):
+        print("[ALERTS] Starting alert timer thread")
+        with self.lock:
+            self._schedule_stale(time.time())
+            self.running = True
+        self.thread = Thread(target=self._run, name='alert-timer', daemon=True)
+        self.thread.start()
+
+    def _schedule_stale(self, now):
+        for rule in self.rules.values():
+            if rule.type == STALE:
+                plant = DEFAULT_PLANT if rule.plant == ANY_PLANT else rule.plant
+                state = self._state(rule, plant)
+                if state.last_seen is None:
+                    state.last_seen = now
+                self._schedule(rule, plant, state, state.last_seen + rule.after)
+
+    def stop(self):
+        print("[ALERTS] Stopping alert timer thread")
+        with self.lock:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            notifications = []
+            with self.lock:
+                if not self.running:
+                    return
+                timeout = self.deadlines[0][0] - time.time() if self.deadlines else None
+                if timeout is None or timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+                try:
+                    self._check_deadlines(time.time(), notifications)
+                    self._commit()
+                except Exception as e:
+                    print(f"[ALERTS] Timer error: {e}")
+            self._deliver(notifications)
+
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sink TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt ON outbox (next_attempt);
+"""
+
+
+class AlertOutbox:
+    """Durable queue between the alert engine and the sinks.
+
+    enqueue() only inserts one row per target sink, so evaluating rules
+    never waits on a webhook. A delivery thread sends due rows and deletes
+    them once delivered; a failed send is retried with exponential backoff
+    (retry_base * 2^attempts, capped at retry_max) and given up after
+    max_attempts. Rows left by a crash are delivered after a restart.
+    """
+
+    def __init__(self, path=':memory:', max_attempts=8, retry_base=2.0, retry_max=300.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.sinks = {}
+        self.lock = Lock()
+        self.wake = Event()
+        self.stop_event = Event()
+        self.thread = None
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(OUTBOX_SCHEMA)
+        self.db.commit()
+        self.delivered = collections.Counter()
+        self.retried = collections.Counter()
+        self.failed = collections.Counter()
+
+    def add_sink(self, sink):
+        with self.lock:
+            self.sinks[sink.name] = sink
+        print(f"[OUTBOX] Delivering alerts to {sink.name}")
+
+    def enqueue(self, notification, sinks=None):
+        """Queue notification for the named sinks, or every sink"""
+        with self.lock:
+            names = [name for name in self.sinks if sinks is None or name in sinks]
+            if not names:
+                return
+            payload = json.dumps(notification, separators=(',', ':'))
+            now = time.time()
+            self.db.executemany("INSERT INTO outbox (sink, payload, next_attempt) VALUES (?, ?, ?)",
+                                [(name, payload, now) for name in names])
+            self.db.commit()
+        self.wake.set()
+
+    def deliver_due(self, now=None, limit=50):
+        """Send the rows that are due; returns the time of the next attempt, or None"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, sink, payload, attempts FROM outbox WHERE next_attempt <= ? "
+                "ORDER BY next_attempt LIMIT ?", (now, limit)
+            ).fetchall()
+            sinks = dict(self.sinks)
+
+        for row_id, name, payload, attempts in rows:
+            sink = sinks.get(name)
+            error = None
+            if sink is None:
+                error = 'sink not configured'
+            else:
+                try:
+                    sink.send(json.loads(payload))
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+
+            with self.lock:
+                if error is None:
+                    self.db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+                    self.delivered[name] += 1
+                elif attempts + 1 >= self.max_attempts:
+                    print(f"[OUTBOX] Giving up on alert #{row_id} for {name} after {attempts + 1} attempts: {error}")
+                    self.db.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+                    self.failed[name] += 1
+                else:
+                    delay = min(self.retry_base * 2 ** attempts, self.retry_max)
+                    print(f"[OUTBOX] Alert #{row_id} to {name} failed ({error}), retrying in {delay:.0f}s")
+                    self.db.execute("UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                                    (attempts + 1, time.time() + delay, error, row_id))
+                    self.retried[name] += 1
+                self.db.commit()
+
+        with self.lock:
+            row = self.db.execute("SELECT MIN(next_attempt) FROM outbox").fetchone()
+        return row[0]
+
+    def get_stats(self):
+        with self.lock:
+            queued = dict(self.db.execute("SELECT sink, COUNT(*) FROM outbox GROUP BY sink").fetchall())
+            return {
+                'sinks': list(self.sinks),
+                'queued': queued,
+                'delivered': dict(self.delivered),
+                'retried': dict(self.retried),
+                'failed': dict(self.failed)
+            }
+
+    def start(self):
+        print("[OUTBOX] Starting alert delivery thread")
+        self.stop_event.clear()
+        self.thread = Thread(target=self._run, name='alert-outbox', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        print("[OUTBOX] Stopping alert delivery thread")
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread:
+            self.thread.join()
+        with self.lock:
+            self.db.close()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wake.clear()
+            try:
+                next_attempt = self.deliver_due()
+            except Exception as e:
+                print(f"[OUTBOX] Delivery error: {e}")
+                next_attempt = time.time() + self.retry_base
+            timeout = None if next_attempt is None else max(0.0, next_attempt - time.time())
+            self.wake.wait(timeout)
+
+
+class CallbackSink:
+    """Sink calling callback(notification), e.g. to publish it on the event bus"""
+
+    def __init__(self, name, callback):
+        self.name = name
+        self.callback = callback
+
+    def send(self, notification):
+        self.callback(notification)
+
+
+class WebhookSink:
+    """POSTs each notification as JSON; any non-2xx answer is retried"""
+
+    def __init__(self, url, name='webhook', timeout=5.0):
+        self.url = url
+        self.name = name
+        self.timeout = timeout
+
+    def send(self, notification):
+        request = urllib.request.Request(
+            self.url, data=json.dumps(notification).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class FileSink:
+    """Appends each notification to a JSON lines file"""
+
+    def __init__(self, path, name='file'):
+        self.path = path
+        self.name = name
+
+    def send(self, notification):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(notification) + '\n')
@@ -1,45 +1,204 @@
+import queue
 import time
-from gpiozero import Button
 from threading import Thread, Lock
 
 
+GESTURES = ('press', 'double_press', 'long_press')
+
+
 class ButtonHandler:
-    def __init__(self, button_pin=20):
-        self.button = Button(button_pin)
+    """Push button with software debounce and gesture detection.
+
+    gpiozero's edge callbacks only timestamp the raw edge and queue it. A
+    single dispatcher thread debounces the edges (a level must hold for
+    `debounce` seconds to count), recognises press / double_press /
+    long_press gestures and runs their callbacks one at a time, so nothing
+    slow ever runs on the GPIO thread. Gesture timing uses the queued edge
+    timestamps, so a slow callback delays dispatch but not detection.
+    """
+
+    def __init__(self, button_pin=20, recorder=None, debounce=0.03, long_press=1.5,
+                 double_press_window=0.4, button=None):
+        if button is None:
+            from gpiozero import Button
+            button = Button(button_pin)
+        self.button = button
+        self.recorder = recorder
+        self.debounce = debounce
+        self.long_press = long_press
+        self.double_press_window = double_press_window
         self.lock = Lock()
         self.press_count = 0
         self.last_press_time = None
         self.running = False
         self.thread = None
-        self.callback = None
+        self.callbacks = {}
+        self.journal = None
+        self.event_bus = None
+        self.edges = queue.Queue()
+        self.raw_edges = 0
+        self.gesture_counts = dict.fromkeys(GESTURES, 0)
+
+        # Debounce and gesture state, only touched by the dispatcher thread
+        self.level = False
+        self.raw_level = False
+        self.raw_changed_at = None
+        self.pressed_at = None
+        self.released_at = None
+        self.long_fired = False
+        self.clicks = 0
 
-    def set_callback(self, callback):
+    def set_callback(self, callback, gesture='press'):
+        if gesture not in GESTURES:
+            raise ValueError(f"Unknown button gesture '{gesture}'")
         with self.lock:
-            self.callback = callback
+            self.callbacks[gesture] = callback
+
+    def set_event_bus(self, event_bus):
+        with self.lock:
+            self.event_bus = event_bus
+
+    def set_journal(self, journal):
+        with self.lock:
+            self.journal = journal
+            self.press_count = journal.get('button_press_count', self.press_count)
+            self.last_press_time = journal.get('last_press_time', self.last_press_time)
+        print(f"[BUTTON] Restored press count: {self.press_count}")
 
     def start(self):
-        print("[BUTTON] Starting button handler thread")
+        print("[BUTTON] Starting button dispatcher thread")
         self.running = True
-        self.button.when_pressed = self._on_button_press
+        self.button.when_pressed = self._on_edge_pressed
+        self.button.when_released = self._on_edge_released
         self.thread = Thread(target=self._run, daemon=True)
         self.thread.start()
 
     def stop(self):
-        print("[BUTTON] Stopping button handler thread")
+        print("[BUTTON] Stopping button dispatcher thread")
         self.running = False
+        self.button.when_pressed = None
+        self.button.when_released = None
+        self.edges.put(None)
         if self.thread:
             self.thread.join()
 
-    def _on_button_press(self):
-        # Update state with lock
+    def _on_edge_pressed(self):
+        self.edges.put((True, time.monotonic()))
+
+    def _on_edge_released(self):
+        self.edges.put((False, time.monotonic()))
+
+    def inject_press(self, hold=0.1):
+        """Queue a clean press of `hold` seconds, as if read from the pin"""
+        now = time.monotonic()
+        self.edges.put((True, now))
+        self.edges.put((False, now + hold))
+
+    def _run(self):
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                edge = self.edges.get(timeout=timeout)
+            except queue.Empty:
+                deadline = self._advance(time.monotonic())
+                continue
+
+            if edge is None:
+                break
+            pressed, timestamp = edge
+            self._advance(timestamp)
+            self._on_raw_edge(pressed, timestamp)
+            deadline = self._next_deadline()
+
+    def _on_raw_edge(self, pressed, timestamp):
+        if pressed == self.raw_level:
+            return
+        with self.lock:
+            self.raw_edges += 1
+        self.raw_level = pressed
+        # Bouncing back to the settled level cancels the pending transition
+        self.raw_changed_at = timestamp if pressed != self.level else None
+
+    def _next_deadline(self):
+        deadlines = []
+        if self.raw_changed_at is not None:
+            deadlines.append(self.raw_changed_at + self.debounce)
+        if self.level and not self.long_fired:
+            deadlines.append(self.pressed_at + self.long_press)
+        if not self.level and self.clicks == 1:
+            deadlines.append(self.released_at + self.double_press_window)
+        return min(deadlines) if deadlines else None
+
+    def _advance(self, now):
+        """Apply every debounce commit and gesture timeout due by `now`"""
+        while True:
+            deadline = self._next_deadline()
+            if deadline is None or deadline > now:
+                return deadline
+
+            if self.raw_changed_at is not None and self.raw_changed_at + self.debounce <= now:
+                changed_at = self.raw_changed_at
+                self.raw_changed_at = None
+                self.level = self.raw_level
+                if self.level:
+                    self._on_debounced_press(changed_at)
+                else:
+                    self._on_debounced_release(changed_at)
+            elif self.level:
+                self.long_fired = True
+                self.clicks = 0
+                self._fire('long_press')
+            else:
+                self.clicks = 0
+                self._fire('press')
+
+    def _on_debounced_press(self, timestamp):
+        self.pressed_at = timestamp
+        self.long_fired = False
+
         with self.lock:
             self.press_count += 1
             self.last_press_time = time.time()
-            callback_to_call = self.callback
-        
-        # Print and execute callback without holding lock
+            journal = self.journal
+            counters = {
+                'button_press_count': self.press_count,
+                'last_press_time': self.last_press_time
+            }
+
+        if journal:
+            # A journal that cannot write must not stop the dispatcher
+            try:
+                journal.record(counters)
+            except Exception as e:
+                print(f"[BUTTON] Could not journal the press: {e}")
         print("[BUTTON] Button pressed!")
-        
+
+    def _on_debounced_release(self, timestamp):
+        if self.recorder:
+            self.recorder.record_button(round(timestamp - self.pressed_at, 3))
+
+        if self.long_fired:
+            return
+        self.clicks += 1
+        if self.clicks == 2:
+            self.clicks = 0
+            self._fire('double_press')
+        else:
+            self.released_at = timestamp
+
+    def _fire(self, gesture):
+        with self.lock:
+            self.gesture_counts[gesture] += 1
+            callback_to_call = self.callbacks.get(gesture)
+            event_bus = self.event_bus
+
+        print(f"[BUTTON] Gesture: {gesture}")
+        if event_bus:
+            try:
+                event_bus.publish('button_press', gesture=gesture)
+            except Exception as e:
+                print(f"[BUTTON] Could not publish {gesture}: {e}")
         if callback_to_call:
             try:
                 print("[BUTTON] Executing callback...")
@@ -50,10 +209,6 @@ class ButtonHandler:
                 import traceback
                 traceback.print_exc()
 
-    def _run(self):
-        while self.running:
-            time.sleep(0.1)
-
     def get_state(self):
         with self.lock:
             return {
@@ -62,5 +217,14 @@ class ButtonHandler:
                 'is_pressed': self.button.is_pressed
             }
 
+    def get_stats(self):
+        with self.lock:
+            return {
+                'raw_edges': self.raw_edges,
+                'presses': self.press_count,
+                'gestures': dict(self.gesture_counts),
+                'pending_edges': self.edges.qsize()
+            }
+
     def wait_for_press(self, timeout=None):
-        self.button.wait_for_press(timeout=timeout)
\ No newline at end of file
+        self.button.wait_for_press(timeout=timeout)
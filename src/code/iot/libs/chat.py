@@ -1,40 +1,65 @@
 #!/usr/bin/env python3
+import argparse
+import os
 import time
 from dht_sensor import DHTSensor
 from uart_handler import UARTHandler
 from led_controller import LEDController
 from button_handler import ButtonHandler
 from servo_controller import ServoController
-from system_state import SystemState
+from system_state import SystemState, RemoteSystemState
 from llm_interface import LLMInterface
+from knowledge_base import KnowledgeBase
+from hardware_ipc import HardwareClient
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'knowledge')
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Plant Talker chat interface")
+    parser.add_argument('--hardware-socket', metavar='PATH',
+                        help="Read the plant state from a running hardware daemon instead of the sensors")
+    args = parser.parse_args()
+
     print("Initializing Plant Talker Chat Interface...")
-    print("Starting system components...")
-    
-    dht_sensor = DHTSensor(read_interval=10)
-    uart_handler = UARTHandler(read_interval=1)
-    led_controller = LEDController()
-    button_handler = ButtonHandler()
-    servo_controller = ServoController()
-    system_state = SystemState()
-    
-    system_state.set_components(
-        dht_sensor,
-        uart_handler,
-        led_controller,
-        button_handler,
-        servo_controller
-    )
-    
-    dht_sensor.start()
-    uart_handler.start()
-    
-    print("Waiting for initial sensor data (5 seconds)...")
-    time.sleep(5)
+    hardware = None
+    dht_sensor = None
+    uart_handler = None
+
+    if args.hardware_socket:
+        # The daemon keeps the sensors; the state comes over its socket
+        hardware = HardwareClient(args.hardware_socket, name='chat')
+        hardware.connect(wait=5)
+        system_state = RemoteSystemState(lambda: hardware.call('get_state'))
+    else:
+        print("Starting system components...")
+        dht_sensor = DHTSensor(read_interval=10)
+        uart_handler = UARTHandler(read_interval=1)
+        led_controller = LEDController()
+        button_handler = ButtonHandler()
+        servo_controller = ServoController()
+        system_state = SystemState()
+
+        system_state.set_components(
+            dht_sensor,
+            uart_handler,
+            led_controller,
+            button_handler,
+            servo_controller
+        )
+
+        dht_sensor.start()
+        uart_handler.start()
+
+        print("Waiting for initial sensor data (up to 5 seconds)...")
+        deadline = time.time() + 5
+        uart_handler.wait_for_data(timeout=5)
+        dht_sensor.wait_for_data(timeout=max(0, deadline - time.time()))
     
     llm_interface = LLMInterface(system_state)
+    knowledge_base = KnowledgeBase()
+    knowledge_base.sync(KNOWLEDGE_DIR)
+    llm_interface.set_knowledge_base(knowledge_base)
     
     print("\n" + "=" * 60)
     print("Plant Talker Chat Interface")
@@ -73,8 +98,11 @@ def main():
         print(f"Error: {e}")
     finally:
         print("Stopping system components...")
-        dht_sensor.stop()
-        uart_handler.stop()
+        if hardware:
+            hardware.close()
+        else:
+            dht_sensor.stop()
+            uart_handler.stop()
         print("Done.")
 
 
@@ -0,0 +1,263 @@
+import asyncio
+import codecs
+import os
+import shutil
+import sys
+import threading
+
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = None
+
+CLEAR_LINE = '\r\x1b[2K'
+LINE_UP = '\x1b[1A'
+
+
+class ConsoleStream:
+    """sys.stdout/sys.stderr stand-in printing through the console"""
+
+    def __init__(self, console, stream):
+        self.console = console
+        self.stream = stream
+
+    def write(self, text):
+        self.console.write(text, self.stream)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def isatty(self):
+        return self.stream.isatty()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    @property
+    def encoding(self):
+        return self.stream.encoding
+
+
+class Console:
+    """Terminal console whose input line stays at the bottom.
+
+    Lines printed from any thread go above the input line, which is then
+    drawn again with what has been typed so far, so sensor logs, status
+    updates and a reply streaming in never tear the line being typed. Keys
+    are read in cbreak mode from the event loop and edited here. When stdin
+    or stdout is not a terminal, input is read line by line and output
+    passes straight through.
+    """
+
+    def __init__(self, prompt='> ', input_fd=None, output=None):
+        self.prompt = prompt
+        self.input_fd = sys.stdin.fileno() if input_fd is None else input_fd
+        self.output = output or sys.stdout
+        self.interactive = termios is not None and os.isatty(self.input_fd) and self.output.isatty()
+        # Reentrant: the loop thread prints while drawing
+        self.lock = threading.RLock()
+        self.buffer = ''
+        # Partial lines written per thread, so concurrent prints do not mix
+        self.partial = {}
+        # Unfinished line of a streaming reply, shown over the input line
+        self.live = None
+        self.footer_rows = 0
+        self.escape = None
+        self.loop = None
+        self.lines = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.saved_mode = None
+        self.saved_streams = None
+
+    def attach(self, loop=None):
+        """Start reading stdin on the running loop and take over the terminal"""
+        self.loop = loop or asyncio.get_running_loop()
+        self.lines = asyncio.Queue()
+        if self.interactive:
+            self.saved_mode = termios.tcgetattr(self.input_fd)
+            # No echo, no line buffering; Ctrl+C still raises SIGINT
+            tty.setcbreak(self.input_fd)
+            self.saved_streams = (sys.stdout, sys.stderr)
+            sys.stdout = ConsoleStream(self, self.saved_streams[0])
+            sys.stderr = ConsoleStream(self, self.saved_streams[1])
+            self._redraw()
+            self.loop.add_reader(self.input_fd, self._on_input)
+        else:
+            # Files and /dev/null cannot be watched by the loop's selector.
+            # A daemon thread, so a pipe left open does not hold up shutdown
+            threading.Thread(target=self._read_input, name='console-input', daemon=True).start()
+
+    def detach(self):
+        """Give the terminal back, leaving the cursor on a fresh line"""
+        if self.interactive and self.saved_mode is not None:
+            self.loop.remove_reader(self.input_fd)
+            with self.lock:
+                sys.stdout, sys.stderr = self.saved_streams
+                self._clear()
+                self.output.flush()
+            termios.tcsetattr(self.input_fd, termios.TCSADRAIN, self.saved_mode)
+            self.saved_mode = None
+
+    async def read_line(self):
+        """The next line entered, or None once stdin is closed"""
+        return await self.lines.get()
+
+    def set_prompt(self, prompt):
+        with self.lock:
+            self.prompt = prompt
+            self._redraw()
+
+    def write(self, text, stream=None):
+        """Print text above the input line; safe from any thread"""
+        stream = stream or self.output
+        if not self.interactive:
+            stream.write(text)
+            return
+        with self.lock:
+            ident = threading.get_ident()
+            text = self.partial.pop(ident, '') + text
+            complete, newline, rest = text.rpartition('\n')
+            if rest:
+                self.partial[ident] = rest
+            if newline:
+                self._above(complete + newline, stream)
+
+    def begin_stream(self, prefix=''):
+        """Show a reply as it streams in, just over the input line"""
+        with self.lock:
+            self.live = ''
+        self.stream(prefix)
+
+    def stream(self, text):
+        if not self.interactive:
+            self.output.write(text)
+            self.output.flush()
+            return
+        with self.lock:
+            live = self.live + text
+            width = self._width()
+            done = []
+            # Finished lines, and lines about to wrap, move above the input line
+            while '\n' in live or len(live) >= width:
+                head = live[:width]
+                if '\n' in head:
+                    line, _, live = live.partition('\n')
+                else:
+                    cut = head.rfind(' ')
+                    cut = cut if cut > 0 else width - 1
+                    line, live = live[:cut], live[cut:].lstrip(' ')
+                done.append(line + '\n')
+            self.live = live
+            if done:
+                self._above(''.join(done))
+            else:
+                self._redraw()
+
+    def end_stream(self):
+        if not self.interactive:
+            self.output.write('\n')
+            self.output.flush()
+            return
+        with self.lock:
+            live = self.live
+            self.live = None
+            self._above(live + '\n')
+
+    def _width(self):
+        return max(20, shutil.get_terminal_size().columns - 1)
+
+    def _clear(self):
+        self.output.write(CLEAR_LINE + (LINE_UP + CLEAR_LINE) * max(0, self.footer_rows - 1))
+        self.footer_rows = 0
+
+    def _draw(self):
+        # Scrolled sideways, so the input line never wraps
+        room = self._width() - len(self.prompt)
+        footer = self.prompt + self.buffer[-room:] if room > 0 else self.prompt
+        if self.live is not None:
+            footer = self.live + '\n' + footer
+        self.output.write(footer)
+        self.output.flush()
+        self.footer_rows = footer.count('\n') + 1
+
+    def _above(self, text, stream=None):
+        stream = stream or self.output
+        self._clear()
+        if stream is not self.output:
+            self.output.flush()
+        stream.write(text)
+        stream.flush()
+        self._draw()
+
+    def _redraw(self):
+        self._clear()
+        self._draw()
+
+    def _read_input(self):
+        while True:
+            try:
+                data = os.read(self.input_fd, 1024)
+            except OSError:
+                data = b''
+            try:
+                self.loop.call_soon_threadsafe(self._on_lines, data)
+            except RuntimeError:
+                return  # The loop has closed
+            if not data:
+                return
+
+    def _on_lines(self, data):
+        """Queue the complete lines read from a stdin that is not a terminal"""
+        if not data:
+            if self.buffer:
+                self.lines.put_nowait(self.buffer)
+                self.buffer = ''
+            self.lines.put_nowait(None)
+            return
+        self.buffer += self.decoder.decode(data)
+        while '\n' in self.buffer:
+            line, _, self.buffer = self.buffer.partition('\n')
+            self.lines.put_nowait(line)
+
+    def _on_input(self):
+        try:
+            data = os.read(self.input_fd, 1024)
+        except OSError:
+            data = b''
+        if not data:
+            self.loop.remove_reader(self.input_fd)
+            self.lines.put_nowait(None)
+            return
+        text = self.decoder.decode(data)
+
+        with self.lock:
+            for char in text:
+                if self.escape is not None:
+                    # Cursor keys and the like are not edited; skip the sequence
+                    self.escape += char
+                    if len(self.escape) > 1 and (char.isalpha() or char == '~'):
+                        self.escape = None
+                elif char == '\x1b':
+                    self.escape = ''
+                elif char in '\r\n':
+                    line, self.buffer = self.buffer, ''
+                    # The entered line stays in the scrollback, as in a shell
+                    self._above(self.prompt + line + '\n')
+                    self.lines.put_nowait(line)
+                elif char in '\x7f\b':
+                    self.buffer = self.buffer[:-1]
+                elif char == '\x15':
+                    self.buffer = ''
+                elif char == '\x17':
+                    words = self.buffer.rstrip(' ')
+                    self.buffer = words[:words.rfind(' ') + 1]
+                elif char == '\x04':
+                    if not self.buffer:
+                        self.loop.remove_reader(self.input_fd)
+                        self.lines.put_nowait(None)
+                        return
+                elif char.isprintable():
+                    self.buffer += char
+            self._redraw()
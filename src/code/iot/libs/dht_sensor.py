@@ -1,58 +1,235 @@
 import time
-import board
-import adafruit_dht
-from threading import Thread, Lock
+from collections import deque
+from threading import Thread, Lock, Event
 
 
 class DHTSensor:
-    def __init__(self, pin=board.D16, read_interval=10):
-        self.dht_device = adafruit_dht.DHT22(pin)
+    # The DHT22 needs at least 2 seconds between two reads
+    MIN_READ_SPACING = 2.0
+
+    def __init__(self, pin=None, read_interval=10, max_retries=3, stale_after=60, outcome_window=30,
+                 dht_device=None, recorder=None):
+        self.open_device = None
+        if dht_device is None:
+            import board
+            import adafruit_dht
+            self.open_device = lambda: adafruit_dht.DHT22(pin if pin is not None else board.D16)
+            dht_device = self.open_device()
+        self.dht_device = dht_device
+        self.recorder = recorder
         self.read_interval = read_interval
+        self.max_retries = max_retries
+        self.stale_after = stale_after
         self.temperature_c = None
         self.temperature_f = None
         self.humidity = None
+        self.last_read_time = None
+        self.consecutive_failures = 0
+        self.read_attempts = 0
+        self.read_successes = 0
+        self.read_failures = 0
+        self.recent_outcomes = deque(maxlen=outcome_window)
+        self.started_at = None
+        self.first_data_event = Event()
+        self.wake = Event()
         self.lock = Lock()
         self.running = False
         self.thread = None
+        self.event_bus = None
+        # For the watchdog: when the read loop last came round, and which
+        # loop is current after a restart
+        self.heartbeat = None
+        self.generation = 0
+
+    def set_event_bus(self, event_bus):
+        with self.lock:
+            self.event_bus = event_bus
+
+    def set_read_interval(self, interval):
+        """Change the time between reads; takes effect on the pending wait"""
+        with self.lock:
+            if interval == self.read_interval:
+                return
+            self.read_interval = max(self.MIN_READ_SPACING, interval)
+        print(f"[DHT] Read interval set to {self.read_interval:g}s")
+        self.wake.set()
 
     def start(self):
         print("[DHT] Starting DHT22 sensor thread")
         self.running = True
-        self.thread = Thread(target=self._run, daemon=True)
+        self.started_at = time.time()
+        self.heartbeat = time.monotonic()
+        self.thread = Thread(target=self._run, args=(self.generation,), daemon=True)
+        self.thread.start()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def restart(self):
+        """Replace a dead or stalled read loop; a stalled one exits once it unblocks"""
+        print("[DHT] Restarting DHT22 sensor thread")
+        self.generation += 1
+        self.wake.set()
+        self.running = True
+        self.heartbeat = time.monotonic()
+        self.thread = Thread(target=self._run, args=(self.generation,), daemon=True)
         self.thread.start()
 
+    def reinitialize(self):
+        """Release the sensor and set it up again, as after a power cycle"""
+        print("[DHT] Reinitializing DHT22 sensor")
+        try:
+            self.dht_device.exit()
+        except Exception as e:
+            print(f"[DHT] Error releasing sensor: {e}")
+        if self.open_device:
+            self.dht_device = self.open_device()
+        with self.lock:
+            self.consecutive_failures = 0
+        self.wake.set()
+
     def stop(self):
         print("[DHT] Stopping DHT22 sensor thread")
         self.running = False
+        self.wake.set()
         if self.thread:
             self.thread.join()
 
-    def _run(self):
+    def _run(self, generation):
         print("[DHT] DHT22 sensor thread running")
-        while self.running:
-            try:
-                temp_c = self.dht_device.temperature
-                temp_f = temp_c * 9/5 + 32
-                hum = self.dht_device.humidity
+        while self.running and generation == self.generation:
+            self.heartbeat = time.monotonic()
+            success = self._read_once()
+            self.heartbeat = time.monotonic()
+            attempted = time.time()
+            # Re-check the deadline whenever the read interval changes
+            while self.running and generation == self.generation:
+                delay = attempted + self._next_delay(success) - time.time()
+                if delay <= 0:
+                    break
+                self.wake.wait(delay)
+                self.wake.clear()
+
+    def _read_device(self):
+        try:
+            temp_c = self.dht_device.temperature
+            hum = self.dht_device.humidity
+        except Exception as e:
+            if self.recorder:
+                self.recorder.record_dht(None, None, error=e.args[0] if e.args else e)
+            raise
 
-                with self.lock:
-                    self.temperature_c = temp_c
-                    self.temperature_f = temp_f
-                    self.humidity = hum
+        if self.recorder:
+            self.recorder.record_dht(temp_c, hum)
+        return temp_c, hum
 
-                print(f"[DHT] Temp: {temp_f:.1f}F / {temp_c:.1f}C | Humidity: {hum:.1f}%")
+    def _read_once(self, timestamp=None):
+        try:
+            temp_c, hum = self._read_device()
 
-            except RuntimeError as error:
-                print(f"[DHT] Error: {error.args[0]}")
-            except Exception as e:
-                print(f"[DHT] Exception: {e}")
+            if temp_c is None or hum is None:
+                raise RuntimeError("Incomplete reading")
+            if not -40 <= temp_c <= 80 or not 0 <= hum <= 100:
+                raise RuntimeError(f"Reading out of range ({temp_c}C, {hum}%)")
 
-            time.sleep(self.read_interval)
+            temp_f = temp_c * 9/5 + 32
+
+            with self.lock:
+                self.temperature_c = temp_c
+                self.temperature_f = temp_f
+                self.humidity = hum
+                self.last_read_time = timestamp if timestamp is not None else time.time()
+                self._record_outcome(True)
+                read_at = self.last_read_time
+                event_bus = self.event_bus
+            self.first_data_event.set()
+
+            print(f"[DHT] Temp: {temp_f:.1f}F / {temp_c:.1f}C | Humidity: {hum:.1f}%")
+            if event_bus:
+                event_bus.publish('reading', sensor='dht', temperature_c=temp_c, humidity=hum, read_at=read_at)
+            return True
+
+        except RuntimeError as error:
+            print(f"[DHT] Error: {error.args[0] if error.args else error}")
+        except Exception as e:
+            print(f"[DHT] Exception: {e}")
+
+        with self.lock:
+            self._record_outcome(False)
+        return False
+
+    def _record_outcome(self, success):
+        if self.started_at is None:
+            self.started_at = time.time()
+        self.read_attempts += 1
+        self.recent_outcomes.append(success)
+        if success:
+            self.read_successes += 1
+            self.consecutive_failures = 0
+        else:
+            self.read_failures += 1
+            self.consecutive_failures += 1
+
+    def _next_delay(self, success):
+        if success:
+            return self.read_interval
+
+        with self.lock:
+            failures = self.consecutive_failures
+
+        # Checksum errors are usually transient, so retry quickly with
+        # exponential backoff before falling back to the normal interval
+        if failures <= self.max_retries:
+            delay = self.MIN_READ_SPACING * (2 ** (failures - 1))
+            return max(self.MIN_READ_SPACING, min(delay, self.read_interval))
+
+        return self.read_interval
+
+    def _quality(self, age):
+        if age is None:
+            return 'none', 0.0
+
+        freshness = max(0.0, 1.0 - max(0.0, age - self.read_interval) / self.stale_after)
+        if self.recent_outcomes:
+            success_ratio = sum(self.recent_outcomes) / len(self.recent_outcomes)
+        else:
+            success_ratio = 1.0
+        confidence = round(freshness * (0.5 + 0.5 * success_ratio), 2)
+
+        if age > self.read_interval + self.stale_after:
+            quality = 'stale'
+        elif self.consecutive_failures > 0 or success_ratio < 0.8:
+            quality = 'degraded'
+        else:
+            quality = 'good'
+
+        return quality, confidence
+
+    def wait_for_data(self, timeout=None):
+        return self.first_data_event.wait(timeout)
 
     def get_data(self):
         with self.lock:
+            age = time.time() - self.last_read_time if self.last_read_time else None
+            quality, confidence = self._quality(age)
             return {
                 'temperature_c': self.temperature_c,
                 'temperature_f': self.temperature_f,
-                'humidity': self.humidity
-            }
\ No newline at end of file
+                'humidity': self.humidity,
+                'last_read_time': self.last_read_time,
+                'age': age,
+                'quality': quality,
+                'confidence': confidence
+            }
+
+    def get_stats(self):
+        with self.lock:
+            elapsed = time.time() - self.started_at if self.started_at else 0
+            return {
+                'read_attempts': self.read_attempts,
+                'read_successes': self.read_successes,
+                'read_failures': self.read_failures,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_ratio': self.read_failures / self.read_attempts if self.read_attempts else 0.0,
+                'sample_rate_per_min': self.read_successes * 60 / elapsed if elapsed > 0 else 0.0
+            }
@@ -0,0 +1,306 @@
+import asyncio
+import collections
+import itertools
+import time
+from threading import Thread, Lock, Condition
+
+
+READING = 'reading'
+STATUS_CHANGE = 'status_change'
+IRRIGATION_STARTED = 'irrigation_started'
+IRRIGATION_FINISHED = 'irrigation_finished'
+BUTTON_PRESS = 'button_press'
+CHAT_MESSAGE = 'chat_message'
+ALERT = 'alert'
+CONFIG_RELOADED = 'config_reloaded'
+
+EVENT_TYPES = (READING, STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS, CHAT_MESSAGE, ALERT,
+               CONFIG_RELOADED)
+
+# What a full subscriber queue does with a new event
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+def log_event(event):
+    """Subscriber that prints one line per event"""
+    print(f"[EVENT] #{event.seq} {event.type}: {event.data}")
+
+
+class BusEvent:
+    __slots__ = ('seq', 'type', 'data', 'timestamp')
+
+    def __init__(self, seq, event_type, data, timestamp):
+        self.seq = seq
+        self.type = event_type
+        self.data = data
+        self.timestamp = timestamp
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'type': self.type,
+            'timestamp': self.timestamp,
+            'data': self.data
+        }
+
+    def __repr__(self):
+        return f"BusEvent(#{self.seq} {self.type} {self.data})"
+
+
+class Subscription:
+    """Bounded event queue for one subscriber.
+
+    When the queue is full, DROP_OLDEST discards the oldest queued event,
+    DROP_NEWEST discards the incoming one and BLOCK makes the publisher wait
+    up to the bus's block_timeout for room before dropping it.
+    """
+
+    def __init__(self, bus, name, types, maxsize, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown drop policy '{policy}'")
+        self.bus = bus
+        self.name = name
+        self.types = frozenset(types) if types is not None else None
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue = collections.deque()
+        self.condition = Condition()
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+        # Publishers offer outside the bus lock with a ticket taken under it,
+        # and are queued in ticket order, so events still arrive in seq order
+        self.tickets = 0
+        self.turn = 0
+
+    def matches(self, event_type):
+        return self.types is None or event_type in self.types
+
+    def _take_ticket(self):
+        """Called with the bus lock held"""
+        ticket = self.tickets
+        self.tickets += 1
+        return ticket
+
+    def _offer(self, event, block_timeout, ticket):
+        with self.condition:
+            self.condition.wait_for(lambda: self.turn == ticket)
+            try:
+                return self._put(event, block_timeout)
+            finally:
+                self.turn += 1
+                self.condition.notify_all()
+
+    def _put(self, event, block_timeout):
+        if self.closed:
+            return False
+        if len(self.queue) >= self.maxsize:
+            if self.policy == DROP_OLDEST:
+                self.queue.popleft()
+                self.dropped += 1
+            elif self.policy == DROP_NEWEST or not self.condition.wait_for(
+                    lambda: len(self.queue) < self.maxsize or self.closed, block_timeout) or self.closed:
+                self.dropped += 1
+                return False
+        self.queue.append(event)
+        self.condition.notify_all()
+        return True
+
+    def get(self, timeout=None):
+        """Next event, or None on timeout or once the subscription is closed"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.queue or self.closed, timeout):
+                return None
+            return self._pop()
+
+    def get_nowait(self):
+        with self.condition:
+            return self._pop()
+
+    def drain(self):
+        """Every event queued right now, without waiting"""
+        with self.condition:
+            events = list(self.queue)
+            self.queue.clear()
+            self.delivered += len(events)
+            self.condition.notify_all()
+            return events
+
+    def _pop(self):
+        if not self.queue:
+            return None
+        self.delivered += 1
+        self.condition.notify_all()
+        return self.queue.popleft()
+
+    def __iter__(self):
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self.condition:
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify_all()
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'name': self.name,
+                'policy': self.policy,
+                'queued': len(self.queue),
+                'maxsize': self.maxsize,
+                'delivered': self.delivered,
+                'dropped': self.dropped
+            }
+
+
+class AsyncSubscription(Subscription):
+    """Subscription consumed from an asyncio event loop with `await get()`"""
+
+    def __init__(self, bus, name, types, maxsize, policy, loop):
+        if policy == BLOCK:
+            # Blocking a publisher thread on an event loop would stall the sensors
+            raise ValueError("asyncio subscribers cannot use the block policy")
+        super().__init__(bus, name, types, maxsize, policy)
+        self.loop = loop
+        self.wake = asyncio.Event()
+
+    def _offer(self, event, block_timeout, ticket):
+        if not super()._offer(event, block_timeout, ticket):
+            return False
+        self._wake_loop()
+        return True
+
+    def _wake_loop(self):
+        try:
+            self.loop.call_soon_threadsafe(self.wake.set)
+        except RuntimeError:
+            pass
+
+    async def get(self):
+        while True:
+            event = self.get_nowait()
+            if event is not None or self.closed:
+                return event
+            self.wake.clear()
+            # Re-check after clearing so an event offered in between is not missed
+            event = self.get_nowait()
+            if event is not None or self.closed:
+                return event
+            await self.wake.wait()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    def close(self):
+        super().close()
+        self._wake_loop()
+
+
+class EventBus:
+    """In-process publish/subscribe bus connecting sensors, actuators and UI
+    clients. Events carry a bus-wide sequence number, and every subscriber
+    receives them in that order."""
+
+    def __init__(self, block_timeout=1.0):
+        self.block_timeout = block_timeout
+        self.lock = Lock()
+        self.subscriptions = []
+        self.threads = []
+        self.seq = itertools.count(1)
+        self.last_seq = 0
+        self.published = dict.fromkeys(EVENT_TYPES, 0)
+
+    def subscribe(self, types=None, maxsize=100, policy=DROP_OLDEST, name=None):
+        subscription = Subscription(self, name or 'subscriber', types, maxsize, policy)
+        self._add(subscription)
+        return subscription
+
+    def subscribe_async(self, types=None, maxsize=100, policy=DROP_OLDEST, name=None, loop=None):
+        loop = loop or asyncio.get_running_loop()
+        subscription = AsyncSubscription(self, name or 'async-subscriber', types, maxsize, policy, loop)
+        self._add(subscription)
+        return subscription
+
+    def subscribe_callback(self, callback, types=None, maxsize=100, policy=DROP_OLDEST, name=None):
+        """Run callback(event) for each event on a dedicated thread"""
+        subscription = self.subscribe(types, maxsize, policy, name)
+        thread = Thread(target=self._dispatch, args=(subscription, callback),
+                        name=f"bus-{subscription.name}", daemon=True)
+        with self.lock:
+            self.threads.append(thread)
+        thread.start()
+        return subscription
+
+    def _add(self, subscription):
+        with self.lock:
+            self.subscriptions.append(subscription)
+        print(f"[BUS] Subscribed {subscription.name} to {sorted(subscription.types) if subscription.types else 'all events'}")
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+
+    def _dispatch(self, subscription, callback):
+        for event in subscription:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[BUS] Subscriber {subscription.name} failed on {event.type}: {e}")
+                import traceback
+                traceback.print_exc()
+
+    def publish(self, event_type, data=None, **fields):
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type '{event_type}'")
+        payload = dict(data or {}, **fields)
+
+        with self.lock:
+            event = BusEvent(next(self.seq), event_type, payload, time.time())
+            self.last_seq = event.seq
+            self.published[event_type] += 1
+            offers = [(subscription, subscription._take_ticket()) for subscription in self.subscriptions
+                      if subscription.matches(event_type)]
+
+        # Offered outside the bus lock, so a full BLOCK subscriber only holds
+        # up publishers of the events it takes. It comes last, after this
+        # event has reached everyone else; the tickets keep each queue in
+        # seq order, and a publisher only ever waits for earlier events.
+        offers.sort(key=lambda offer: offer[0].policy == BLOCK)
+        for subscription, ticket in offers:
+            subscription._offer(event, self.block_timeout, ticket)
+        return event
+
+    def close(self, timeout=2.0):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+            threads = list(self.threads)
+        for subscription in subscriptions:
+            subscription.close()
+        for thread in threads:
+            thread.join(timeout)
+
+    def get_stats(self):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+            published = dict(self.published)
+        return {
+            'published': published,
+            'subscribers': [subscription.get_stats() for subscription in subscriptions]
+        }
@@ -0,0 +1,724 @@
+import collections
+import itertools
+import json
+import os
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, Event
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+PROTOCOL_VERSION = 1
+
+# Every frame: payload length, frame kind, request id (0 for pushed frames)
+HEADER = struct.Struct('!IBI')
+MAX_FRAME = 16 * 1024 * 1024
+
+HELLO = 1
+WELCOME = 2
+REQUEST = 3
+RESPONSE = 4
+ERROR = 5
+SUBSCRIBE = 6
+EVENT = 7
+SOIL_READING = 8
+DHT_READING = 9
+
+# Readings are most of the traffic, so they get fixed-size frames instead of
+# an encoded dict: bus seq, read_at, then the values
+SOIL = struct.Struct('!IdH')
+DHT = struct.Struct('!Iddd')
+SOIL_FIELDS = frozenset(('sensor', 'soil_moisture', 'read_at'))
+DHT_FIELDS = frozenset(('sensor', 'temperature_c', 'humidity', 'read_at'))
+
+
+class HardwareError(RuntimeError):
+    """The hardware daemon is unreachable or a command failed there"""
+
+
+def _json_dumps(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+CODECS = {'json': (_json_dumps, json.loads)}
+if msgpack is not None:
+    CODECS['msgpack'] = (lambda value: msgpack.packb(value, use_bin_type=True),
+                         lambda data: msgpack.unpackb(data, raw=False))
+
+# Preferred first; both sides must have it installed
+CODEC_ORDER = ('msgpack', 'json')
+
+
+def encode_frame(kind, request_id, payload=b''):
+    return HEADER.pack(len(payload), kind, request_id) + payload
+
+
+def read_frame(stream):
+    """(kind, request_id, payload) from a buffered socket file, or None at EOF"""
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    length, kind, request_id = HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise HardwareError(f"Frame of {length} bytes exceeds the {MAX_FRAME} byte limit")
+    payload = stream.read(length) if length else b''
+    if len(payload) < length:
+        return None
+    return kind, request_id, payload
+
+
+def encode_event(event, encode):
+    data = event.data
+    if event.type == 'reading':
+        sensor = data.get('sensor')
+        if sensor == 'soil_moisture' and data.keys() == SOIL_FIELDS and isinstance(data['soil_moisture'], int) \
+                and 0 <= data['soil_moisture'] <= 0xFFFF:
+            return encode_frame(SOIL_READING, 0, SOIL.pack(event.seq, data['read_at'], data['soil_moisture']))
+        if sensor == 'dht' and data.keys() == DHT_FIELDS:
+            return encode_frame(DHT_READING, 0,
+                                DHT.pack(event.seq, data['read_at'], data['temperature_c'], data['humidity']))
+    return encode_frame(EVENT, 0, encode([event.seq, event.type, event.timestamp, data]))
+
+
+def decode_event(kind, payload, decode):
+    """(event type, data) of a pushed event frame"""
+    if kind == SOIL_READING:
+        _, read_at, moisture = SOIL.unpack(payload)
+        return 'reading', {'sensor': 'soil_moisture', 'soil_moisture': moisture, 'read_at': read_at}
+    if kind == DHT_READING:
+        _, read_at, temperature_c, humidity = DHT.unpack(payload)
+        return 'reading', {'sensor': 'dht', 'temperature_c': temperature_c, 'humidity': humidity, 'read_at': read_at}
+    _, event_type, _, data = decode(payload)
+    return event_type, data
+
+
+class HardwareServer:
+    """Command and event API of the hardware daemon on a Unix domain socket.
+
+    Clients open with HELLO listing the payload codecs they support and the
+    server answers WELCOME with the one both sides have (msgpack, else JSON).
+    REQUEST frames carry [command, args] and are answered by a RESPONSE or
+    ERROR frame with the same request id. After SUBSCRIBE, events of the
+    requested types are pushed as they are published on the bus; each
+    client has its own bounded queue and sender thread, so a slow client
+    drops its oldest events instead of stalling the sensors.
+
+    Commands run on the connection's reader thread; ones registered as
+    blocking (e.g. a full irrigation cycle) run on a worker pool so the
+    same client can keep issuing other commands meanwhile.
+    """
+
+    def __init__(self, path, event_bus=None, queue_size=1000, workers=4):
+        self.path = path
+        self.event_bus = event_bus
+        self.queue_size = queue_size
+        self.handlers = {}
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ipc-command')
+        self.lock = Lock()
+        self.connections = set()
+        self.connection_ids = itertools.count(1)
+        self.listener = None
+        self.thread = None
+        self.running = False
+        self.requests = 0
+        self.errors = 0
+
+    def register(self, command, handler, blocking=False):
+        self.handlers[command] = (handler, blocking)
+
+    def start(self):
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError(f"Another hardware daemon is listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a daemon that did not shut down cleanly
+                os.unlink(self.path)
+            finally:
+                probe.close()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        os.chmod(self.path, 0o660)
+        self.listener.listen(16)
+        self.running = True
+        self.thread = Thread(target=self._accept_loop, name='ipc-accept', daemon=True)
+        self.thread.start()
+        print(f"[IPC] Listening on {self.path} ({', '.join(sorted(self.handlers))})")
+
+    def stop(self):
+        print("[IPC] Stopping hardware IPC server")
+        self.running = False
+        if self.listener:
+            try:
+                self.listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.listener.close()
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+        if self.thread:
+            self.thread.join(2)
+        self.pool.shutdown(wait=False)
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                break
+            connection = _ServerConnection(self, sock, next(self.connection_ids))
+            with self.lock:
+                self.connections.add(connection)
+            Thread(target=connection.run, name=f'ipc-client-{connection.number}', daemon=True).start()
+
+    def _remove(self, connection):
+        with self.lock:
+            self.connections.discard(connection)
+
+    def _dispatch(self, command, args):
+        """Result of a command, raising for unknown commands"""
+        entry = self.handlers.get(command)
+        if entry is None:
+            raise ValueError(f"Unknown command '{command}'")
+        return entry[0](*args)
+
+    def get_stats(self):
+        with self.lock:
+            connections = list(self.connections)
+        return {
+            'path': self.path,
+            'clients': [connection.get_stats() for connection in connections],
+            'requests': self.requests,
+            'errors': self.errors
+        }
+
+
+class _ServerConnection:
+    def __init__(self, server, sock, number):
+        self.server = server
+        self.sock = sock
+        self.stream = sock.makefile('rb')
+        self.number = number
+        self.name = f'client-{number}'
+        self.send_lock = Lock()
+        self.encode, self.decode = CODECS['json']
+        self.codec = 'json'
+        self.subscription = None
+        self.closed = False
+        self.events_sent = 0
+
+    def run(self):
+        try:
+            frame = read_frame(self.stream)
+            if frame is None or frame[0] != HELLO:
+                return
+            hello = json.loads(frame[2])
+            self.name = f"{hello.get('name', 'client')}-{self.number}"
+            self.codec = next((codec for codec in CODEC_ORDER
+                               if codec in CODECS and codec in hello.get('codecs', ())), 'json')
+            self.encode, self.decode = CODECS[self.codec]
+            self._send(encode_frame(WELCOME, frame[1], _json_dumps(
+                {'version': PROTOCOL_VERSION, 'codec': self.codec, 'pid': os.getpid()})))
+            print(f"[IPC] {self.name} connected ({self.codec})")
+
+            while not self.closed:
+                frame = read_frame(self.stream)
+                if frame is None:
+                    break
+                kind, request_id, payload = frame
+                if kind == REQUEST:
+                    self._request(request_id, payload)
+                elif kind == SUBSCRIBE:
+                    self._subscribe(request_id, self.decode(payload))
+        except (OSError, ValueError, HardwareError) as e:
+            if not self.closed:
+                print(f"[IPC] {self.name} connection error: {e}")
+        finally:
+            self.close()
+            print(f"[IPC] {self.name} disconnected")
+
+    def _request(self, request_id, payload):
+        self.server.requests += 1
+        try:
+            command, args = self.decode(payload)
+        except Exception as e:
+            self.server.errors += 1
+            self._send(encode_frame(ERROR, request_id, self.encode(
+                {'type': 'ValueError', 'message': f"Malformed request: {e}"})))
+            return
+        entry = self.server.handlers.get(command)
+        if entry is not None and entry[1]:
+            self.server.pool.submit(self._respond, request_id, command, args)
+        else:
+            self._respond(request_id, command, args)
+
+    def _respond(self, request_id, command, args):
+        try:
+            frame = encode_frame(RESPONSE, request_id, self.encode(self.server._dispatch(command, args)))
+        except Exception as e:
+            self.server.errors += 1
+            frame = encode_frame(ERROR, request_id, self.encode({'type': type(e).__name__, 'message': str(e)}))
+        try:
+            self._send(frame)
+        except OSError:
+            pass
+
+    def _subscribe(self, request_id, types):
+        if self.server.event_bus is None or self.subscription is not None:
+            self._send(encode_frame(ERROR, request_id, self.encode(
+                {'type': 'ValueError', 'message': 'Already subscribed or no event bus'})))
+            return
+        self.subscription = self.server.event_bus.subscribe(
+            types=types or None, maxsize=self.server.queue_size, name=f'ipc-{self.name}'
+        )
+        self._send(encode_frame(RESPONSE, request_id, self.encode(True)))
+        Thread(target=self._send_events, name=f'ipc-events-{self.number}', daemon=True).start()
+
+    def _send_events(self):
+        subscription = self.subscription
+        for event in subscription:
+            # Whatever queued up meanwhile goes out in the same write
+            events = [event] + subscription.drain()
+            try:
+                self._send(b''.join(encode_event(item, self.encode) for item in events))
+            except OSError:
+                break
+            self.events_sent += len(events)
+
+    def _send(self, data):
+        with self.send_lock:
+            self.sock.sendall(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.subscription:
+            self.subscription.close()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.server._remove(self)
+
+    def get_stats(self):
+        stats = {'name': self.name, 'codec': self.codec, 'events_sent': self.events_sent}
+        if self.subscription:
+            stats['dropped'] = self.subscription.get_stats()['dropped']
+        return stats
+
+
+class HardwareClient:
+    """Client of the hardware daemon, shared by every thread of a process.
+
+    call() sends a command and waits for its reply; replies are matched by
+    request id, so calls from several threads overlap on one connection.
+    Events the process subscribed to are re-published on its own event
+    bus, where the usual subscribers pick them up. When the daemon goes
+    away, pending and new calls fail with HardwareError while the reader
+    thread reconnects and subscribes again in the background.
+    """
+
+    def __init__(self, path, name='client', timeout=5.0, reconnect_interval=1.0):
+        self.path = path
+        self.name = name
+        self.timeout = timeout
+        self.reconnect_interval = reconnect_interval
+        self.lock = Lock()
+        self.send_lock = Lock()
+        self.sock = None
+        self.stream = None
+        self.encode, self.decode = CODECS['json']
+        self.codec = None
+        self.request_ids = itertools.count(1)
+        self.pending = {}
+        self.event_bus = None
+        self.types = None
+        self.subscribed = False
+        self.connected = Event()
+        self.closed = False
+        # Set by close() to end the reconnect wait at once
+        self.close_event = Event()
+        self.thread = None
+        self.events_received = 0
+        self.reconnects = 0
+
+    def set_event_bus(self, event_bus):
+        with self.lock:
+            self.event_bus = event_bus
+
+    def connect(self, wait=0):
+        """Connect, retrying for up to `wait` seconds while the daemon starts"""
+        deadline = time.time() + wait
+        while True:
+            try:
+                self._open()
+                break
+            except OSError as e:
+                if time.time() >= deadline:
+                    raise HardwareError(f"Hardware daemon not reachable at {self.path}: {e}")
+                time.sleep(min(self.reconnect_interval, max(0.05, deadline - time.time())))
+        self.thread = Thread(target=self._read_loop, name='ipc-reader', daemon=True)
+        self.thread.start()
+        print(f"[IPC] Connected to hardware daemon at {self.path} ({self.codec})")
+
+    def _open(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            stream = sock.makefile('rb')
+            codecs = [codec for codec in CODEC_ORDER if codec in CODECS]
+            sock.sendall(encode_frame(HELLO, 0, _json_dumps({'name': self.name, 'codecs': codecs})))
+            frame = read_frame(stream)
+            if frame is None or frame[0] != WELCOME:
+                raise ConnectionError("no WELCOME from the hardware daemon")
+            welcome = json.loads(frame[2])
+            sock.settimeout(None)
+        except Exception:
+            sock.close()
+            raise
+
+        with self.lock:
+            self.sock = sock
+            self.stream = stream
+            self.codec = welcome['codec']
+            self.encode, self.decode = CODECS[self.codec]
+            types = self.types
+            subscribed = self.subscribed
+        if subscribed:
+            self._send(encode_frame(SUBSCRIBE, 0, self.encode(types)))
+        self.connected.set()
+
+    def subscribe(self, types=None):
+        """Have the daemon push events of these types (all when None) to the event bus"""
+        with self.lock:
+            self.types = list(types) if types is not None else None
+            self.subscribed = True
+        self.call_frame(SUBSCRIBE, self.types, self.timeout)
+
+    def call(self, command, *args, timeout=-1):
+        """Run a daemon command and return its result.
+
+        timeout=-1 uses the client default, None waits for as long as the
+        command runs (e.g. a full irrigation cycle).
+        """
+        return self.call_frame(REQUEST, [command, list(args)], self.timeout if timeout == -1 else timeout)
+
+    def call_frame(self, kind, body, timeout=None):
+        if not self.connected.is_set():
+            raise HardwareError("Not connected to the hardware daemon")
+        request_id = next(self.request_ids) & 0xFFFFFFFF
+        slot = [Event(), None, None]
+        with self.lock:
+            self.pending[request_id] = slot
+            encode = self.encode
+        try:
+            self._send(encode_frame(kind, request_id, encode(body)))
+            if not slot[0].wait(timeout):
+                raise HardwareError(f"Hardware daemon did not answer within {timeout}s")
+        except OSError as e:
+            raise HardwareError(f"Hardware daemon connection failed: {e}")
+        finally:
+            with self.lock:
+                self.pending.pop(request_id, None)
+
+        if slot[2] is not None:
+            error = slot[2]
+            if error.get('type') == 'ValueError':
+                raise ValueError(error['message'])
+            raise HardwareError(error.get('message', 'command failed'))
+        return slot[1]
+
+    def _send(self, data):
+        with self.send_lock:
+            sock = self.sock
+            if sock is None:
+                raise HardwareError("Not connected to the hardware daemon")
+            sock.sendall(data)
+
+    def _read_loop(self):
+        while not self.closed:
+            try:
+                self._read_frames()
+            except (OSError, ValueError, HardwareError) as e:
+                if not self.closed:
+                    print(f"[IPC] Hardware daemon connection error: {e}")
+            self._disconnected()
+            while not self.close_event.wait(self.reconnect_interval):
+                try:
+                    self._open()
+                    self.reconnects += 1
+                    print("[IPC] Reconnected to hardware daemon")
+                    break
+                except (OSError, ValueError, HardwareError):
+                    # Also a garbled handshake: keep retrying rather than
+                    # leave every later call waiting on a dead reader
+                    continue
+
+    def _read_frames(self):
+        stream = self.stream
+        decode = self.decode
+        while not self.closed:
+            frame = read_frame(stream)
+            if frame is None:
+                print("[IPC] Hardware daemon closed the connection")
+                return
+            kind, request_id, payload = frame
+            if kind == RESPONSE or kind == ERROR:
+                with self.lock:
+                    slot = self.pending.get(request_id)
+                if slot is not None:
+                    if kind == RESPONSE:
+                        slot[1] = decode(payload)
+                    else:
+                        slot[2] = decode(payload)
+                    slot[0].set()
+            elif kind in (EVENT, SOIL_READING, DHT_READING):
+                event_type, data = decode_event(kind, payload, decode)
+                self.events_received += 1
+                event_bus = self.event_bus
+                if event_bus is not None:
+                    event_bus.publish(event_type, data)
+
+    def _disconnected(self):
+        self.connected.clear()
+        with self.lock:
+            sock = self.sock
+            self.sock = None
+            pending = list(self.pending.values())
+        if sock is not None:
+            sock.close()
+        for slot in pending:
+            slot[2] = {'type': 'HardwareError', 'message': 'Hardware daemon disconnected'}
+            slot[0].set()
+
+    def close(self):
+        self.closed = True
+        self.close_event.set()
+        with self.lock:
+            sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.thread:
+            self.thread.join(2)
+        self._disconnected()
+
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'connected': self.connected.is_set(),
+            'codec': self.codec,
+            'events_received': self.events_received,
+            'reconnects': self.reconnects
+        }
+
+
+class CachedCall:
+    """Last result of a daemon command, for request handlers that must not
+    wait on the socket.
+
+    get() returns the cached value at once. When it is older than max_age,
+    one refresh starts in the background; a daemon that does not answer
+    leaves the previous value in place until the next attempt, max_age
+    later. invalidate() refreshes now, for callers that know the value
+    changed.
+    """
+
+    def __init__(self, client, command, max_age=5.0):
+        self.client = client
+        self.command = command
+        self.max_age = max_age
+        self.lock = Lock()
+        self.value = None
+        self.fetched_at = 0.0
+        # Bumped by invalidate(), so a refresh already under way runs again
+        self.generation = 0
+        # The first value is fetched at startup, before any request
+        self.refreshing = True
+        self._refresh()
+
+    def get(self):
+        with self.lock:
+            start = not self.refreshing and time.monotonic() - self.fetched_at > self.max_age
+            if start:
+                self.refreshing = True
+            value = self.value
+        if start:
+            Thread(target=self._refresh, name=f'refresh-{self.command}', daemon=True).start()
+        return value
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.fetched_at = 0.0
+        self.get()
+
+    def _refresh(self):
+        while True:
+            with self.lock:
+                generation = self.generation
+            try:
+                value = self.client.call(self.command)
+                failed = False
+            except HardwareError as e:
+                print(f"[IPC] Could not refresh {self.command}: {e}")
+                failed = True
+            with self.lock:
+                if not failed:
+                    self.value = value
+                self.fetched_at = time.monotonic()
+                if failed or generation == self.generation:
+                    self.refreshing = False
+                    return
+
+
+class RemoteServoController:
+    """ServoController stand-in for thin clients; the valve stays in the daemon"""
+
+    # Finished jobs remembered for start_irrigation() calls still in flight
+    FINISHED_JOBS = 32
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = Lock()
+        self.completions = {}
+        # A short or cancelled job can finish before its start call returns
+        self.finished = collections.OrderedDict()
+        self.get_profiles()
+
+    def handle_event(self, event):
+        """Event bus subscriber running on_complete callbacks of start_irrigation()
+        and refreshing the profiles after the daemon reloaded them"""
+        if event.type == 'config_reloaded':
+            try:
+                self.get_profiles()
+            except HardwareError as e:
+                print(f"[IPC] Could not refresh irrigation profiles: {e}")
+            return
+        job_id = event.data.get('job_id')
+        with self.lock:
+            callback = self.completions.pop(job_id, None)
+            if callback is None:
+                self.finished[job_id] = event.data.get('success')
+                while len(self.finished) > self.FINISHED_JOBS:
+                    self.finished.popitem(last=False)
+        if callback:
+            callback(event.data.get('success'))
+
+    def get_profiles(self):
+        profiles = self.client.call('get_profiles')
+        self.profiles, self.profiles_version = profiles['profiles'], profiles['version']
+        return profiles
+
+    def get_state(self):
+        return self.client.call('get_servo_state')
+
+    def irrigate(self, profile='standard', source='manual'):
+        return self.client.call('irrigate', profile, source, timeout=None)
+
+    def start_irrigation(self, profile='standard', source='manual', on_complete=None):
+        job_id = self.client.call('start_irrigation', profile, source)
+        if job_id is None or not on_complete:
+            return job_id
+        with self.lock:
+            finished = job_id in self.finished
+            success = self.finished.pop(job_id, None)
+            if not finished:
+                self.completions[job_id] = on_complete
+        if finished:
+            on_complete(success)
+        return job_id
+
+    def cancel(self, emergency=False):
+        return self.client.call('cancel_irrigation', emergency)
+
+    def cleanup(self):
+        pass
+
+
+class RemoteLEDController:
+    """LEDController stand-in for thin clients"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def update_leds(self, soil_moisture):
+        self.client.call('update_leds', soil_moisture)
+
+    def get_state(self):
+        return self.client.call('get_led_state')
+
+    def cleanup(self):
+        pass
+
+
+class RemoteIrrigationLog:
+    """IrrigationLog stand-in for thin clients; the daemon is its only writer"""
+
+    def __init__(self, client):
+        self.client = client
+        # Part of the ETags of conditional GETs, so never read over the socket there
+        self.cached_version = CachedCall(client, 'irrigation_log_version', max_age=1.0)
+
+    @property
+    def version(self):
+        return self.cached_version.get()
+
+    def handle_event(self, event):
+        """Event bus subscriber for 'irrigation_finished': the daemon has logged the cycle"""
+        self.cached_version.invalidate()
+
+    def list_events(self, limit=50, before=None, source=None):
+        events, next_cursor = self.client.call('list_irrigations', limit, before, source)
+        return events, next_cursor
+
+    def get_stats(self, days=30):
+        return self.client.call('irrigation_stats', days)
+
+    def close(self):
+        pass
+
+
+class RemoteScheduler:
+    """AdaptiveScheduler stats for thin clients"""
+
+    def __init__(self, client):
+        self.client = client
+        # Served to /api/health, which never waits on the daemon
+        self.cached_stats = CachedCall(client, 'get_sampling', max_age=5.0)
+
+    def get_stats(self):
+        return self.cached_stats.get()
+
+
+class RemoteAlertEngine:
+    """Firing alerts and engine stats of the daemon's AlertEngine"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_alerts(self):
+        return self.client.call('list_alerts')
+
+    def get_stats(self):
+        return self.client.call('alert_stats')
@@ -0,0 +1,195 @@
+import time
+from threading import Thread, Lock, Event
+
+
+class HealthMonitor:
+    """Runs component probes in the background and caches their results, so
+    health endpoints never touch hardware or the model server themselves.
+
+    Each probe runs on a thread of its own, so a model server that does not
+    answer cannot hold up the sensor checks. A probe still running after its
+    timeout is reported failing, and a failing probe is retried after 1, 2,
+    4... ticks, up to its interval, rather than on every tick.
+    """
+
+    def __init__(self, tick=1.0):
+        self.tick = tick
+        self.probes = {}
+        self.results = {}
+        self.lock = Lock()
+        self.stop_event = Event()
+        self.running = False
+        self.thread = None
+
+    def add_probe(self, name, probe, interval=5, ttl=None, critical=True, timeout=None):
+        with self.lock:
+            self.probes[name] = {
+                'probe': probe,
+                'interval': interval,
+                'ttl': ttl if ttl is not None else interval * 3,
+                'critical': critical,
+                'timeout': timeout if timeout is not None else interval,
+                'next_run': 0,
+                # When the running probe started, None while idle
+                'started': None,
+                'failures': 0
+            }
+
+    def start(self):
+        print("[HEALTH] Starting health monitor thread")
+        self.running = True
+        self.stop_event.clear()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        print("[HEALTH] Stopping health monitor thread")
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        print("[HEALTH] Health monitor thread running")
+        while self.running:
+            now = time.time()
+            due = []
+            hung = []
+            with self.lock:
+                for name, entry in self.probes.items():
+                    if entry['started'] is None:
+                        if entry['next_run'] <= now:
+                            entry['started'] = now
+                            due.append((name, entry))
+                    elif now - entry['started'] > entry['timeout']:
+                        hung.append((name, entry['timeout']))
+
+            for name, entry in due:
+                Thread(target=self._run_probe, args=(name, entry), name=f'health-{name}', daemon=True).start()
+            for name, timeout in hung:
+                # Not started again until it returns; reported failing meanwhile
+                self._record(name, False, {'reason': f'probe timed out after {timeout}s'}, now, now)
+
+            self.stop_event.wait(self.tick)
+
+    def _run_probe(self, name, entry):
+        started = entry['started']
+        try:
+            ok, detail = entry['probe']()
+        except Exception as e:
+            ok, detail = False, {'error': str(e)}
+        finished = time.time()
+
+        with self.lock:
+            entry['started'] = None
+            if ok:
+                entry['failures'] = 0
+                entry['next_run'] = started + entry['interval']
+            else:
+                # Re-check soon so recovery shows up fast, but back off while it stays down
+                entry['failures'] += 1
+                entry['next_run'] = finished + min(entry['interval'], self.tick * 2 ** (entry['failures'] - 1))
+        self._record(name, ok, detail, started, finished)
+        return ok
+
+    def _record(self, name, ok, detail, started, finished):
+        result = {
+            'status': 'pass' if ok else 'fail',
+            'checked_at': started,
+            'duration_ms': round((finished - started) * 1000, 2)
+        }
+        result.update(detail)
+
+        with self.lock:
+            previous = self.results.get(name)
+            self.results[name] = result
+
+        if previous is None or previous['status'] != result['status']:
+            print(f"[HEALTH] {name}: {result['status']} {detail}")
+
+    def get_report(self):
+        now = time.time()
+        checks = {}
+        ready = True
+
+        with self.lock:
+            for name, entry in self.probes.items():
+                result = self.results.get(name)
+                if result is None:
+                    check = {'status': 'unknown', 'reason': 'not checked yet'}
+                elif now - result['checked_at'] > entry['ttl']:
+                    check = dict(result, status='unknown', reason='result expired')
+                else:
+                    check = dict(result)
+
+                check['critical'] = entry['critical']
+                checks[name] = check
+                if entry['critical'] and check['status'] != 'pass':
+                    ready = False
+
+        return {'ready': ready, 'checks': checks}
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+def uart_probe(uart_handler, stale_after=60):
+    def probe():
+        last_update = uart_handler.get_data()['last_update_time']
+        if last_update is None:
+            return False, {'reason': 'no soil moisture data received'}
+
+        age = time.time() - last_update
+        if age > stale_after:
+            return False, {'reason': 'soil moisture data is stale', 'age_s': round(age, 1)}
+        return True, {'age_s': round(age, 1)}
+
+    return probe
+
+
+def dht_probe(dht_sensor, max_failure_ratio=0.8):
+    def probe():
+        data = dht_sensor.get_data()
+        stats = dht_sensor.get_stats()
+        detail = {
+            'quality': data['quality'],
+            'age_s': round(data['age'], 1) if data['age'] is not None else None,
+            'failure_ratio': round(stats['failure_ratio'], 3)
+        }
+
+        if data['quality'] in ('none', 'stale'):
+            detail['reason'] = 'no recent temperature/humidity reading'
+            return False, detail
+        if stats['failure_ratio'] > max_failure_ratio:
+            detail['reason'] = 'most DHT22 reads are failing'
+            return False, detail
+        return True, detail
+
+    return probe
+
+
+def llm_probe(llm_interface):
+    def probe():
+        return llm_interface.check_service()
+
+    return probe
+
+
+def hardware_probe(client):
+    """Readiness of the hardware daemon's own checks, for thin clients"""
+    def probe():
+        readiness = client.call('get_readiness')
+        failing = [name for name, check in readiness['checks'].items()
+                   if check['status'] != 'pass' and check.get('critical', True)]
+        detail = {
+            'daemon_ready': readiness['ready'],
+            'soil_moisture_received': readiness['soil_moisture_received'],
+            'temperature_received': readiness['temperature_received']
+        }
+        if failing:
+            detail['reason'] = f"daemon checks failing: {', '.join(sorted(failing))}"
+        elif not readiness['ready']:
+            detail['reason'] = 'hardware daemon is still starting'
+        return readiness['ready'], detail
+
+    return probe
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Streaming export of the sensor and irrigation history as CSV, NDJSON or
+Arrow IPC, from the same SQLite stores the system writes to.
+"""
+
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+import urllib.parse
+from datetime import datetime
+
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data')
+# Rows fetched and encoded at a time; memory use is bounded by one page
+PAGE_SIZE = 5000
+
+# Exportable tables: their store file, time column and (column, type) pairs.
+# id comes first in every export and is the cursor to resume after.
+TABLES = {
+    'readings': {
+        'file': 'history.db',
+        'time': 'timestamp',
+        'columns': (('id', 'int'), ('timestamp', 'real'), ('sensor', 'text'), ('soil_moisture', 'int'),
+                    ('temperature_c', 'real'), ('humidity', 'real'))
+    },
+    'irrigations': {
+        'file': 'irrigations.db',
+        'time': 'started_at',
+        'columns': (('id', 'int'), ('started_at', 'real'), ('duration', 'real'), ('source', 'text'),
+                    ('success', 'int'), ('pre_moisture', 'int'), ('post_moisture', 'int'), ('recovery', 'int'),
+                    ('dried_at', 'real'), ('time_to_dry', 'real'))
+    }
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+
+def parse_time(value):
+    """Seconds since the epoch from a number or an ISO 8601 date/time (local
+    time unless it has an offset); None stays None"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"'{value}' is neither epoch seconds nor an ISO 8601 time")
+
+
+def iter_pages(path, table, fields, start=None, end=None, after=None, page_size=PAGE_SIZE):
+    """Lists of up to page_size row tuples in id order.
+
+    The id range is fixed when the export starts, so rows written meanwhile
+    are left for the next export. Each page is its own short query on a
+    read-only connection: the store keeps writing, and its WAL can be
+    checkpointed, while a long export runs.
+    """
+    spec = TABLES[table]
+    time_column = spec['time']
+    uri = 'file:' + urllib.parse.quote(os.path.abspath(path)) + '?mode=ro'
+    db = sqlite3.connect(uri, uri=True)
+    try:
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append(f"{time_column} >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{time_column} < ?")
+            params.append(end)
+        where = " AND ".join(clauses)
+
+        # Bounds from the time index, so a narrow range does not scan the table
+        bounds = f"FROM {table}" + (f" WHERE {where}" if where else "")
+        first, last = db.execute(f"SELECT (SELECT MIN(id) {bounds}), (SELECT MAX(id) {bounds})",
+                                 params + params).fetchone()
+        if first is None:
+            return
+        cursor = first - 1 if after is None else max(after, first - 1)
+
+        query = (f"SELECT {', '.join(fields)} FROM {table} WHERE id > ? AND id <= ?"
+                 + (f" AND {where}" if where else "") + " ORDER BY id LIMIT ?")
+        while cursor < last:
+            rows = db.execute(query, [cursor, last] + params + [page_size]).fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            cursor = rows[-1][0]
+    finally:
+        db.close()
+
+
+def encode_csv(pages, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(fields)
+    for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def encode_ndjson(pages, fields):
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    for rows in pages:
+        yield ''.join([dumps(dict(zip(fields, row))) + '\n' for row in rows]).encode('utf-8')
+
+
+def encode_arrow(pages, fields, types):
+    """Arrow IPC stream: the schema, then one record batch per page"""
+    # Imported here: pyarrow adds tens of MB to every CSV or NDJSON export too
+    import pyarrow
+    import pyarrow.ipc
+    arrow_types = {'int': pyarrow.int64(), 'real': pyarrow.float64(), 'text': pyarrow.string()}
+    schema = pyarrow.schema([(field, arrow_types[types[field]]) for field in fields])
+    buffer = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(buffer, schema)
+    for rows in pages:
+        columns = list(zip(*rows))
+        writer.write_batch(pyarrow.record_batch(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        ))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    writer.close()
+    yield buffer.getvalue()
+
+
+def export(state_dir, table='readings', fmt='csv', fields=None, start=None, end=None, after=None,
+           page_size=PAGE_SIZE):
+    """Check the request and return a generator of encoded chunks.
+
+    fields selects columns (id is always included first); start/end bound
+    the time column, end exclusive; after resumes past a row id.
+    Raises ValueError for a bad request and FileNotFoundError when the
+    store has not been created.
+    """
+    spec = TABLES.get(table)
+    if spec is None:
+        raise ValueError(f"Unknown table '{table}', choose from {', '.join(TABLES)}")
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"Unknown format '{fmt}', choose from {', '.join(CONTENT_TYPES)}")
+    if fmt == 'arrow' and importlib.util.find_spec('pyarrow') is None:
+        raise ValueError("Arrow export needs pyarrow (pip install pyarrow)")
+    types = dict(spec['columns'])
+    if fields:
+        unknown = [field for field in fields if field not in types]
+        if unknown:
+            raise ValueError(f"Unknown {table} fields: {', '.join(unknown)}")
+        fields = ['id'] + [field for field in dict.fromkeys(fields) if field != 'id']
+    else:
+        fields = list(types)
+    path = os.path.join(state_dir, spec['file'])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {table} store at {path}")
+
+    pages = iter_pages(path, table, fields, start, end, after, page_size)
+    if fmt == 'arrow':
+        return encode_arrow(pages, fields, types)
+    if fmt == 'ndjson':
+        return encode_ndjson(pages, fields)
+    return encode_csv(pages, fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Plant Talker sensor or irrigation history")
+    parser.add_argument('table', nargs='?', default='readings', choices=list(TABLES))
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR,
+                        help="Directory holding history.db and irrigations.db")
+    parser.add_argument('--format', default='csv', choices=list(CONTENT_TYPES))
+    parser.add_argument('--fields', help="Comma-separated columns (default: all)")
+    parser.add_argument('--start', help="From this time: epoch seconds or ISO 8601")
+    parser.add_argument('--end', help="Until this time (exclusive)")
+    parser.add_argument('--after', type=int, help="Resume after this row id")
+    parser.add_argument('--output', '-o', help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        chunks = export(args.state_dir, args.table, args.format, args.fields.split(',') if args.fields else None,
+                        parse_time(args.start), parse_time(args.end), args.after)
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+
+    started = time.time()
+    written = 0
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    print(f"[EXPORT] Wrote {written} bytes of {args.table} in {time.time() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
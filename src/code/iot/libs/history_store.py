@@ -0,0 +1,113 @@
+import sqlite3
+import time
+from threading import Lock
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    sensor TEXT NOT NULL,
+    soil_moisture INTEGER,
+    temperature_c REAL,
+    humidity REAL
+);
+CREATE INDEX IF NOT EXISTS readings_timestamp ON readings (timestamp);
+"""
+
+
+class HistoryStore:
+    """SQLite time series of sensor readings.
+
+    Readings are buffered and inserted in one transaction once batch_size
+    have accumulated or flush_interval seconds have passed, so a reading
+    every second costs one commit every few seconds on the SD card.
+    """
+
+    def __init__(self, path, batch_size=50, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = Lock()
+        self.buffer = []
+        self.last_flush = time.time()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        print(f"[HISTORY] Opened {path}")
+
+    def handle_event(self, event):
+        """Event bus subscriber for 'reading' events"""
+        data = event.data
+        self.record_reading(data['sensor'], data.get('read_at', event.timestamp), data.get('soil_moisture'),
+                            data.get('temperature_c'), data.get('humidity'))
+
+    def record_reading(self, sensor, timestamp, soil_moisture=None, temperature_c=None, humidity=None):
+        with self.lock:
+            self.buffer.append((timestamp, sensor, soil_moisture, temperature_c, humidity))
+            if len(self.buffer) >= self.batch_size or time.time() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self.last_flush = time.time()
+        if not self.buffer:
+            return
+        self.db.executemany(
+            "INSERT INTO readings (timestamp, sensor, soil_moisture, temperature_c, humidity) VALUES (?, ?, ?, ?, ?)",
+            self.buffer
+        )
+        self.db.commit()
+        self.buffer = []
+
+    def list_readings(self, start=None, end=None, sensor=None, limit=1000):
+        """Readings in time order, including any still buffered"""
+        query = "SELECT timestamp, sensor, soil_moisture, temperature_c, humidity FROM readings"
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        if sensor:
+            clauses.append("sensor = ?")
+            params.append(sensor)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            self._flush()
+            rows = self.db.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_averages(self, column, start, interval, sensor=None):
+        """(bucket midpoint, mean) of a reading column per `interval` seconds since start"""
+        if column not in ('soil_moisture', 'temperature_c', 'humidity'):
+            raise ValueError(f"Unknown reading column '{column}'")
+        query = (f"SELECT (CAST(timestamp / ? AS INTEGER) + 0.5) * ?, AVG({column}) FROM readings "
+                 f"WHERE timestamp >= ? AND {column} IS NOT NULL")
+        params = [interval, interval, start]
+        if sensor:
+            query += " AND sensor = ?"
+            params.append(sensor)
+        query += " GROUP BY CAST(timestamp / ? AS INTEGER) ORDER BY 1"
+        params.append(interval)
+
+        with self.lock:
+            self._flush()
+            return self.db.execute(query, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.db.close()
@@ -0,0 +1,210 @@
+import sqlite3
+import time
+from threading import Lock
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS irrigations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    source TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    pre_moisture INTEGER,
+    post_moisture INTEGER,
+    recovery INTEGER,
+    dried_at REAL,
+    time_to_dry REAL
+);
+CREATE INDEX IF NOT EXISTS irrigations_started_at ON irrigations (started_at);
+CREATE INDEX IF NOT EXISTS irrigations_source ON irrigations (source, id);
+CREATE TABLE IF NOT EXISTS irrigation_daily (
+    day TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    successes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS irrigation_totals (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+class IrrigationLog:
+    """SQLite-backed log of irrigation cycles with incrementally maintained
+    aggregates, so stats requests never scan the whole log.
+
+    After a successful cycle, moisture readings are watched for settle_time
+    seconds; the peak reading becomes post_moisture (recovery = peak - pre).
+    The first reading below dry_threshold after that sets time_to_dry.
+    """
+
+    def __init__(self, path, settle_time=600, dry_threshold=35):
+        self.path = path
+        self.settle_time = settle_time
+        self.dry_threshold = dry_threshold
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.pending = self._load_pending()
+        # Bumped on every write so readers can tell whether anything changed
+        self.version = 0
+        print(f"[IRRIGATION LOG] Opened {path}")
+
+    def _load_pending(self):
+        row = self.db.execute(
+            "SELECT * FROM irrigations WHERE success = 1 ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row is None or row['dried_at'] is not None:
+            return None
+        return {
+            'id': row['id'],
+            'finished_at': row['started_at'] + row['duration'],
+            'pre_moisture': row['pre_moisture'],
+            'peak': row['post_moisture'],
+            'settled': row['recovery'] is not None
+        }
+
+    def record_irrigation(self, source, started_at, duration, success, pre_moisture):
+        day = time.strftime('%Y-%m-%d', time.localtime(started_at))
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO irrigations (started_at, duration, source, success, pre_moisture) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (started_at, duration, source, int(success), pre_moisture)
+            )
+            self.db.execute(
+                "INSERT INTO irrigation_daily (day, count, successes) VALUES (?, 1, ?) "
+                "ON CONFLICT(day) DO UPDATE SET count = count + 1, successes = successes + excluded.successes",
+                (day, int(success))
+            )
+            self.db.commit()
+            self.version += 1
+            event_id = cursor.lastrowid
+
+            if success:
+                # A new cycle supersedes whatever the previous one was waiting for
+                self.pending = {
+                    'id': event_id,
+                    'finished_at': started_at + duration,
+                    'pre_moisture': pre_moisture,
+                    'peak': None,
+                    'settled': False
+                }
+
+        print(f"[IRRIGATION LOG] Recorded irrigation #{event_id} ({source}, success={success})")
+        return event_id
+
+    def handle_event(self, event):
+        """Event bus subscriber for soil moisture 'reading' events"""
+        if event.data.get('sensor') == 'soil_moisture':
+            self.observe_moisture(event.data['soil_moisture'], event.data.get('read_at'))
+
+    def observe_moisture(self, moisture, timestamp=None):
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self.lock:
+            pending = self.pending
+            if pending is None or moisture is None or moisture == 0:
+                return
+
+            if not pending['settled']:
+                if timestamp - pending['finished_at'] <= self.settle_time:
+                    if pending['peak'] is None or moisture > pending['peak']:
+                        pending['peak'] = moisture
+                    return
+                self._settle(pending)
+
+            if moisture < self.dry_threshold:
+                self._mark_dry(pending, timestamp)
+
+    def _settle(self, pending):
+        pending['settled'] = True
+        if pending['peak'] is None or pending['pre_moisture'] is None:
+            self.db.execute("UPDATE irrigations SET post_moisture = ? WHERE id = ?", (pending['peak'], pending['id']))
+            self.db.commit()
+            self.version += 1
+            return
+
+        recovery = pending['peak'] - pending['pre_moisture']
+        self.db.execute(
+            "UPDATE irrigations SET post_moisture = ?, recovery = ? WHERE id = ?",
+            (pending['peak'], recovery, pending['id'])
+        )
+        self._add_total('recovery_sum', recovery)
+        self._add_total('recovery_count', 1)
+        self.db.commit()
+        self.version += 1
+
+    def _mark_dry(self, pending, timestamp):
+        time_to_dry = timestamp - pending['finished_at']
+        self.db.execute(
+            "UPDATE irrigations SET dried_at = ?, time_to_dry = ? WHERE id = ?",
+            (timestamp, time_to_dry, pending['id'])
+        )
+        self._add_total('time_to_dry_sum', time_to_dry)
+        self._add_total('time_to_dry_count', 1)
+        self.db.commit()
+        self.version += 1
+        self.pending = None
+
+    def _add_total(self, name, amount):
+        self.db.execute(
+            "INSERT INTO irrigation_totals (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def list_events(self, limit=50, before=None, source=None):
+        """Newest first, keyset-paginated on id via the before cursor"""
+        query = "SELECT * FROM irrigations"
+        clauses = []
+        params = []
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+
+        events = [dict(row, success=bool(row['success'])) for row in rows]
+        next_cursor = events[-1]['id'] if len(events) == limit else None
+        return events, next_cursor
+
+    def get_stats(self, days=30):
+        with self.lock:
+            daily = self.db.execute(
+                "SELECT day, count, successes FROM irrigation_daily ORDER BY day DESC LIMIT ?", (days,)
+            ).fetchall()
+            totals = dict(self.db.execute("SELECT name, value FROM irrigation_totals").fetchall())
+            overall = self.db.execute(
+                "SELECT COALESCE(SUM(count), 0), COALESCE(SUM(successes), 0), COUNT(*) FROM irrigation_daily"
+            ).fetchone()
+
+        total, successes, active_days = overall
+        recovery_count = totals.get('recovery_count', 0)
+        dry_count = totals.get('time_to_dry_count', 0)
+        return {
+            'total_irrigations': total,
+            'successful_irrigations': successes,
+            'waterings_per_day': [dict(row) for row in reversed(daily)],
+            'mean_waterings_per_active_day': total / active_days if active_days else 0.0,
+            'mean_moisture_recovery': totals['recovery_sum'] / recovery_count if recovery_count else None,
+            'mean_time_to_dry_hours': totals['time_to_dry_sum'] / dry_count / 3600 if dry_count else None,
+            'recovery_samples': int(recovery_count),
+            'time_to_dry_samples': int(dry_count)
+        }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
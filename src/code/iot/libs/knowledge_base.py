@@ -0,0 +1,240 @@
+import hashlib
+import os
+import re
+import sqlite3
+from threading import Lock
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunk_sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunk_sources_path ON chunk_sources (path);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(title, body, tokenize='porter unicode61');
+"""
+
+EXTENSIONS = ('.md', '.txt')
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Dropped from queries so "how often should I water my basil" matches on
+# water and basil rather than on every chunk containing "should"
+STOPWORDS = frozenset("""
+a about above after again all am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers how i if in into is it its itself just me more most my no nor not now of off on once only or other
+our out over own same she should so some such than that the their them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would
+you your plant plants please tell know
+""".split())
+
+# Rough size of a token for budgeting prompt space
+CHARS_PER_TOKEN = 4
+
+# Query terms found in more than this share of the chunks are dropped: their
+# BM25 weight is close to zero, yet scoring them means ranking nearly every
+# chunk, which is most of the cost of a search
+MAX_TERM_SHARE = 0.5
+MAX_QUERY_TERMS = 8
+
+
+def split_document(text, title, max_chars=800):
+    """Split a markdown document into (title, body) chunks.
+
+    Chunks follow the headings; long sections are packed paragraph by
+    paragraph up to max_chars. Each chunk's title is the document title
+    plus its section heading.
+    """
+    sections = []
+    heading = None
+    lines = []
+    for line in text.splitlines():
+        match = re.match(r"#+\s+(.*)", line)
+        if match:
+            if heading is None and not any(l.strip() for l in lines) and line.startswith('# '):
+                title = match.group(1).strip()
+                continue
+            sections.append((heading, lines))
+            heading = match.group(1).strip()
+            lines = []
+        else:
+            lines.append(line)
+    sections.append((heading, lines))
+
+    chunks = []
+    for heading, lines in sections:
+        section_title = f"{title} / {heading}" if heading else title
+        paragraphs = [p.strip() for p in "\n".join(lines).split("\n\n") if p.strip()]
+        body = ""
+        for paragraph in paragraphs:
+            if body and len(body) + len(paragraph) + 2 > max_chars:
+                chunks.append((section_title, body))
+                body = ""
+            body = f"{body}\n\n{paragraph}" if body else paragraph
+        if body:
+            chunks.append((section_title, body))
+    return chunks
+
+
+class KnowledgeBase:
+    """Plant-care notes in an SQLite FTS5 index, ranked with BM25.
+
+    sync() indexes the markdown and text files of a directory and only
+    re-chunks files whose size, modification time and content hash
+    changed, so re-syncing an unchanged tree costs one stat per file.
+    Searches only score the selective query terms (see MAX_TERM_SHARE);
+    each term's chunk count is cached until the next change.
+    """
+
+    def __init__(self, path=':memory:', max_chunk_chars=800):
+        self.path = path
+        self.max_chunk_chars = max_chunk_chars
+        self.directory = None
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.chunk_count = self.db.execute("SELECT COUNT(*) FROM chunk_sources").fetchone()[0]
+        self.term_counts = {}
+        print(f"[KNOWLEDGE] Opened {path}")
+
+    def sync(self, directory=None):
+        """Bring the index in line with the files under directory"""
+        directory = directory or self.directory
+        self.directory = directory
+        files = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.endswith(EXTENSIONS):
+                    full_path = os.path.join(root, name)
+                    files[os.path.relpath(full_path, directory)] = (full_path, os.stat(full_path))
+
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        with self.lock:
+            known = {row[0]: row[1:] for row in self.db.execute("SELECT path, mtime, size, digest FROM documents")}
+
+            for path in known.keys() - files.keys():
+                self._remove(path)
+                self.db.execute("DELETE FROM documents WHERE path = ?", (path,))
+                counts['removed'] += 1
+
+            for path, (full_path, stat) in files.items():
+                previous = known.get(path)
+                if previous and previous[0] == stat.st_mtime and previous[1] == stat.st_size:
+                    counts['unchanged'] += 1
+                    continue
+
+                with open(full_path, encoding='utf-8') as f:
+                    text = f.read()
+                digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+                self.db.execute(
+                    "INSERT OR REPLACE INTO documents (path, mtime, size, digest) VALUES (?, ?, ?, ?)",
+                    (path, stat.st_mtime, stat.st_size, digest)
+                )
+                if previous and previous[2] == digest:
+                    # Touched but not edited
+                    counts['unchanged'] += 1
+                    continue
+
+                if previous:
+                    self._remove(path)
+                self._add(path, text)
+                counts['updated' if previous else 'added'] += 1
+
+            self.db.commit()
+            self.chunk_count = self.db.execute("SELECT COUNT(*) FROM chunk_sources").fetchone()[0]
+            if counts['added'] or counts['updated'] or counts['removed']:
+                self.term_counts = {}
+            counts['chunks'] = self.chunk_count
+
+        print(f"[KNOWLEDGE] Synced {directory}: {counts}")
+        return counts
+
+    def _add(self, path, text):
+        title = os.path.splitext(os.path.basename(path))[0].replace('_', ' ').title()
+        for chunk_title, body in split_document(text, title, self.max_chunk_chars):
+            cursor = self.db.execute("INSERT INTO chunk_sources (path) VALUES (?)", (path,))
+            self.db.execute("INSERT INTO chunks (rowid, title, body) VALUES (?, ?, ?)",
+                            (cursor.lastrowid, chunk_title, body))
+
+    def _remove(self, path):
+        self.db.execute("DELETE FROM chunks WHERE rowid IN (SELECT id FROM chunk_sources WHERE path = ?)", (path,))
+        self.db.execute("DELETE FROM chunk_sources WHERE path = ?", (path,))
+
+    def search(self, text, k=4):
+        """Best matching chunks for text as dicts with title, body, path and score"""
+        terms = [term for term in TOKEN_RE.findall(text.lower()) if term not in STOPWORDS]
+        if not terms:
+            return []
+
+        with self.lock:
+            terms = self._selective_terms(dict.fromkeys(terms))
+            if not terms:
+                return []
+            query = " OR ".join(f'"{term}"' for term in terms)
+            rows = self.db.execute(
+                "SELECT chunks.title, chunks.body, chunk_sources.path, bm25(chunks, 2.0, 1.0) AS score "
+                "FROM chunks JOIN chunk_sources ON chunk_sources.id = chunks.rowid "
+                "WHERE chunks MATCH ? ORDER BY score LIMIT ?",
+                (query, k)
+            ).fetchall()
+        return [{'title': title, 'body': body, 'path': path, 'score': score} for title, body, path, score in rows]
+
+    def _selective_terms(self, terms):
+        """The rarest terms that occur in the index, dropping those in more
+        than MAX_TERM_SHARE of the chunks unless nothing else matches"""
+        counts = []
+        for term in terms:
+            count = self.term_counts.get(term)
+            if count is None:
+                count = self.db.execute("SELECT COUNT(*) FROM chunks WHERE chunks MATCH ?", (f'"{term}"',)).fetchone()[0]
+                if len(self.term_counts) > 10000:
+                    self.term_counts = {}
+                self.term_counts[term] = count
+            if count:
+                counts.append((count, term))
+        counts.sort()
+        selective = [term for count, term in counts if count <= self.chunk_count * MAX_TERM_SHARE]
+        if not selective and counts:
+            selective = [counts[0][1]]
+        return selective[:MAX_QUERY_TERMS]
+
+    def build_context(self, text, max_tokens=400, k=4, min_relevance=0.5):
+        """Best matching chunks formatted for a prompt, within max_tokens.
+
+        Chunks scoring below min_relevance times the best match are left
+        out, so a single shared word does not drag in unrelated notes.
+        """
+        notes = []
+        budget = max_tokens * CHARS_PER_TOKEN
+        chunks = self.search(text, k)
+        for chunk in chunks:
+            # bm25() is negative; more negative is a better match
+            if chunk['score'] > chunks[0]['score'] * min_relevance:
+                break
+            note = f"[{chunk['title']}]\n{chunk['body']}"
+            if len(note) > budget:
+                break
+            notes.append(note)
+            budget -= len(note) + 2
+        return "\n\n".join(notes)
+
+    def get_stats(self):
+        with self.lock:
+            documents = self.db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            chunks = self.db.execute("SELECT COUNT(*) FROM chunk_sources").fetchone()[0]
+        return {'documents': documents, 'chunks': chunks}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
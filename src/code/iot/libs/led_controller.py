@@ -1,14 +1,13 @@
-import time
-from gpiozero import LED
-from threading import Lock
+from threading import Thread, Lock, Event
 
 
 class LEDController:
-    def __init__(self, red_pin=13, yellow_pin=19, green_pin=26):
+    def __init__(self, red_pin=13, yellow_pin=19, green_pin=26, self_test=True, self_test_async=False):
         print(f"[LED] Initializing LED controller...")
         print(f"[LED] Red LED on GPIO {red_pin}")
         print(f"[LED] Yellow LED on GPIO {yellow_pin}")
         print(f"[LED] Green LED on GPIO {green_pin}")
+        from gpiozero import LED
         
         try:
             self.led_red = LED(red_pin)
@@ -33,28 +32,40 @@ class LEDController:
         
         self.lock = Lock()
         self.current_state = None
+        # Set by cleanup() to cut a running blink test short
+        self.shutdown_event = Event()
         
-        # Test all LEDs at startup
-        print("[LED] Testing all LEDs at startup...")
         self.led_red.off()
         self.led_yellow.off()
         self.led_green.off()
         print("[LED] All LEDs turned off")
-        time.sleep(0.5)
-        
-        print("[LED] Quick blink test...")
-        self.led_red.on()
-        time.sleep(0.2)
-        self.led_red.off()
-        self.led_yellow.on()
-        time.sleep(0.2)
-        self.led_yellow.off()
-        self.led_green.on()
-        time.sleep(0.2)
-        self.led_green.off()
-        print("[LED] Blink test complete")
+
+        if not self_test:
+            print("[LED] Skipping startup blink test")
+        elif self_test_async:
+            Thread(target=self._self_test, daemon=True).start()
+        else:
+            self._self_test()
         print("[LED] LED controller ready")
 
+    def _self_test(self):
+        # Holding the lock keeps update_leds() from racing the blink test
+        with self.lock:
+            print("[LED] Testing all LEDs at startup...")
+            self.shutdown_event.wait(0.5)
+
+            print("[LED] Quick blink test...")
+            self.led_red.on()
+            self.shutdown_event.wait(0.2)
+            self.led_red.off()
+            self.led_yellow.on()
+            self.shutdown_event.wait(0.2)
+            self.led_yellow.off()
+            self.led_green.on()
+            self.shutdown_event.wait(0.2)
+            self.led_green.off()
+            print("[LED] Blink test complete")
+
     def update_leds(self, soil_moisture):
         with self.lock:
             print(f"[LED] Updating LEDs based on soil moisture: {soil_moisture}%")
@@ -107,6 +118,7 @@ class LEDController:
             return self.current_state
 
     def cleanup(self):
+        self.shutdown_event.set()
         with self.lock:
             print("[LED] Turning off all LEDs")
             self.led_red.off()
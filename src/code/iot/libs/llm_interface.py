@@ -1,48 +1,134 @@
+import importlib.util
 import os
 from threading import Lock
 
 
 class LLMInterface:
-    def __init__(self, system_state, model="llama3.2:1b"):
+    def __init__(self, system_state, model="llama3.2:1b", client=None):
         self.system_state = system_state
         self.lock = Lock()
         self.conversation_history = []
         self.model = model
         self.use_mock = False
+        self.event_bus = None
+        self.knowledge_base = None
+        self.knowledge_tokens = 400
+        
+        if client is not None:
+            self.client = client
+            print(f"LLM client injected with model: {self.model}")
+            return
+        
+        # Importing ollama pulls in httpx and friends, so only check that it is
+        # installed here and defer the import until the first chat
+        self.client = None
+        if importlib.util.find_spec("ollama") is None:
+            print("Warning: ollama package not installed. Install with: pip install ollama")
+            print("Running in mock mode.")
+            self.use_mock = True
+    
+    def _ensure_client(self):
+        if self.client is not None or self.use_mock:
+            return
         
         try:
             import ollama
             self.client = ollama
             print(f"Ollama client initialized with model: {self.model}")
-        except ImportError:
-            print("Warning: ollama package not installed. Install with: pip install ollama")
-            print("Running in mock mode.")
-            self.use_mock = True
         except Exception as e:
             print(f"Warning: Failed to initialize Ollama: {e}")
             print("Running in mock mode.")
             self.use_mock = True
     
+    def check_service(self):
+        """Return (ok, detail) describing whether the model server can answer"""
+        if self.use_mock:
+            return True, {'mode': 'mock'}
+        
+        self._ensure_client()
+        if self.use_mock:
+            return True, {'mode': 'mock'}
+        
+        try:
+            models = self.client.list()
+        except Exception as e:
+            return False, {'reason': f'model server unreachable: {e}'}
+        
+        names = [model.get('model') or model.get('name') for model in models.get('models', [])]
+        if self.model not in names:
+            return False, {'reason': f"model '{self.model}' is not available"}
+        return True, {'model': self.model}
+    
+    def set_event_bus(self, event_bus):
+        self.event_bus = event_bus
+    
+    def set_knowledge_base(self, knowledge_base, max_tokens=400):
+        """Add the best matching plant-care notes, up to max_tokens, to each message"""
+        with self.lock:
+            self.knowledge_base = knowledge_base
+            self.knowledge_tokens = max_tokens
+    
+    def _publish_exchange(self, user_message, reply):
+        if self.event_bus:
+            self.event_bus.publish('chat_message', role='user', content=user_message)
+            self.event_bus.publish('chat_message', role='assistant', content=reply)
+    
+    def warm_up(self):
+        with self.lock:
+            self._ensure_client()
+    
+    def _retrieve_notes(self, user_message):
+        if self.knowledge_base is None:
+            return ""
+        try:
+            return self.knowledge_base.build_context(user_message, max_tokens=self.knowledge_tokens)
+        except Exception as e:
+            print(f"Knowledge base lookup failed: {e}")
+            return ""
+    
+    def _build_messages(self, full_message, notes=""):
+        self.conversation_history.append({
+            "role": "user",
+            "content": full_message
+        })
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that helps users understand and manage their plant care system. Provide clear, concise answers based on the current system state provided in each message. When plant-care notes are included, base your advice on them."
+            }
+        ] + self.conversation_history
+        
+        if notes:
+            # Notes only go with the latest message so they do not pile up in the history
+            messages[-1] = {
+                "role": "user",
+                "content": f"Plant-care notes:\n{notes}\n\n{full_message}"
+            }
+        return messages
+    
+    def _remember_reply(self, assistant_message):
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": assistant_message
+        })
+        
+        if len(self.conversation_history) > 20:
+            self.conversation_history = self.conversation_history[-20:]
+    
     def chat(self, user_message):
         with self.lock:
             context = self.system_state.get_context_string()
             full_message = f"{context}\n\nUser message: {user_message}"
             
+            self._ensure_client()
             if self.use_mock:
-                return self._mock_response(user_message, context)
+                reply = self._mock_response(user_message, context)
+                self._publish_exchange(user_message, reply)
+                return reply
             
             try:
-                self.conversation_history.append({
-                    "role": "user",
-                    "content": full_message
-                })
-                
-                messages = [
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that helps users understand and manage their plant care system. Provide clear, concise answers based on the current system state provided in each message."
-                    }
-                ] + self.conversation_history
+                messages = self._build_messages(full_message, self._retrieve_notes(user_message))
                 
                 response = self.client.chat(
                     model=self.model,
@@ -50,14 +136,8 @@ class LLMInterface:
                 )
                 
                 assistant_message = response['message']['content']
-                
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": assistant_message
-                })
-                
-                if len(self.conversation_history) > 20:
-                    self.conversation_history = self.conversation_history[-20:]
+                self._remember_reply(assistant_message)
+                self._publish_exchange(user_message, assistant_message)
                 
                 return assistant_message
                 
@@ -65,6 +145,37 @@ class LLMInterface:
                 print(f"LLM Error: {e}")
                 return f"Error communicating with Ollama: {str(e)}"
     
+    def chat_stream(self, user_message):
+        """Yield the reply in chunks as the model produces them"""
+        with self.lock:
+            context = self.system_state.get_context_string()
+            full_message = f"{context}\n\nUser message: {user_message}"
+            
+            self._ensure_client()
+            if self.use_mock:
+                reply = self._mock_response(user_message, context)
+                self._publish_exchange(user_message, reply)
+                yield reply
+                return
+            
+            try:
+                messages = self._build_messages(full_message, self._retrieve_notes(user_message))
+                
+                chunks = []
+                for chunk in self.client.chat(model=self.model, messages=messages, stream=True):
+                    content = chunk['message']['content']
+                    if content:
+                        chunks.append(content)
+                        yield content
+                
+                reply = "".join(chunks)
+                self._remember_reply(reply)
+                self._publish_exchange(user_message, reply)
+                
+            except Exception as e:
+                print(f"LLM Error: {e}")
+                yield f"Error communicating with Ollama: {str(e)}"
+    
     def _mock_response(self, user_message, context):
         state = self.system_state.get_full_state()
         
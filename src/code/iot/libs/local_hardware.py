@@ -0,0 +1,207 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .dht_sensor import DHTSensor
+from .uart_handler import UARTHandler
+from .led_controller import LEDController
+from .button_handler import ButtonHandler
+from .servo_controller import ServoController
+from .system_state import SystemState
+from .state_journal import StateJournal
+from .irrigation_log import IrrigationLog
+from .history_store import HistoryStore
+from .moisture_forecast import MoistureForecaster
+from .adaptive_scheduler import AdaptiveScheduler
+from .alerts import AlertEngine, AlertOutbox, CallbackSink, load_rules
+from .health_monitor import uart_probe, dht_probe
+from .watchdog import watch_uart, watch_dht
+from .event_bus import (log_event, BLOCK, READING, STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED,
+                        BUTTON_PRESS, ALERT, CONFIG_RELOADED)
+
+
+class LocalHardware:
+    """The devices of a process that drives them itself, wired to its event
+    bus: the journal, irrigation log and history store (with a state_dir),
+    the moisture forecast, the adaptive sampling, the alert rules and the
+    button gestures. The hardware daemon, the API server without a daemon
+    and the interactive CLI all build their hardware here.
+    """
+
+    # Set on the owning process too, which refers to them directly
+    ATTRIBUTES = ('dht_sensor', 'uart_handler', 'led_controller', 'button_handler', 'servo_controller',
+                  'system_state', 'journal', 'irrigation_log', 'history_store', 'forecaster', 'scheduler',
+                  'alert_engine', 'alert_outbox')
+
+    def __init__(self, event_bus, dht_sensor, uart_handler, led_controller, button_handler, servo_controller,
+                 state_dir=None, alert_rules=None, on_sampling_mode=None, on_leds_updated=None,
+                 log_types=(STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS)):
+        self.event_bus = event_bus
+        self.dht_sensor = dht_sensor
+        self.uart_handler = uart_handler
+        self.led_controller = led_controller
+        self.button_handler = button_handler
+        self.servo_controller = servo_controller
+        self.alert_rules_path = alert_rules
+        self.on_sampling_mode = on_sampling_mode
+        self.on_leds_updated = on_leds_updated
+        self.journal = None
+        self.irrigation_log = None
+        self.history_store = None
+        self.alert_outbox = None
+
+        self.system_state = SystemState()
+        self.system_state.set_components(dht_sensor, uart_handler, led_controller, button_handler, servo_controller)
+
+        for component in (dht_sensor, uart_handler, button_handler, servo_controller):
+            component.set_event_bus(event_bus)
+        self.system_state.set_event_bus(event_bus)
+        event_bus.subscribe_callback(self._on_status_change, types=(STATUS_CHANGE,), name='leds')
+        event_bus.subscribe_callback(log_event, types=log_types, name='logger')
+
+        # Restore counters persisted across restarts
+        if state_dir:
+            self.journal = StateJournal(state_dir)
+            self.journal.load()
+            servo_controller.set_journal(self.journal)
+            button_handler.set_journal(self.journal)
+
+            self.irrigation_log = IrrigationLog(os.path.join(state_dir, 'irrigations.db'))
+            servo_controller.set_event_log(self.irrigation_log, uart_handler.get_soil_moisture)
+            event_bus.subscribe_callback(self.irrigation_log.handle_event, types=(READING,),
+                                         maxsize=1000, policy=BLOCK, name='irrigation-log')
+
+            self.history_store = HistoryStore(os.path.join(state_dir, 'history.db'))
+            event_bus.subscribe_callback(self.history_store.handle_event, types=(READING,),
+                                         maxsize=1000, policy=BLOCK, name='history')
+
+        # Drying trend and time-to-dry forecast, resumed from the stored history
+        self.forecaster = MoistureForecaster()
+        if self.history_store:
+            self.forecaster.prime(self.history_store.list_averages(
+                'soil_moisture', time.time() - self.forecaster.window * self.forecaster.interval,
+                self.forecaster.interval, sensor='soil_moisture'
+            ))
+        self.system_state.set_forecaster(self.forecaster)
+        event_bus.subscribe_callback(self.forecaster.handle_event, types=(READING,), name='forecast')
+
+        # Sample faster while irrigating or when readings move, back off while they are flat
+        self.scheduler = AdaptiveScheduler()
+        self.scheduler.set_callback(self._on_sampling_mode)
+        self._on_sampling_mode(self.scheduler.mode, self.scheduler.get_intervals())
+        event_bus.subscribe_callback(self.scheduler.handle_event,
+                                     types=(READING, IRRIGATION_STARTED, IRRIGATION_FINISHED), name='scheduler')
+
+        self.alert_engine = AlertEngine(load_rules(alert_rules))
+        if self.journal:
+            self.alert_engine.set_journal(self.journal)
+        event_bus.subscribe_callback(self.alert_engine.handle_event, types=(READING, IRRIGATION_FINISHED),
+                                     maxsize=1000, policy=BLOCK, name='alerts')
+
+        # The button works without any client connected
+        button_handler.set_callback(self._on_button_pressed)
+        button_handler.set_callback(self._on_button_double_pressed, gesture='double_press')
+        button_handler.set_callback(self._on_button_long_pressed, gesture='long_press')
+
+    @classmethod
+    def create(cls, event_bus, dht_device=None, serial_port=None, recorder=None, self_test=True,
+               irrigation_profiles=None, fast_start=False, **wiring):
+        """Open the devices and wire them up. With fast_start they open
+        side by side and the self-tests run in the background."""
+        if fast_start:
+            # The LEDs go first so gpiozero's pin factory is set up by one thread
+            led_controller = LEDController(self_test=self_test, self_test_async=True)
+            with ThreadPoolExecutor(max_workers=4, thread_name_prefix='init') as pool:
+                dht_sensor = pool.submit(DHTSensor, read_interval=10, dht_device=dht_device, recorder=recorder)
+                uart_handler = pool.submit(UARTHandler, read_interval=1, serial_port=serial_port, recorder=recorder)
+                button_handler = pool.submit(ButtonHandler, recorder=recorder)
+                servo_controller = pool.submit(ServoController, self_test=self_test, self_test_async=True,
+                                               profiles_path=irrigation_profiles)
+                components = (dht_sensor.result(), uart_handler.result(), led_controller,
+                              button_handler.result(), servo_controller.result())
+        else:
+            components = (DHTSensor(read_interval=10, dht_device=dht_device, recorder=recorder),
+                          UARTHandler(read_interval=1, serial_port=serial_port, recorder=recorder),
+                          LEDController(self_test=self_test),
+                          ButtonHandler(recorder=recorder),
+                          ServoController(self_test=self_test, profiles_path=irrigation_profiles))
+        return cls(event_bus, *components, **wiring)
+
+    def add_alert_outbox(self, path, sinks=()):
+        """Deliver alert notifications to bus subscribers (as ALERT events)
+        and to any other sinks, through an outbox persisted at path"""
+        self.alert_outbox = AlertOutbox(path)
+        self.alert_outbox.add_sink(CallbackSink('websocket', lambda alert: self.event_bus.publish(ALERT, alert)))
+        for sink in sinks:
+            self.alert_outbox.add_sink(sink)
+        self.alert_engine.set_outbox(self.alert_outbox)
+        return self.alert_outbox
+
+    def add_probes(self, health_monitor):
+        health_monitor.add_probe('soil_moisture', uart_probe(self.uart_handler, stale_after=60), interval=5)
+        health_monitor.add_probe('temperature', dht_probe(self.dht_sensor), interval=10)
+
+    def watch(self, watchdog):
+        """Restart stalled or dead read loops and reopen failed devices"""
+        watch_uart(watchdog, self.uart_handler)
+        watch_dht(watchdog, self.dht_sensor)
+
+    def expose(self, owner):
+        for name in self.ATTRIBUTES:
+            setattr(owner, name, getattr(self, name))
+
+    def reload(self):
+        """Re-read the irrigation profiles and alert rules; the devices stay
+        open. A file that does not load keeps its previous settings.
+        Returns the errors, if any."""
+        errors = {}
+        for name, reload in (('irrigation_profiles', self.servo_controller.reload_profiles),
+                             ('alert_rules', lambda: self.alert_engine.set_rules(load_rules(self.alert_rules_path)))):
+            try:
+                reload()
+            except (OSError, ValueError) as e:
+                print(f"[HARDWARE] Could not reload {name.replace('_', ' ')}: {e}")
+                errors[name] = str(e)
+        # Thin clients refresh their copy of the profiles on this event
+        self.event_bus.publish(CONFIG_RELOADED, profiles_version=self.servo_controller.profiles_version,
+                               errors=errors)
+        return errors
+
+    def _on_button_pressed(self, profile='standard'):
+        print(f"[HARDWARE] Button pressed - triggering irrigation check (profile: {profile})")
+
+        if not self.uart_handler.wait_for_data(timeout=2):
+            print("[HARDWARE] No soil moisture data yet, irrigation skipped")
+            return
+        soil_moisture = self.uart_handler.get_soil_moisture()
+
+        if soil_moisture is not None and soil_moisture > 0:
+            self.led_controller.update_leds(soil_moisture)
+            # The result reaches clients through the irrigation_finished event
+            job_id = self.servo_controller.start_irrigation(profile=profile, source='button')
+            if job_id is None:
+                print("[HARDWARE] Irrigation already in progress")
+            else:
+                print(f"[HARDWARE] Irrigation triggered: job {job_id}")
+        else:
+            print("[HARDWARE] Cannot irrigate: sensor is not in the soil")
+
+    def _on_button_double_pressed(self):
+        self._on_button_pressed(profile='deep')
+
+    def _on_button_long_pressed(self):
+        print("[HARDWARE] Long press - stopping irrigation")
+        self.servo_controller.cancel(emergency=True)
+
+    def _on_status_change(self, event):
+        soil_moisture = event.data['soil_moisture']
+        if soil_moisture is not None:
+            self.led_controller.update_leds(soil_moisture)
+        if self.on_leds_updated:
+            self.on_leds_updated()
+
+    def _on_sampling_mode(self, mode, intervals):
+        self.dht_sensor.set_read_interval(intervals['dht'])
+        self.uart_handler.set_read_interval(intervals['uart'])
+        if self.on_sampling_mode:
+            self.on_sampling_mode(mode, intervals)
@@ -0,0 +1,202 @@
+import time
+from threading import Lock
+
+import numpy as np
+
+
+class MoistureTrend:
+    """Moisture history and drying fit for one plant.
+
+    Readings are averaged into one sample per `interval` seconds, kept in a
+    fixed-size NumPy ring buffer. A rise of more than `jump` points between
+    samples marks a watering: the samples up to the following peak are
+    the recovery. Drying is modelled as exponential decay (soil loses
+    water in proportion to what it holds), fitted by least squares on
+    log(moisture) over the samples since that peak, at most `fit_span` of
+    them; a full day averages out the faster afternoon drying. Each closed
+    sample costs one O(window) vectorized fit; forecasts in between are
+    cached.
+    """
+
+    def __init__(self, window=1440, interval=60.0, threshold=35, jump=5.0, fit_span=1440, min_samples=30):
+        self.window = window
+        self.interval = interval
+        self.threshold = threshold
+        self.jump = jump
+        self.fit_span = fit_span
+        self.min_samples = min_samples
+
+        self.times = np.zeros(window)
+        self.values = np.zeros(window)
+        self.total = 0
+
+        # Reading currently being averaged into a sample
+        self.bucket = None
+        self.bucket_sum = 0.0
+        self.bucket_count = 0
+
+        # Index (in self.total terms) where the current drying segment starts
+        self.segment_start = 0
+        self.recovering = False
+        self.pre_moisture = None
+        self.peak = None
+        self.recovery_started_at = None
+        self.expected_recovery = None
+        self.recovery_time = None
+        self.recoveries = 0
+
+        self.forecast = self._empty_forecast()
+
+    def add_reading(self, moisture, timestamp):
+        """Feed one raw reading; returns True when it closed a sample"""
+        bucket = int(timestamp // self.interval)
+        closed = False
+        if self.bucket is not None and bucket != self.bucket and self.bucket_count:
+            self.add_sample((self.bucket + 0.5) * self.interval, self.bucket_sum / self.bucket_count)
+            self.bucket_sum = 0.0
+            self.bucket_count = 0
+            closed = True
+        self.bucket = bucket
+        self.bucket_sum += moisture
+        self.bucket_count += 1
+        return closed
+
+    def add_sample(self, timestamp, moisture):
+        previous = self.values[(self.total - 1) % self.window] if self.total else None
+        index = self.total % self.window
+        self.times[index] = timestamp
+        self.values[index] = moisture
+        self.total += 1
+
+        if previous is not None and moisture - previous > self.jump and not self.recovering:
+            self.recovering = True
+            self.pre_moisture = previous
+            self.peak = moisture
+            self.recovery_started_at = timestamp
+            self.segment_start = self.total - 1
+        elif self.recovering:
+            if moisture >= self.peak:
+                self.peak = moisture
+                self.segment_start = self.total - 1
+            else:
+                self._finish_recovery()
+
+        self.forecast = self._fit()
+
+    def _finish_recovery(self):
+        self.recovering = False
+        recovery = self.peak - self.pre_moisture
+        took = self.times[self.segment_start % self.window] - self.recovery_started_at
+        # Exponential average over recent waterings
+        if self.expected_recovery is None:
+            self.expected_recovery = recovery
+            self.recovery_time = took
+        else:
+            self.expected_recovery += 0.3 * (recovery - self.expected_recovery)
+            self.recovery_time += 0.3 * (took - self.recovery_time)
+        self.recoveries += 1
+
+    def _samples(self, count):
+        """The last `count` samples in time order"""
+        indices = (np.arange(self.total - count, self.total)) % self.window
+        return self.times[indices], self.values[indices]
+
+    def _fit(self):
+        forecast = self._empty_forecast()
+        forecast['samples'] = min(self.total, self.window)
+        if self.recovering:
+            forecast['recovering'] = True
+            return forecast
+
+        count = min(self.total - self.segment_start, self.window, self.fit_span)
+        if count < self.min_samples:
+            return forecast
+
+        times, values = self._samples(count)
+        hours = (times - times[-1]) / 3600.0
+        log_values = np.log(values)
+        hours_mean = hours.mean()
+        log_mean = log_values.mean()
+        dx = hours - hours_mean
+        dy = log_values - log_mean
+        variance = np.dot(dx, dx)
+        if variance == 0:
+            return forecast
+
+        # log(moisture) = intercept + rate * hours, with hours = 0 at the latest sample
+        rate = np.dot(dx, dy) / variance
+        intercept = log_mean - rate * hours_mean
+        residual = dy - rate * dx
+        total_variance = np.dot(dy, dy)
+        r_squared = 1.0 - np.dot(residual, residual) / total_variance if total_variance else 0.0
+        fitted = np.exp(intercept)
+
+        forecast['slope_per_hour'] = round(float(rate * fitted), 3)
+        forecast['fitted_moisture'] = round(float(fitted), 1)
+        forecast['confidence'] = round(float(max(0.0, r_squared) * min(1.0, count / (2 * self.min_samples))), 2)
+        if fitted <= self.threshold:
+            forecast['hours_to_dry'] = 0.0
+        elif rate < 0:
+            forecast['hours_to_dry'] = round(float((np.log(self.threshold) - intercept) / rate), 1)
+        if forecast['hours_to_dry'] is not None:
+            forecast['dry_at'] = float(times[-1]) + forecast['hours_to_dry'] * 3600
+        return forecast
+
+    def _empty_forecast(self):
+        return {
+            'slope_per_hour': None,
+            'fitted_moisture': None,
+            'hours_to_dry': None,
+            'dry_at': None,
+            'confidence': 0.0,
+            'recovering': False,
+            'expected_recovery': round(float(self.expected_recovery), 1) if self.recoveries else None,
+            'recovery_minutes': round(float(self.recovery_time) / 60, 1) if self.recoveries else None,
+            'samples': 0
+        }
+
+
+class MoistureForecaster:
+    """Drying-rate and time-to-dry forecasts per plant from soil readings"""
+
+    def __init__(self, threshold=35, window=1440, interval=60.0, **trend_options):
+        self.threshold = threshold
+        self.window = window
+        self.interval = interval
+        self.trend_options = trend_options
+        self.lock = Lock()
+        self.trends = {}
+
+    def _trend(self, plant):
+        trend = self.trends.get(plant)
+        if trend is None:
+            trend = self.trends[plant] = MoistureTrend(window=self.window, interval=self.interval,
+                                                       threshold=self.threshold, **self.trend_options)
+        return trend
+
+    def handle_event(self, event):
+        """Event bus subscriber for soil moisture 'reading' events"""
+        data = event.data
+        if data.get('sensor') == 'soil_moisture':
+            self.add_reading(data['soil_moisture'], data.get('read_at', event.timestamp), data.get('plant', 'default'))
+
+    def add_reading(self, moisture, timestamp=None, plant='default'):
+        # 0% means the probe is out of the soil, not that the soil is dry
+        if moisture is None or moisture == 0:
+            return
+        with self.lock:
+            self._trend(plant).add_reading(moisture, timestamp if timestamp is not None else time.time())
+
+    def prime(self, samples, plant='default'):
+        """Load past (timestamp, moisture) samples, oldest first, e.g. from the history store"""
+        with self.lock:
+            trend = self._trend(plant)
+            for timestamp, moisture in samples:
+                if moisture:
+                    trend.add_sample(timestamp, moisture)
+        print(f"[FORECAST] Primed {plant} with {len(samples)} samples")
+
+    def get_forecast(self, plant='default'):
+        with self.lock:
+            trend = self.trends.get(plant)
+            return dict(trend.forecast) if trend else None
@@ -0,0 +1,273 @@
+import collections
+import os
+import sys
+import threading
+import time
+from threading import Thread, Lock, Event
+
+
+# Histogram buckets: up to 1 µs, 2 µs, 4 µs, ... 2^26 µs (about 67 s), then more
+BUCKETS = 28
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval.
+
+    Stacks are counted in the collapsed format of flamegraph.pl, speedscope
+    and inferno: one `thread;outer;...;inner count` line per distinct stack.
+    Only a sampler thread runs, and only while profiling; the profiled code
+    is not instrumented, so it runs at full speed.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.stop_event = Event()
+        self.thread = None
+        self.counts = collections.Counter()
+        self.samples = 0
+        self.interval = None
+        self.started_at = None
+        self.stopped_at = None
+        self.code_labels = {}
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds=10.0, interval=0.01):
+        """Profile for at most `seconds`; False if a profile is already running"""
+        with self.lock:
+            if self.running:
+                return False
+            self.counts = collections.Counter()
+            self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.stop_event.clear()
+            self.thread = Thread(target=self._run, args=(seconds, interval), name='profiler', daemon=True)
+            self.thread.start()
+        print(f"[PROFILE] Sampling all threads every {interval * 1000:.0f}ms for up to {seconds:.0f}s")
+        return True
+
+    def stop(self):
+        """End the running profile early and return it"""
+        self.stop_event.set()
+        thread = self.thread
+        if thread and thread is not threading.current_thread():
+            thread.join()
+        return self.get_profile()
+
+    def _label(self, code):
+        label = self.code_labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+            self.code_labels[code] = label
+        return label
+
+    def _run(self, seconds, interval):
+        own = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        while not self.stop_event.wait(interval) and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {thread.ident: thread.name.replace(';', ':')
+                         for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread-{ident}'))
+                stacks.append(';'.join(reversed(stack)))
+            with self.lock:
+                self.counts.update(stacks)
+                self.samples += 1
+        with self.lock:
+            self.stopped_at = time.time()
+        print(f"[PROFILE] Profile finished with {self.samples} samples")
+
+    def collapsed(self):
+        """The profile so far in collapsed-stack text"""
+        with self.lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    def get_profile(self):
+        return {'stats': self.get_stats(), 'collapsed': self.collapsed()}
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'running': self.running,
+                'interval': self.interval,
+                'started_at': self.started_at,
+                'stopped_at': self.stopped_at,
+                'samples': self.samples,
+                'stacks': len(self.counts)
+            }
+
+
+class LockStats:
+    """Wait and hold times of one lock as power-of-two µs histograms"""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait = [0] * BUCKETS
+        self.hold = [0] * BUCKETS
+        self.wait_total = 0.0
+        self.hold_total = 0.0
+        self.wait_max = 0.0
+        self.hold_max = 0.0
+
+    @staticmethod
+    def _bucket(seconds):
+        return min(int(seconds * 1e6).bit_length(), BUCKETS - 1)
+
+    def add_wait(self, seconds):
+        self.acquisitions += 1
+        self.wait[self._bucket(seconds)] += 1
+        self.wait_total += seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+    def add_hold(self, seconds):
+        self.hold[self._bucket(seconds)] += 1
+        self.hold_total += seconds
+        if seconds > self.hold_max:
+            self.hold_max = seconds
+
+    @staticmethod
+    def _histogram(counts):
+        # Labelled by the bucket's upper bound in µs; empty buckets left out
+        return {f'le_{1 << index}us': count for index, count in enumerate(counts) if count}
+
+    def to_dict(self):
+        holds = sum(self.hold)
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'wait_mean_ms': self.wait_total / self.acquisitions * 1000 if self.acquisitions else 0.0,
+            'wait_max_ms': self.wait_max * 1000,
+            'hold_mean_ms': self.hold_total / holds * 1000 if holds else 0.0,
+            'hold_max_ms': self.hold_max * 1000,
+            'wait_histogram': self._histogram(self.wait),
+            'hold_histogram': self._histogram(self.hold)
+        }
+
+
+class TracedLock:
+    """Lock wrapper recording wait and hold times into a LockStats.
+
+    Wraps, rather than replaces, the component's lock, so threads that took
+    the lock before tracing was switched on still exclude the others. Stats
+    are only updated while the lock is held, so the lock serializes them.
+    """
+
+    def __init__(self, lock, stats):
+        self.lock = lock
+        self.stats = stats
+        self.acquired_at = None
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.lock.acquire(False):
+            acquired = True
+            self.acquired_at = start = time.perf_counter()
+        else:
+            if not blocking:
+                return False
+            start = time.perf_counter()
+            acquired = self.lock.acquire(True, timeout)
+            if not acquired:
+                return False
+            self.acquired_at = time.perf_counter()
+            self.stats.contended += 1
+        self.stats.add_wait(self.acquired_at - start)
+        return acquired
+
+    def release(self):
+        acquired_at = self.acquired_at
+        if acquired_at is not None:
+            # Taken before tracing was switched on otherwise
+            self.acquired_at = None
+            self.stats.add_hold(time.perf_counter() - acquired_at)
+        self.lock.release()
+
+    def locked(self):
+        return self.lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LockTracer:
+    """Switches lock tracing on and off for registered component locks.
+
+    Enabling swaps each registered lock attribute for a TracedLock around
+    the same lock, and disabling swaps the plain lock back, so while tracing
+    is off the components run with no wrapper at all.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.locks = {}
+        self.stats = {}
+        self.enabled = False
+        self.enabled_at = None
+
+    def register(self, name, owner, attribute='lock'):
+        """Trace owner.<attribute> under name while tracing is enabled"""
+        with self.lock:
+            self.locks[name] = (owner, attribute, getattr(owner, attribute))
+            if self.enabled:
+                self._wrap(name)
+
+    def _wrap(self, name):
+        owner, attribute, lock = self.locks[name]
+        self.stats[name] = LockStats()
+        setattr(owner, attribute, TracedLock(lock, self.stats[name]))
+
+    def enable(self):
+        """Start tracing with fresh stats"""
+        with self.lock:
+            if self.enabled:
+                for owner, attribute, lock in self.locks.values():
+                    setattr(owner, attribute, lock)
+            self.stats = {}
+            for name in self.locks:
+                self._wrap(name)
+            self.enabled = True
+            self.enabled_at = time.time()
+        print(f"[PROFILE] Tracing locks: {', '.join(self.locks)}")
+
+    def disable(self):
+        """Stop tracing; the stats collected so far stay available"""
+        with self.lock:
+            for owner, attribute, lock in self.locks.values():
+                setattr(owner, attribute, lock)
+            self.enabled = False
+        print("[PROFILE] Lock tracing off")
+
+    def set_enabled(self, enabled):
+        """enable() or disable(), returning the stats"""
+        if enabled:
+            self.enable()
+        else:
+            self.disable()
+        return self.get_stats()
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'since': self.enabled_at,
+                'locks': {name: stats.to_dict() for name, stats in self.stats.items()}
+            }
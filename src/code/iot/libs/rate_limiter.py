@@ -0,0 +1,159 @@
+import collections
+import json
+import time
+from threading import Lock, Condition
+
+
+# Sustained requests per second and burst size per rule. Routes without a
+# rule are not limited.
+DEFAULT_LIMITS = {
+    # Cheap reads and commands: status, history, profiles, chat reset
+    'default': {'rate': 20.0, 'burst': 40},
+    # Each chat call runs the model
+    'chat': {'rate': 0.2, 'burst': 3},
+    # Each irrigation moves the valve and may hold a request thread for the cycle
+    'irrigate': {'rate': 0.1, 'burst': 2},
+    # Each export streams up to the whole history
+    'export': {'rate': 0.1, 'burst': 5},
+    'ws_connect': {'rate': 1.0, 'burst': 10},
+    'ws_message': {'rate': 10.0, 'burst': 20}
+}
+
+
+def load_limits(path=None):
+    """Return the rate limit rules, overriding the defaults from a JSON file.
+
+    A rule set to null in the file is removed, which disables that limit.
+    """
+    limits = {name: dict(rule) for name, rule in DEFAULT_LIMITS.items()}
+    if path:
+        with open(path) as f:
+            config = json.load(f)
+        for name, rule in config.items():
+            if rule is None:
+                limits.pop(name, None)
+            else:
+                limits.setdefault(name, {}).update(rule)
+    for name, rule in limits.items():
+        if rule.get('rate', 0) <= 0 or rule.get('burst', 0) < 1:
+            raise ValueError(f"rate limit '{name}' needs a rate > 0 and a burst >= 1")
+    return limits
+
+
+class RateLimiter:
+    """Token buckets per (rule, client).
+
+    A bucket is just [tokens, last update]; each check refills it for the
+    time elapsed since, so a check is O(1) and needs no timer. Buckets are
+    kept in least-recently-used order and the oldest is dropped beyond
+    max_buckets, which bounds memory however many clients show up.
+    """
+
+    def __init__(self, limits=None, max_buckets=4096):
+        self.limits = load_limits() if limits is None else limits
+        self.max_buckets = max_buckets
+        self.lock = Lock()
+        self.buckets = collections.OrderedDict()
+        self.allowed = collections.Counter()
+        self.rejected = collections.Counter()
+
+    def configure(self, limits):
+        with self.lock:
+            self.limits = limits
+            self.buckets.clear()
+        print(f"[RATE LIMIT] Rules: {', '.join(sorted(limits)) or 'none'}")
+
+    def check(self, rule, client, cost=1.0):
+        """Take `cost` tokens from the client's bucket for `rule`.
+
+        Returns 0.0 when the request is allowed, otherwise the seconds until
+        it would be.
+        """
+        limit = self.limits.get(rule)
+        if limit is None:
+            return 0.0
+        rate = limit['rate']
+        burst = limit['burst']
+        now = time.monotonic()
+        key = (rule, client)
+
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = [burst, now]
+                self.buckets[key] = bucket
+                if len(self.buckets) > self.max_buckets:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed[rule] += 1
+                return 0.0
+            self.rejected[rule] += 1
+            return (cost - bucket[0]) / rate
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'clients': len(self.buckets),
+                'allowed': dict(self.allowed),
+                'rejected': dict(self.rejected)
+            }
+
+
+class AdmissionGate:
+    """Caps how many expensive requests run at once.
+
+    Up to max_active requests run; up to max_waiting more wait at most
+    `timeout` seconds for a slot, and the rest are turned away at once so
+    they never tie up a server thread. Requests that skip the gate, such as
+    status reads, are never queued behind the expensive ones.
+    """
+
+    def __init__(self, name, max_active=1, max_waiting=2, timeout=30.0, retry_after=5.0):
+        self.name = name
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.condition = Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self):
+        with self.condition:
+            if self.active >= self.max_active:
+                if self.waiting >= self.max_waiting:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+                try:
+                    admitted = self.condition.wait_for(lambda: self.active < self.max_active, self.timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.rejected += 1
+                    return False
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
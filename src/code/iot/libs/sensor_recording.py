@@ -0,0 +1,207 @@
+import gzip
+import json
+import time
+from threading import Thread, Lock, Event
+
+
+RECORDING_FORMAT = 'planttalker-recording'
+RECORDING_VERSION = 1
+
+
+class SensorRecorder:
+    """Capture raw UART lines, DHT readings and button presses to a gzip'd
+    JSON-lines file. Each event is a compact array: [offset_s, kind, ...]."""
+
+    def __init__(self, path, flush_interval=5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.start_time = time.time()
+        self.last_flush = self.start_time
+        self.event_count = 0
+        self.lock = Lock()
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({'format': RECORDING_FORMAT, 'version': RECORDING_VERSION, 'start': self.start_time})
+        print(f"[RECORD] Recording sensor events to {path}")
+
+    def record_uart(self, line):
+        self._record('u', line)
+
+    def record_dht(self, temperature_c, humidity, error=None):
+        if error is None:
+            self._record('d', temperature_c, humidity)
+        else:
+            self._record('d', None, None, str(error))
+
+    def record_button(self, hold=None):
+        self._record('b', hold)
+
+    def _record(self, kind, *payload):
+        now = time.time()
+        with self.lock:
+            if self.file is None:
+                return
+            self._write([round(now - self.start_time, 3), kind, *payload])
+            self.event_count += 1
+            if now - self.last_flush >= self.flush_interval:
+                self.file.flush()
+                self.last_flush = now
+
+    def _write(self, event):
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                print(f"[RECORD] Recording closed ({self.event_count} events)")
+
+
+class ReplaySerial:
+    """Stand-in for serial.Serial while lines are fed by SensorReplay."""
+
+    in_waiting = 0
+
+    def readline(self):
+        return b''
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class ReplayDHTDevice:
+    """Stand-in for adafruit_dht.DHT22 returning the last replayed reading."""
+
+    def __init__(self):
+        self.reading = (None, None, 'No replayed reading yet')
+
+    def set_reading(self, temperature_c, humidity, error=None):
+        self.reading = (temperature_c, humidity, error)
+
+    @property
+    def temperature(self):
+        temperature_c, _, error = self.reading
+        if error:
+            raise RuntimeError(error)
+        return temperature_c
+
+    @property
+    def humidity(self):
+        return self.reading[1]
+
+    def exit(self):
+        pass
+
+
+class SensorReplay:
+    """Feed a recording back through UARTHandler, DHTSensor and ButtonHandler.
+
+    speed=1 replays in real time, speed=10080 plays a week in a minute and
+    speed=0 replays as fast as the pipeline can consume events.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.serial_port = ReplaySerial()
+        self.dht_device = ReplayDHTDevice()
+        self.uart_handler = None
+        self.dht_sensor = None
+        self.button_handler = None
+        self.events_dispatched = 0
+        self.replay_started = None
+        self.replay_finished = None
+        self.stop_event = Event()
+        self.finished_event = Event()
+        self.thread = None
+
+    def attach(self, uart_handler=None, dht_sensor=None, button_handler=None):
+        self.uart_handler = uart_handler
+        self.dht_sensor = dht_sensor
+        self.button_handler = button_handler
+
+    def start(self):
+        print(f"[REPLAY] Replaying {self.path} at {'max' if not self.speed else self.speed}x speed")
+        self.stop_event.clear()
+        self.finished_event.clear()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def wait(self, timeout=None):
+        return self.finished_event.wait(timeout)
+
+    def _read_events(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('format') != RECORDING_FORMAT:
+                raise ValueError(f"{self.path} is not a Plant Talker recording")
+            while True:
+                try:
+                    line = f.readline()
+                    event = json.loads(line) if line.strip() else None
+                except (EOFError, ValueError):
+                    # A recording cut short by a power loss ends with a partial line
+                    return
+                if not line:
+                    return
+                if event is not None:
+                    yield header['start'], event
+
+    def _run(self):
+        self.replay_started = time.time()
+        try:
+            while True:
+                self._replay_once()
+                if not self.loop or self.stop_event.is_set():
+                    break
+        except Exception as e:
+            print(f"[REPLAY] Error: {e}")
+        finally:
+            self.replay_finished = time.time()
+            self.finished_event.set()
+            print(f"[REPLAY] Replay finished ({self.events_dispatched} events)")
+
+    def _replay_once(self):
+        wall_start = time.time()
+        for recording_start, event in self._read_events():
+            if self.stop_event.is_set():
+                return
+
+            offset, kind = event[0], event[1]
+            if self.speed:
+                delay = wall_start + offset / self.speed - time.time()
+                if delay > 0 and self.stop_event.wait(delay):
+                    return
+
+            self._dispatch(kind, event[2:], recording_start + offset)
+            self.events_dispatched += 1
+
+    def _dispatch(self, kind, payload, timestamp):
+        if kind == 'u' and self.uart_handler:
+            self.uart_handler._handle_line(payload[0], timestamp=timestamp)
+        elif kind == 'd' and self.dht_sensor:
+            self.dht_device.set_reading(*payload)
+            self.dht_sensor._read_once(timestamp=timestamp)
+        elif kind == 'b' and self.button_handler:
+            # Recordings made before hold times were captured replay as short presses
+            hold = payload[0] if payload and payload[0] is not None else 0.1
+            self.button_handler.inject_press(hold)
+
+    def get_stats(self):
+        end = self.replay_finished or time.time()
+        elapsed = end - self.replay_started if self.replay_started else 0
+        return {
+            'events_dispatched': self.events_dispatched,
+            'elapsed': elapsed,
+            'events_per_second': self.events_dispatched / elapsed if elapsed > 0 else 0.0,
+            'finished': self.finished_event.is_set()
+        }
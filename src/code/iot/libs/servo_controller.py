@@ -1,98 +1,382 @@
+import itertools
+import json
 import time
-from gpiozero import Servo
-from threading import Lock
+from threading import Thread, Lock, Event
+
+
+# Servo values: -1 is the closed valve position (servo.min()), +1 fully open
+VALVE_CLOSED = -1.0
+
+DEFAULT_CALIBRATION = {
+    # Water delivered per second with the valve fully open
+    'flow_ml_per_s': 25.0,
+    # Longest total open time a single profile may request
+    'max_open_time': 60.0,
+    # Time the valve takes to close from fully open; a cycle stopped by a
+    # shutdown holds it closed this long before the PWM goes off
+    'close_settle': 0.15
+}
+
+DEFAULT_PROFILES = {
+    # The original fixed cycle: close 0.5 s, open 2 s, close 1 s, release
+    'standard': {'duration': 2.0, 'opening': 1.0},
+    'light': {'duration': 1.0, 'opening': 0.6},
+    'deep': {'volume_ml': 150, 'opening': 1.0},
+    'pulsed': {'volume_ml': 120, 'opening': 1.0, 'pulses': 3, 'soak': 20.0}
+}
+
+
+def load_profiles(path=None):
+    """Return (profiles, calibration), overriding the defaults from a JSON file"""
+    profiles = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+    calibration = dict(DEFAULT_CALIBRATION)
+    if path:
+        with open(path) as f:
+            config = json.load(f)
+        profiles.update(config.get('profiles', {}))
+        calibration.update(config.get('calibration', {}))
+    for profile in profiles.values():
+        build_waveform(profile, calibration)
+    return profiles, calibration
+
+
+def build_waveform(profile, calibration=DEFAULT_CALIBRATION):
+    """Turn a profile into a list of (servo value, hold seconds) steps.
+
+    The dose is either a 'duration' in seconds or a 'volume_ml' converted with
+    the calibrated flow rate, scaled by the valve 'opening' (0-1]. With
+    'pulses' > 1 the dose is split into equal pulses separated by 'soak'
+    seconds with the valve closed. The 'prepare', 'soak' and 'close_hold'
+    holds must not be negative.
+    """
+    opening = float(profile.get('opening', 1.0))
+    if not 0 < opening <= 1:
+        raise ValueError(f"opening must be in (0, 1], got {opening}")
+
+    if 'volume_ml' in profile:
+        open_time = profile['volume_ml'] / (calibration['flow_ml_per_s'] * opening)
+    elif 'duration' in profile:
+        open_time = float(profile['duration'])
+    else:
+        raise ValueError("profile needs a 'duration' or a 'volume_ml'")
+
+    if not 0 < open_time <= calibration['max_open_time']:
+        raise ValueError(f"open time {open_time:.1f}s is outside (0, {calibration['max_open_time']}]")
+
+    prepare = float(profile.get('prepare', 0.5))
+    soak = float(profile.get('soak', 0))
+    close_hold = float(profile.get('close_hold', 1.0))
+    for name, hold in (('prepare', prepare), ('soak', soak), ('close_hold', close_hold)):
+        if not hold >= 0:
+            raise ValueError(f"{name} must be >= 0, got {hold}")
+
+    pulses = max(1, int(profile.get('pulses', 1)))
+    open_value = VALVE_CLOSED + 2 * opening
+
+    steps = [(VALVE_CLOSED, prepare)]
+    for pulse in range(pulses):
+        steps.append((open_value, open_time / pulses))
+        if pulse < pulses - 1:
+            steps.append((VALVE_CLOSED, soak))
+    steps.append((VALVE_CLOSED, close_hold))
+    steps.append((None, 0.0))
+    return steps
 
 
 class ServoController:
-    def __init__(self, servo_pin=12, min_pulse_width=0.0005, max_pulse_width=0.0025):
+    def __init__(self, servo_pin=12, min_pulse_width=0.0005, max_pulse_width=0.0025,
+                 self_test=True, self_test_async=False, servo=None, profiles_path=None):
         print(f"[SERVO] Initializing servo on pin {servo_pin}")
         print(f"[SERVO] min_pulse_width={min_pulse_width}, max_pulse_width={max_pulse_width}")
-        
-        try:
-            self.servo = Servo(servo_pin, min_pulse_width=min_pulse_width, max_pulse_width=max_pulse_width)
-            print("[SERVO] Servo object created")
-        except Exception as e:
-            print(f"[SERVO] ERROR creating servo: {e}")
-            raise
-        
+
+        if servo is None:
+            try:
+                from gpiozero import Servo
+                servo = Servo(servo_pin, min_pulse_width=min_pulse_width, max_pulse_width=max_pulse_width)
+                print("[SERVO] Servo object created")
+            except Exception as e:
+                print(f"[SERVO] ERROR creating servo: {e}")
+                raise
+        self.servo = servo
+
         self.servo.value = None
         print(f"[SERVO] Initial servo value set to None")
         self.lock = Lock()
+        # Held for the whole motion; acquired by the caller and released by
+        # the engine thread when the waveform ends
+        self.motion_lock = Lock()
+        self.cancel_event = Event()
+        # Set by cleanup(): cuts the remaining holds short and refuses new cycles
+        self.shutdown_event = Event()
+        self.job_ids = itertools.count(1)
+        self.current_job = None
+        self.profiles_path = profiles_path
+        self.profiles, self.calibration = load_profiles(profiles_path)
+        # Bumped by reload_profiles(); part of the profiles ETag
+        self.profiles_version = 0
         self.irrigation_count = 0
         self.last_irrigation_time = None
-        
-        print("[SERVO] Testing servo movement at startup...")
-        try:
-            self.servo.mid()
-            print("[SERVO] Servo moved to mid position")
-            time.sleep(0.5)
-            self.servo.value = None
-            print("[SERVO] Servo disabled")
-        except Exception as e:
-            print(f"[SERVO] WARNING: Test movement failed: {e}")
-        
-        time.sleep(0.5)
+        self.journal = None
+        self.event_log = None
+        self.moisture_provider = None
+        self.event_bus = None
+
+        if not self_test:
+            print("[SERVO] Skipping startup test movement")
+        elif self_test_async:
+            Thread(target=self._self_test, daemon=True).start()
+        else:
+            self._self_test()
         print("[SERVO] Servo initialized and ready")
 
-    def irrigate(self):
-        print("[SERVO] Irrigate method called")
-        print(f"[SERVO] Attempting to acquire lock...")
-        
-        with self.lock:
-            print("[SERVO] Lock acquired, starting irrigation...")
-            print(f"[SERVO] Current irrigation count: {self.irrigation_count}")
-            
+    def _self_test(self):
+        # Holding the motion lock makes an early irrigate() wait for the test move
+        with self.motion_lock:
+            print("[SERVO] Testing servo movement at startup...")
             try:
-                print("[SERVO] Step 1: Moving to minimum position")
-                self.servo.min()
-                print(f"[SERVO] Servo value after min(): {self.servo.value}")
-                time.sleep(0.5)
-
-                print("[SERVO] Step 2: Moving to maximum position (watering)")
-                self.servo.max()
-                print(f"[SERVO] Servo value after max(): {self.servo.value}")
-                time.sleep(2)
-
-                print("[SERVO] Step 3: Returning to minimum position")
-                self.servo.min()
-                print(f"[SERVO] Servo value after min(): {self.servo.value}")
-                time.sleep(1)
-
-                print("[SERVO] Step 4: Disabling PWM")
+                self.servo.mid()
+                print("[SERVO] Servo moved to mid position")
+                self.shutdown_event.wait(0.5)
                 self.servo.value = None
-                print(f"[SERVO] Servo value after disable: {self.servo.value}")
-
-                self.irrigation_count += 1
-                self.last_irrigation_time = time.time()
-                
-                print(f"[SERVO] Irrigation completed successfully (Total: {self.irrigation_count})")
-                print("[SERVO] Releasing lock")
-                return True
-                
+                print("[SERVO] Servo disabled")
             except Exception as e:
-                print(f"[SERVO] IRRIGATION ERROR: {e}")
-                import traceback
-                traceback.print_exc()
+                print(f"[SERVO] WARNING: Test movement failed: {e}")
+
+            self.shutdown_event.wait(0.5)
+
+    def get_profiles(self):
+        with self.lock:
+            return {
+                'profiles': self.profiles,
+                'calibration': self.calibration,
+                'version': self.profiles_version
+            }
+
+    def reload_profiles(self):
+        """Re-read the profiles file; a running cycle keeps its waveform, and
+        a file that does not load leaves the current profiles in place"""
+        profiles, calibration = load_profiles(self.profiles_path)
+        with self.lock:
+            self.profiles, self.calibration = profiles, calibration
+            self.profiles_version += 1
+        print(f"[SERVO] Reloaded irrigation profiles: {', '.join(profiles)}")
+
+    def irrigate(self, profile='standard', source='manual'):
+        """Run an irrigation cycle and wait for it to finish"""
+        print(f"[SERVO] Irrigate method called (source: {source}, profile: {profile})")
+        print(f"[SERVO] Attempting to acquire lock...")
+
+        waveform = self._waveform_for(profile)
+        self.motion_lock.acquire()
+        if self.shutdown_event.is_set():
+            self.motion_lock.release()
+            print("[SERVO] Shutting down, irrigation refused")
+            return False
+        job = self._start_job(waveform, profile, source, None)
+        job['released'].wait()
+        return job['success']
+
+    def start_irrigation(self, profile='standard', source='manual', on_complete=None):
+        """Start an irrigation cycle in the background.
+
+        Returns the job id, or None when the servo is already moving.
+        on_complete(success) is called from the engine thread.
+        """
+        waveform = self._waveform_for(profile)
+        if not self.motion_lock.acquire(blocking=False):
+            print("[SERVO] Irrigation already in progress, request ignored")
+            return None
+        if self.shutdown_event.is_set():
+            self.motion_lock.release()
+            print("[SERVO] Shutting down, irrigation refused")
+            return None
+        return self._start_job(waveform, profile, source, on_complete)['id']
+
+    def _waveform_for(self, profile):
+        if profile not in self.profiles:
+            raise ValueError(f"Unknown irrigation profile '{profile}'")
+        return build_waveform(self.profiles[profile], self.calibration)
+
+    def _start_job(self, waveform, profile, source, on_complete):
+        job = {
+            'id': next(self.job_ids),
+            'profile': profile,
+            'source': source,
+            'started_at': time.time(),
+            'duration': sum(hold for _, hold in waveform),
+            'step': 0,
+            'steps': len(waveform),
+            'success': False,
+            # Set once the motion lock is free again
+            'released': Event()
+        }
+        self.cancel_event.clear()
+        with self.lock:
+            self.current_job = job
+            event_bus = self.event_bus
+        if event_bus:
+            event_bus.publish('irrigation_started', job_id=job['id'], profile=profile, source=source,
+                              expected_duration=job['duration'])
+        print(f"[SERVO] Lock acquired, starting irrigation job #{job['id']}...")
+        print(f"[SERVO] Current irrigation count: {self.irrigation_count}")
+
+        Thread(target=self._run_job, args=(job, waveform, on_complete), daemon=True).start()
+        return job
+
+    def _run_job(self, job, waveform, on_complete):
+        success = False
+        try:
+            pre_moisture = self.moisture_provider() if self.moisture_provider else None
+            success = self._run_waveform(job, waveform)
+            if success:
+                self._count_irrigation()
+            self._log_cycle(job['source'], job['started_at'], success, pre_moisture)
+        except Exception as e:
+            # Waiters in irrigate() and remote completions must still hear back
+            print(f"[SERVO] Irrigation job #{job['id']} error: {e}")
+            success = False
+        finally:
+            with self.lock:
+                self.current_job = None
+                event_bus = self.event_bus
+
+            # Finished and completed before the lock is free, so the next
+            # job's irrigation_started always comes after this one's finish
+            if event_bus:
+                try:
+                    event_bus.publish('irrigation_finished', job_id=job['id'], profile=job['profile'],
+                                      source=job['source'], success=success, cancelled=job.get('cancelled', False),
+                                      duration=time.time() - job['started_at'])
+                except Exception as e:
+                    print(f"[SERVO] Could not publish irrigation_finished: {e}")
+
+            if on_complete:
                 try:
-                    self.servo.value = None
-                    print("[SERVO] Servo disabled after error")
-                except:
-                    print("[SERVO] Could not disable servo after error")
-                print("[SERVO] Releasing lock after error")
-                return False
+                    on_complete(success)
+                except Exception as e:
+                    print(f"[SERVO] Completion callback error: {e}")
+
+            print("[SERVO] Releasing lock")
+            job['success'] = success
+            self.motion_lock.release()
+            job['released'].set()
+
+    def _run_waveform(self, job, waveform):
+        # Step deadlines are absolute so per-step overhead does not add up
+        deadline = time.monotonic()
+        try:
+            for index, (value, hold) in enumerate(waveform):
+                job['step'] = index
+                print(f"[SERVO] Step {index + 1}/{len(waveform)}: value={value} for {hold:.2f}s")
+                self.servo.value = value
+                deadline += hold
+                if hold and self.cancel_event.wait(max(0.0, deadline - time.monotonic())):
+                    print("[SERVO] Irrigation cancelled, closing valve")
+                    job['cancelled'] = True
+                    self._park(waveform[-2][1])
+                    return False
+
+            print(f"[SERVO] Irrigation completed successfully (Total: {self.irrigation_count + 1})")
+            return True
+
+        except Exception as e:
+            print(f"[SERVO] IRRIGATION ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+            self._park(0)
+            return False
+
+    def _park(self, close_hold):
+        try:
+            self.servo.value = VALVE_CLOSED
+            closed_at = time.monotonic()
+            if close_hold and self.shutdown_event.wait(close_hold):
+                # Shutting down: hold only as long as the valve takes to close
+                settle = min(close_hold, self.calibration['close_settle'])
+                time.sleep(max(0.0, closed_at + settle - time.monotonic()))
+            self.servo.value = None
+            print("[SERVO] Servo parked and disabled")
+        except Exception:
+            print("[SERVO] Could not disable servo after error")
+
+    def cancel(self, emergency=False):
+        """Stop the running cycle; emergency closes the valve immediately"""
+        with self.lock:
+            job = self.current_job
+        if job is None:
+            return False
+
+        print(f"[SERVO] {'Emergency stop' if emergency else 'Cancel'} requested for job #{job['id']}")
+        self.cancel_event.set()
+        if emergency:
+            try:
+                self.servo.value = VALVE_CLOSED
+            except Exception as e:
+                print(f"[SERVO] Emergency close failed: {e}")
+        return True
+
+    def _count_irrigation(self):
+        with self.lock:
+            self.irrigation_count += 1
+            self.last_irrigation_time = time.time()
+            journal = self.journal
+            counters = {
+                'irrigation_count': self.irrigation_count,
+                'last_irrigation_time': self.last_irrigation_time
+            }
+
+        if not journal:
+            return
+        # The water went out either way; a journal that cannot write must
+        # not turn the cycle into a failure
+        try:
+            journal.record(counters)
+        except Exception as e:
+            print(f"[SERVO] Failed to journal irrigation count: {e}")
+
+    def _log_cycle(self, source, started_at, success, pre_moisture):
+        if not self.event_log:
+            return
+        try:
+            self.event_log.record_irrigation(source, started_at, time.time() - started_at, success, pre_moisture)
+        except Exception as e:
+            print(f"[SERVO] Failed to log irrigation: {e}")
+
+    def set_event_log(self, event_log, moisture_provider=None):
+        self.event_log = event_log
+        self.moisture_provider = moisture_provider
+
+    def set_event_bus(self, event_bus):
+        with self.lock:
+            self.event_bus = event_bus
+
+    def set_journal(self, journal):
+        with self.lock:
+            self.journal = journal
+            self.irrigation_count = journal.get('irrigation_count', self.irrigation_count)
+            self.last_irrigation_time = journal.get('last_irrigation_time', self.last_irrigation_time)
+        print(f"[SERVO] Restored irrigation count: {self.irrigation_count}")
 
     def get_state(self):
         with self.lock:
+            job = self.current_job
             return {
                 'irrigation_count': self.irrigation_count,
-                'last_irrigation_time': self.last_irrigation_time
+                'last_irrigation_time': self.last_irrigation_time,
+                'irrigating': job is not None,
+                'irrigation_profile': job['profile'] if job else None,
+                'irrigation_progress': job['step'] / (job['steps'] - 1) if job else None
             }
 
     def cleanup(self):
-        with self.lock:
+        """Close the valve and disable the servo, stopping a running cycle;
+        no cycle starts afterwards"""
+        self.shutdown_event.set()
+        self.cancel(emergency=True)
+        with self.motion_lock:
             print("[SERVO] Cleaning up servo")
             try:
                 self.servo.value = None
                 print("[SERVO] Servo PWM disabled")
             except Exception as e:
-                print(f"[SERVO] Error during cleanup: {e}")
\ No newline at end of file
+                print(f"[SERVO] Error during cleanup: {e}")
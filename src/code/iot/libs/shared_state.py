@@ -0,0 +1,165 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from threading import Lock
+
+
+# Kept in RAM so the writes every few seconds do not wear the SD card
+DEFAULT_PATH = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'planttalker-state')
+DEFAULT_CAPACITY = 64 * 1024
+
+# Sequence number, taken_at, payload length, payload CRC-32
+HEADER = struct.Struct('<QdII')
+SEQUENCE = struct.Struct('<Q')
+
+
+class SharedStateWriter:
+    """Single writer of the latest state snapshot in a memory-mapped file.
+
+    Writes follow a seqlock: the sequence number is odd while the payload is
+    being replaced and even once it is complete, so readers in other
+    processes can copy it without a lock and retry when a write overlapped.
+    The CRC of the payload also catches a torn copy on CPUs that reorder the
+    stores. The file is reused rather than replaced, so readers that mapped
+    it before a daemon restart keep seeing new snapshots, and the sequence
+    carries on from the previous writer's.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.lock = Lock()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o640)
+        try:
+            if os.fstat(fd).st_size != HEADER.size + capacity:
+                os.ftruncate(fd, HEADER.size + capacity)
+            self.map = mmap.mmap(fd, HEADER.size + capacity)
+        finally:
+            os.close(fd)
+        # Continue the sequence of a previous writer so readers notice the change
+        self.sequence = SEQUENCE.unpack_from(self.map, 0)[0] + 1 & ~1
+        self.version = None
+        self.writes = 0
+        print(f"[SHARED] State segment at {path} ({capacity} bytes)")
+
+    def write(self, snapshot):
+        """Store a snapshot from SystemState.take_snapshot(); unchanged versions are skipped"""
+        payload = snapshot['payload']
+        if len(payload) > self.capacity:
+            raise ValueError(f"State of {len(payload)} bytes exceeds the {self.capacity} byte segment")
+        with self.lock:
+            if snapshot['version'] == self.version:
+                return False
+            self.sequence += 1
+            SEQUENCE.pack_into(self.map, 0, self.sequence)
+            self.map[HEADER.size:HEADER.size + len(payload)] = payload
+            HEADER.pack_into(self.map, 0, self.sequence, snapshot['taken_at'], len(payload), zlib.crc32(payload))
+            self.sequence += 1
+            SEQUENCE.pack_into(self.map, 0, self.sequence)
+            self.version = snapshot['version']
+            self.writes += 1
+            return True
+
+    def get_stats(self):
+        with self.lock:
+            return {'path': self.path, 'version': self.version, 'writes': self.writes}
+
+    def close(self):
+        with self.lock:
+            self.map.close()
+
+
+class SharedStateReader:
+    """Reads the snapshot published by a SharedStateWriter in another process.
+
+    A read that finds the sequence number unchanged returns the snapshot it
+    decoded last, so most reads are a single 8-byte unpack: no copy, no
+    decode and no round trip to the writer. Until the writer has created
+    the file read() returns None, retrying the open at most once per
+    retry_interval.
+
+    Snapshot versions count the writes to the segment. Unlike the writer's
+    own versions they keep increasing when the daemon restarts, so ETags
+    and long-poll positions stay valid across the restart.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, retry_interval=1.0, max_retries=100):
+        self.path = path
+        self.retry_interval = retry_interval
+        self.max_retries = max_retries
+        self.lock = Lock()
+        self.map = None
+        self.next_open = 0.0
+        self.sequence = None
+        self.snapshot = None
+        self.decodes = 0
+        self.retries = 0
+
+    def _open(self):
+        now = time.monotonic()
+        if now < self.next_open:
+            return False
+        self.next_open = now + self.retry_interval
+        try:
+            with open(self.path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        print(f"[SHARED] Reading state segment {self.path}")
+        return True
+
+    def read(self):
+        """Latest snapshot as {'version', 'taken_at', 'state', 'payload'}, or None"""
+        if self.map is None and not self._open():
+            return None
+        sequence = SEQUENCE.unpack_from(self.map, 0)[0]
+        if sequence == self.sequence:
+            return self.snapshot
+
+        with self.lock:
+            for _ in range(self.max_retries):
+                sequence, taken_at, length, crc = HEADER.unpack_from(self.map, 0)
+                if sequence == self.sequence:
+                    return self.snapshot
+                if sequence == 0:
+                    # Created but nothing written yet
+                    return None
+                if sequence % 2 == 0:
+                    payload = self.map[HEADER.size:HEADER.size + length]
+                    if SEQUENCE.unpack_from(self.map, 0)[0] == sequence and zlib.crc32(payload) == crc:
+                        break
+                self.retries += 1
+                time.sleep(0)
+            else:
+                # The writer is stuck mid-write; serve the last good snapshot
+                return self.snapshot
+
+            self.snapshot = {
+                'version': sequence // 2,
+                'taken_at': taken_at,
+                'state': json.loads(payload),
+                'payload': payload
+            }
+            self.sequence = sequence
+            self.decodes += 1
+            return self.snapshot
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'path': self.path,
+                'mapped': self.map is not None,
+                'version': self.snapshot['version'] if self.snapshot else None,
+                'decodes': self.decodes,
+                'retries': self.retries
+            }
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
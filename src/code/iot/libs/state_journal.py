@@ -0,0 +1,187 @@
+import json
+import os
+import zlib
+from threading import Thread, Lock, Event
+
+
+class StateJournal:
+    """Crash-safe key/value state persisted as a snapshot plus an append-only
+    journal.
+
+    Every record() is appended to the journal as one checksummed line and
+    written to the OS immediately; fsync is batched by a background thread
+    every flush_interval seconds. Once compact_every records have
+    accumulated, the state is written to a new snapshot (temp file, fsync,
+    rename) and the journal is truncated. On load, a torn or corrupt tail
+    left by a power loss is detected by its checksum and discarded.
+    """
+
+    SNAPSHOT_NAME = 'state.snapshot'
+    JOURNAL_NAME = 'state.journal'
+
+    def __init__(self, directory, flush_interval=1.0, compact_every=500):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+        self.journal_path = os.path.join(directory, self.JOURNAL_NAME)
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.state = {}
+        self.seq = 0
+        self.records_since_compaction = 0
+        self.dirty = False
+        self.journal = None
+        self.lock = Lock()
+        self.stop_event = Event()
+        self.thread = None
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            self.state, self.seq = self._read_snapshot()
+            replayed, valid_length = self._replay_journal()
+
+            # Drop any torn tail so new records are not appended after garbage
+            if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) != valid_length:
+                print(f"[JOURNAL] Discarding corrupt journal tail after {valid_length} bytes")
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(valid_length)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self.journal = open(self.journal_path, 'ab')
+            self.records_since_compaction = replayed
+            print(f"[JOURNAL] Restored {len(self.state)} keys (snapshot + {replayed} journal records)")
+
+        if replayed:
+            self.compact()
+        return dict(self.state)
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                line = f.read()
+        except FileNotFoundError:
+            return {}, 0
+
+        record = self._decode(line.strip())
+        if record is None:
+            # The rename in compact() is atomic, so this means media corruption
+            print("[JOURNAL] WARNING: Snapshot failed its checksum, starting from the journal only")
+            return {}, 0
+        return record['state'], record['seq']
+
+    def _replay_journal(self):
+        replayed = 0
+        valid_length = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    record = self._decode(line.rstrip(b'\n')) if line.endswith(b'\n') else None
+                    if record is None:
+                        break
+                    valid_length += len(line)
+                    if record['seq'] <= self.seq:
+                        continue
+                    self.state.update(record['set'])
+                    self.seq = record['seq']
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+        return replayed, valid_length
+
+    @staticmethod
+    def _encode(record):
+        payload = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        return b'%08x\t%s' % (zlib.crc32(payload), payload)
+
+    @staticmethod
+    def _decode(line):
+        try:
+            checksum, payload = line.split(b'\t', 1)
+            if int(checksum, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.state.get(key, default)
+
+    def record(self, updates):
+        with self.lock:
+            if self.journal is None:
+                raise RuntimeError("StateJournal.load() must be called before record()")
+            self.seq += 1
+            self.state.update(updates)
+            self.journal.write(self._encode({'seq': self.seq, 'set': updates}) + b'\n')
+            self.journal.flush()
+            self.dirty = True
+            self.records_since_compaction += 1
+            needs_compaction = self.records_since_compaction >= self.compact_every
+
+        if needs_compaction:
+            self.compact()
+
+    def sync(self):
+        with self.lock:
+            if self.journal is not None and self.dirty:
+                os.fsync(self.journal.fileno())
+                self.dirty = False
+
+    def compact(self):
+        with self.lock:
+            if self.journal is None:
+                return
+
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(self._encode({'seq': self.seq, 'state': self.state}) + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            self._fsync_directory()
+
+            # Records up to self.seq now live in the snapshot; if we crash
+            # before the truncate, load() skips them by sequence number
+            self.journal.close()
+            self.journal = open(self.journal_path, 'wb')
+            os.fsync(self.journal.fileno())
+            self.dirty = False
+            self.records_since_compaction = 0
+
+    def _fsync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def start(self):
+        print("[JOURNAL] Starting journal flush thread")
+        self.stop_event.clear()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        print("[JOURNAL] Stopping journal flush thread")
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        self.compact()
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"[JOURNAL] Sync error: {e}")
@@ -1,5 +1,31 @@
+import json
 import time
-from threading import Lock
+from threading import Lock, Condition
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_state(state):
+    """Compact JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(state)
+    return json.dumps(state, separators=(',', ':')).encode('utf-8')
+
+
+def classify_moisture(soil_moisture):
+    """Return (plant_status, plant_message) for a soil moisture reading"""
+    if soil_moisture is None:
+        return 'unknown', 'No soil moisture data available'
+    if soil_moisture == 0:
+        return 'sensor_out', 'Sensor is not in the soil'
+    if 1 <= soil_moisture < 35:
+        return 'dry', 'Plant is dehydrated and needs water'
+    if 36 <= soil_moisture <= 65:
+        return 'medium', 'Soil moisture is medium, manual watering optional'
+    return 'ideal', 'Soil moisture is ideal, no watering needed'
 
 
 class SystemState:
@@ -11,6 +37,15 @@ class SystemState:
         self.led_controller = None
         self.button_handler = None
         self.servo_controller = None
+        self.forecaster = None
+        self.event_bus = None
+        self.plant_status = 'unknown'
+        self.version = 0
+        self.snapshot = None
+        self.snapshot_condition = Condition()
+        # Held from reading the state to publishing its version, so a later
+        # version never carries older state than an earlier one
+        self.snapshot_lock = Lock()
 
     def set_components(self, dht_sensor, uart_handler, led_controller, button_handler, servo_controller):
         print("[STATE] Registering all system components")
@@ -22,47 +57,117 @@ class SystemState:
             self.servo_controller = servo_controller
         print("[STATE] All components registered successfully")
 
+    def set_forecaster(self, forecaster):
+        """Include the moisture trend and time-to-dry forecast in the state"""
+        with self.lock:
+            self.forecaster = forecaster
+
+    def set_event_bus(self, event_bus):
+        """Publish status_change whenever a soil reading moves the plant status"""
+        self.event_bus = event_bus
+        event_bus.subscribe_callback(self._on_reading, types=('reading',), name='system-state')
+
+    def _on_reading(self, event):
+        if event.data.get('sensor') != 'soil_moisture':
+            return
+        soil_moisture = event.data['soil_moisture']
+        plant_status, plant_message = classify_moisture(soil_moisture)
+        if plant_status == self.plant_status:
+            return
+
+        previous_status = self.plant_status
+        self.plant_status = plant_status
+        print(f"[STATE] Plant status changed: {previous_status} -> {plant_status}")
+        self.event_bus.publish('status_change', plant_status=plant_status, previous_status=previous_status,
+                               plant_message=plant_message, soil_moisture=soil_moisture)
+
     def get_full_state(self):
         with self.lock:
             dht_data = self.dht_sensor.get_data() if self.dht_sensor else {}
+            dht_stats = self.dht_sensor.get_stats() if self.dht_sensor else {}
             uart_data = self.uart_handler.get_data() if self.uart_handler else {}
             button_data = self.button_handler.get_state() if self.button_handler else {}
             servo_data = self.servo_controller.get_state() if self.servo_controller else {}
             led_state = self.led_controller.get_state() if self.led_controller else None
+            forecast = self.forecaster.get_forecast() if self.forecaster else None
 
             soil_moisture = uart_data.get('soil_moisture')
-
-            if soil_moisture is not None:
-                if soil_moisture == 0:
-                    plant_status = 'sensor_out'
-                    plant_message = 'Sensor is not in the soil'
-                elif 1 <= soil_moisture < 35:
-                    plant_status = 'dry'
-                    plant_message = 'Plant is dehydrated and needs water'
-                elif 36 <= soil_moisture <= 65:
-                    plant_status = 'medium'
-                    plant_message = 'Soil moisture is medium, manual watering optional'
-                else:
-                    plant_status = 'ideal'
-                    plant_message = 'Soil moisture is ideal, no watering needed'
-            else:
-                plant_status = 'unknown'
-                plant_message = 'No soil moisture data available'
+            plant_status, plant_message = classify_moisture(soil_moisture)
 
             return {
                 'temperature_c': dht_data.get('temperature_c'),
                 'temperature_f': dht_data.get('temperature_f'),
                 'humidity': dht_data.get('humidity'),
+                'dht_age': dht_data.get('age'),
+                'dht_quality': dht_data.get('quality', 'none'),
+                'dht_confidence': dht_data.get('confidence', 0.0),
+                'dht_sample_rate_per_min': dht_stats.get('sample_rate_per_min', 0.0),
+                'dht_failure_ratio': dht_stats.get('failure_ratio', 0.0),
                 'soil_moisture': soil_moisture,
                 'plant_status': plant_status,
                 'plant_message': plant_message,
                 'led_state': led_state,
                 'irrigation_count': servo_data.get('irrigation_count', 0),
+                'irrigating': servo_data.get('irrigating', False),
                 'last_irrigation_time': servo_data.get('last_irrigation_time'),
                 'button_press_count': button_data.get('press_count', 0),
-                'last_update_time': uart_data.get('last_update_time')
+                'last_update_time': uart_data.get('last_update_time'),
+                'moisture_forecast': forecast
             }
 
+    def take_snapshot(self):
+        """Capture the full state as a numbered version.
+
+        The version only moves when the state changed; dht_age is derived
+        from the read time, so it alone does not make a new version. The
+        state is JSON-encoded once here, and every stream, long-poll,
+        WebSocket and REST client of a version shares that payload.
+        """
+        with self.snapshot_lock:
+            state = self.get_full_state()
+            with self.snapshot_condition:
+                previous = self.snapshot
+                if previous is not None and self._same_state(previous['state'], state):
+                    previous['taken_at'] = time.time()
+                    return previous
+
+            payload = encode_state(state)
+            with self.snapshot_condition:
+                self.version += 1
+                self.snapshot = {
+                    'version': self.version,
+                    'taken_at': time.time(),
+                    'state': state,
+                    'payload': payload
+                }
+                self.snapshot_condition.notify_all()
+                return self.snapshot
+
+    @staticmethod
+    def _same_state(old, new):
+        return all(old.get(key) == value for key, value in new.items() if key != 'dht_age')
+
+    def get_snapshot(self, max_age=None):
+        """Latest snapshot, taking a new one if there is none or it is older than max_age"""
+        with self.snapshot_condition:
+            snapshot = self.snapshot
+        if snapshot is None or (max_age is not None and time.time() - snapshot['taken_at'] > max_age):
+            return self.take_snapshot()
+        return snapshot
+
+    def wait_for_snapshot(self, since, timeout=None):
+        """Latest snapshot other than version `since`, or None on timeout.
+
+        Intermediate versions are skipped, so a slow client always catches
+        up with the current state in one step. A `since` ahead of the
+        current version (the server restarted) is answered immediately.
+        """
+        with self.snapshot_condition:
+            if self.snapshot_condition.wait_for(
+                    lambda: self.snapshot is not None and self.snapshot['version'] != since, timeout):
+                return self.snapshot
+        return None
+
     def get_context_string(self):
         state = self.get_full_state()
 
@@ -74,6 +179,9 @@ class SystemState:
         else:
             context_parts.append("Temperature: Not available")
 
+        if state['dht_quality'] == 'stale' and state['dht_age'] is not None:
+            context_parts.append(f"Temperature/Humidity Readings: stale ({state['dht_age']/60:.1f} minutes old)")
+
         if state['humidity'] is not None:
             context_parts.append(f"Air Humidity: {state['humidity']:.1f}%")
         else:
@@ -85,6 +193,17 @@ class SystemState:
             context_parts.append("Soil Moisture: Not available")
 
         context_parts.append(f"Plant Status: {state['plant_message']}")
+
+        forecast = state['moisture_forecast']
+        if forecast and forecast['recovering']:
+            context_parts.append("Moisture Trend: rising after watering")
+        elif forecast and forecast['slope_per_hour'] is not None:
+            trend = f"Moisture Trend: {forecast['slope_per_hour']:+.2f}% per hour"
+            if forecast['hours_to_dry'] == 0:
+                trend += ", already below the dry threshold"
+            elif forecast['hours_to_dry'] is not None:
+                trend += f", expected to need water in about {forecast['hours_to_dry']:.0f} hours"
+            context_parts.append(f"{trend} (confidence {forecast['confidence']:.0%})")
         context_parts.append(f"LED Indicator: {state['led_state'] if state['led_state'] else 'unknown'}")
         context_parts.append(f"Total Irrigations: {state['irrigation_count']}")
 
@@ -95,3 +214,74 @@ class SystemState:
             context_parts.append("Last Irrigation: Never")
 
         return "\n".join(context_parts)
+
+
+class RemoteSystemState(SystemState):
+    """SystemState of a thin client: the state comes from the hardware
+    daemon through fetch_state() (one round trip), while snapshots,
+    versions and long-poll waits work as in the daemon's process"""
+
+    def __init__(self, fetch_state):
+        super().__init__()
+        self.fetch_state = fetch_state
+
+    def set_event_bus(self, event_bus):
+        # status_change is published by the daemon and arrives with its events
+        self.event_bus = event_bus
+
+    def get_full_state(self):
+        return self.fetch_state()
+
+
+class SharedSystemState(RemoteSystemState):
+    """RemoteSystemState that reads snapshots the hardware daemon publishes
+    in shared memory, so API workers answer state reads without a round
+    trip. Versions come from the segment and are the same in every worker.
+    Falls back to fetch_state() while no snapshot is published."""
+
+    def __init__(self, fetch_state, read_snapshot, poll_interval=0.05):
+        super().__init__(fetch_state)
+        self.read_snapshot = read_snapshot
+        self.poll_interval = poll_interval
+
+    def set_event_bus(self, event_bus):
+        # Daemon events are the cue to look for a newer snapshot
+        self.event_bus = event_bus
+        event_bus.subscribe_callback(self._on_event, name='shared-state')
+
+    def _on_event(self, event):
+        with self.snapshot_condition:
+            self.snapshot_condition.notify_all()
+
+    def get_full_state(self):
+        snapshot = self.read_snapshot()
+        if snapshot is None:
+            return self.fetch_state()
+        return snapshot['state']
+
+    def take_snapshot(self):
+        snapshot = self.read_snapshot()
+        if snapshot is None:
+            return super().take_snapshot()
+        return snapshot
+
+    def get_snapshot(self, max_age=None):
+        # The daemon rewrites the segment on every change, so it is never stale
+        return self.take_snapshot()
+
+    def wait_for_snapshot(self, since, timeout=None):
+        # The daemon may write the segment just after its event arrives here,
+        # so an event is followed by one more look poll_interval later
+        deadline = time.time() + timeout if timeout is not None else None
+        woken = False
+        while True:
+            snapshot = self.get_snapshot()
+            if snapshot['version'] != since:
+                return snapshot
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return None
+            if woken:
+                remaining = self.poll_interval if remaining is None else min(remaining, self.poll_interval)
+            with self.snapshot_condition:
+                woken = self.snapshot_condition.wait(remaining)
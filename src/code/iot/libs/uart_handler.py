@@ -1,52 +1,166 @@
 import time
-import serial
-from threading import Thread, Lock
+from threading import Thread, Lock, Event
 
 
 class UARTHandler:
-    def __init__(self, port='/dev/ttyAMA0', baudrate=115200, timeout=1, read_interval=1):
-        self.serial = serial.Serial(port, baudrate, timeout=timeout)
+    def __init__(self, port='/dev/ttyAMA0', baudrate=115200, timeout=1, read_interval=1,
+                 serial_port=None, recorder=None):
+        self.open_port = None
+        if serial_port is None:
+            import serial
+            self.open_port = lambda: serial.Serial(port, baudrate, timeout=timeout)
+            serial_port = self.open_port()
+        self.serial = serial_port
+        self.recorder = recorder
         self.read_interval = read_interval
         self.soil_moisture = None
         self.lock = Lock()
         self.running = False
         self.thread = None
         self.last_update_time = None
+        self.first_data_event = Event()
+        self.wake = Event()
+        self.callback = None
+        self.event_bus = None
+        # For the watchdog: when the read loop last came round, its failed
+        # polls in a row, and which loop is current after a restart
+        self.heartbeat = None
+        self.consecutive_errors = 0
+        self.last_error = None
+        self.generation = 0
+        # Set while the port is closed after a reopen that failed; the read
+        # loop keeps trying to open it
+        self.port_closed = False
+        self.port_lock = Lock()
+
+    def set_callback(self, callback):
+        with self.lock:
+            self.callback = callback
+
+    def set_event_bus(self, event_bus):
+        with self.lock:
+            self.event_bus = event_bus
+
+    def set_read_interval(self, interval):
+        """Poll every `interval` seconds and ask the ESP32 to send at that rate.
+
+        The link carries `RATE <seconds>` lines to the ESP32; firmware that
+        does not know the command keeps its own rate and its extra lines are
+        drained on each poll.
+        """
+        with self.lock:
+            if interval == self.read_interval:
+                return
+            self.read_interval = interval
+        try:
+            self.serial.write(f"RATE {interval:g}\n".encode('utf-8'))
+        except Exception as e:
+            print(f"[UART] Failed to send rate command: {e}")
+        print(f"[UART] Read interval set to {interval:g}s")
+        self.wake.set()
 
     def start(self):
         print("[UART] Starting UART handler thread")
         self.running = True
-        self.thread = Thread(target=self._run, daemon=True)
+        self.heartbeat = time.monotonic()
+        self.thread = Thread(target=self._run, args=(self.generation,), daemon=True)
         self.thread.start()
 
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def restart(self):
+        """Replace a dead or stalled read loop; a stalled one exits once it unblocks"""
+        print("[UART] Restarting UART handler thread")
+        self.generation += 1
+        self.wake.set()
+        self.start()
+
+    def reopen(self):
+        """Close and reopen the serial port, e.g. after the device went away"""
+        print("[UART] Reopening serial port")
+        with self.port_lock:
+            try:
+                self.serial.close()
+            except Exception as e:
+                print(f"[UART] Error closing serial port: {e}")
+            self.port_closed = True
+            self._open_port()
+        self.consecutive_errors = 0
+        self.wake.set()
+
+    def _open_port(self):
+        # Called with port_lock held
+        if self.open_port:
+            self.serial = self.open_port()
+        else:
+            # An injected port reopens in place
+            self.serial.open()
+        self.port_closed = False
+
     def stop(self):
         print("[UART] Stopping UART handler thread")
         self.running = False
+        self.wake.set()
         if self.thread:
             self.thread.join()
         self.serial.close()
 
-    def _run(self):
+    def _run(self, generation):
         print("[UART] UART handler thread running")
-        while self.running:
+        while self.running and generation == self.generation:
+            self.heartbeat = time.monotonic()
             try:
-                if self.serial.in_waiting > 0:
+                if self.port_closed:
+                    with self.port_lock:
+                        if self.port_closed:
+                            self._open_port()
+                            print("[UART] Serial port reopened")
+                # Take every line that queued up since the last poll
+                while self.running and generation == self.generation and self.serial.in_waiting > 0:
                     data = self.serial.readline().decode('utf-8').strip()
-                    print(f"[UART] Received data: {data}")
-                    moisture = self._extract_moisture(data)
-
-                    if moisture is not None:
-                        with self.lock:
-                            self.soil_moisture = moisture
-                            self.last_update_time = time.time()
-                        print(f"[UART] Soil moisture updated: {moisture}%")
-                    else:
-                        print(f"[UART] Failed to parse moisture from: {data}")
+                    if self.recorder:
+                        self.recorder.record_uart(data)
+                    self._handle_line(data)
+                self.consecutive_errors = 0
 
             except Exception as e:
-                print(f"[UART] Error: {e}")
+                self.consecutive_errors += 1
+                self.last_error = str(e)
+                # A vanished device fails every poll; say so once
+                if self.consecutive_errors == 1:
+                    print(f"[UART] Error: {e}")
+
+            # Woken early when the interval changes or the handler stops
+            self.wake.wait(self.read_interval)
+            self.wake.clear()
 
-            time.sleep(self.read_interval)
+    def _handle_line(self, data, timestamp=None):
+        print(f"[UART] Received data: {data}")
+        moisture = self._extract_moisture(data)
+
+        if moisture is not None:
+            updated_at = timestamp if timestamp is not None else time.time()
+            with self.lock:
+                self.soil_moisture = moisture
+                self.last_update_time = updated_at
+                callback_to_call = self.callback
+                event_bus = self.event_bus
+            self.first_data_event.set()
+            print(f"[UART] Soil moisture updated: {moisture}%")
+
+            if event_bus:
+                event_bus.publish('reading', sensor='soil_moisture', soil_moisture=moisture, read_at=updated_at)
+
+            if callback_to_call:
+                try:
+                    callback_to_call(moisture, updated_at)
+                except Exception as e:
+                    print(f"[UART] Callback error: {e}")
+        else:
+            print(f"[UART] Failed to parse moisture from: {data}")
+
+        return moisture
 
     def _extract_moisture(self, data):
         try:
@@ -58,6 +172,9 @@ class UARTHandler:
             print(f"[UART] Failed to extract moisture: {e}")
         return None
 
+    def wait_for_data(self, timeout=None):
+        return self.first_data_event.wait(timeout)
+
     def get_data(self):
         with self.lock:
             return {
@@ -0,0 +1,182 @@
+import time
+from threading import Thread, Lock, Event
+
+
+class Watchdog:
+    """Supervises worker loops and recovers them when they die, stall or
+    stop producing data.
+
+    Each watched worker is described by callables: alive() for its thread,
+    heartbeat() for the monotonic time its loop last came round (stalled
+    after stall_after seconds) and check() returning why its data is bad,
+    or None. A failing worker gets recover(reason) at once, then again
+    after backoff_base, 2x, 4x ... up to backoff_max seconds while it stays
+    failing; once healthy its backoff starts over.
+    """
+
+    def __init__(self, tick=1.0, backoff_base=5.0, backoff_max=300.0):
+        self.tick = tick
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.workers = {}
+        self.lock = Lock()
+        self.stop_event = Event()
+        self.thread = None
+
+    def watch(self, name, recover, alive=None, heartbeat=None, stall_after=None, check=None):
+        """stall_after is seconds, or a callable for loops whose period changes"""
+        with self.lock:
+            self.workers[name] = {
+                'recover': recover,
+                'alive': alive,
+                'heartbeat': heartbeat,
+                'stall_after': stall_after,
+                'check': check,
+                'status': 'ok',
+                'reason': None,
+                'attempts': 0,
+                'recoveries': 0,
+                'recovery_errors': 0,
+                'last_recovery': None,
+                'next_attempt': 0.0
+            }
+
+    def start(self):
+        print("[WATCHDOG] Starting watchdog thread")
+        self.stop_event.clear()
+        self.thread = Thread(target=self._run, name='watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        print("[WATCHDOG] Stopping watchdog thread")
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        while not self.stop_event.wait(self.tick):
+            self.check()
+
+    def _diagnose(self, entry):
+        if entry['alive'] and not entry['alive']():
+            return 'thread died'
+        if entry['heartbeat'] and entry['stall_after'] is not None:
+            heartbeat = entry['heartbeat']()
+            stall_after = entry['stall_after']
+            if callable(stall_after):
+                stall_after = stall_after()
+            if heartbeat is not None and time.monotonic() - heartbeat > stall_after:
+                return f'loop stalled for {time.monotonic() - heartbeat:.0f}s'
+        if entry['check']:
+            return entry['check']()
+        return None
+
+    def check(self):
+        """Diagnose every worker once and recover the failing ones that are due"""
+        with self.lock:
+            workers = list(self.workers.items())
+
+        for name, entry in workers:
+            try:
+                reason = self._diagnose(entry)
+            except Exception as e:
+                reason = f'check failed: {e}'
+            now = time.monotonic()
+
+            if reason is None:
+                if entry['status'] != 'ok':
+                    print(f"[WATCHDOG] {name} recovered after {entry['attempts']} attempt(s)")
+                with self.lock:
+                    entry.update(status='ok', reason=None, attempts=0, next_attempt=0.0)
+                continue
+
+            if entry['status'] == 'ok':
+                print(f"[WATCHDOG] {name} failing: {reason}")
+            with self.lock:
+                entry.update(status='failing', reason=reason)
+                if now < entry['next_attempt']:
+                    continue
+                entry['attempts'] += 1
+                entry['recoveries'] += 1
+                entry['last_recovery'] = time.time()
+                entry['next_attempt'] = now + min(self.backoff_base * 2 ** (entry['attempts'] - 1),
+                                                  self.backoff_max)
+
+            print(f"[WATCHDOG] Recovering {name} (attempt {entry['attempts']}): {reason}")
+            try:
+                entry['recover'](reason)
+            except Exception as e:
+                print(f"[WATCHDOG] Recovering {name} failed: {e}")
+                with self.lock:
+                    entry['recovery_errors'] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {name: {
+                'status': entry['status'],
+                'reason': entry['reason'],
+                'recoveries': entry['recoveries'],
+                'recovery_errors': entry['recovery_errors'],
+                'last_recovery': entry['last_recovery']
+            } for name, entry in self.workers.items()}
+
+
+def watch_uart(watchdog, uart_handler, stale_after=120, max_errors=5, stall_grace=30):
+    """Restart a dead UART loop, or one stuck stall_grace seconds past its
+    read interval; reopen the port when polls keep failing or no line has
+    arrived for stale_after seconds"""
+    watched_since = time.time()
+
+    def check():
+        if uart_handler.consecutive_errors >= max_errors:
+            return f'{uart_handler.consecutive_errors} failed polls: {uart_handler.last_error}'
+        last_update = uart_handler.get_data()['last_update_time'] or watched_since
+        limit = max(stale_after, uart_handler.read_interval * 4)
+        if time.time() - last_update > limit:
+            return f'no soil moisture reading for {time.time() - last_update:.0f}s'
+        return None
+
+    def recover(reason):
+        nonlocal watched_since
+        watched_since = time.time()
+        try:
+            # Reopening first unblocks a loop stuck in a read
+            uart_handler.reopen()
+        finally:
+            # Restarted even when the port is still gone: the loop keeps
+            # trying to open it
+            if not uart_handler.is_alive() or reason.startswith('loop stalled'):
+                uart_handler.restart()
+
+    watchdog.watch('uart', recover, alive=uart_handler.is_alive, heartbeat=lambda: uart_handler.heartbeat,
+                   stall_after=lambda: uart_handler.read_interval + stall_grace, check=check)
+
+
+def watch_dht(watchdog, dht_sensor, max_failures=10, stall_grace=30):
+    """Restart a dead DHT22 loop, or one stuck stall_grace seconds past its
+    read interval; reinitialize the sensor when reads keep failing or none
+    has succeeded for its stale period"""
+    watched_since = time.time()
+
+    def check():
+        stats = dht_sensor.get_stats()
+        if stats['consecutive_failures'] >= max_failures:
+            return f"{stats['consecutive_failures']} failed reads in a row"
+        last_read = dht_sensor.get_data()['last_read_time'] or watched_since
+        limit = dht_sensor.read_interval + dht_sensor.stale_after
+        if time.time() - last_read > limit:
+            return f'no temperature reading for {time.time() - last_read:.0f}s'
+        return None
+
+    def recover(reason):
+        nonlocal watched_since
+        watched_since = time.time()
+        dht_sensor.reinitialize()
+        if not dht_sensor.is_alive() or reason.startswith('loop stalled'):
+            dht_sensor.restart()
+
+    watchdog.watch('dht', recover, alive=dht_sensor.is_alive, heartbeat=lambda: dht_sensor.heartbeat,
+                   stall_after=lambda: dht_sensor.read_interval + stall_grace, check=check)
@@ -4,99 +4,87 @@ Interactive Plant Talker System
 Allows chat commands while monitoring plant conditions
 """
 
+import argparse
+import asyncio
 import time
 import signal
 import sys
 import threading
-import select
-from libs.dht_sensor import DHTSensor
-from libs.uart_handler import UARTHandler
-from libs.led_controller import LEDController
-from libs.button_handler import ButtonHandler
-from libs.servo_controller import ServoController
-from libs.system_state import SystemState
+import os
+from libs.local_hardware import LocalHardware
+from libs.system_state import RemoteSystemState
 from libs.llm_interface import LLMInterface
+from libs.knowledge_base import KnowledgeBase
+from libs.watchdog import Watchdog
+from libs.console import Console
+from libs.hardware_ipc import HardwareClient, RemoteServoController, RemoteLEDController
+from libs.event_bus import (EventBus, log_event, STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED,
+                            BUTTON_PRESS, ALERT, CONFIG_RELOADED)
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge')
 
 
 class PlantTalkerSystemInteractive:
-    def __init__(self):
+    def __init__(self, fast_start=False, state_dir=DEFAULT_STATE_DIR, hardware_socket=None, alert_rules=None):
         print("=" * 70)
         print("Initializing Plant Talker System (Interactive Mode)...")
         print("=" * 70)
 
-        self.dht_sensor = DHTSensor(read_interval=10)
-        self.uart_handler = UARTHandler(read_interval=1)
-        self.led_controller = LEDController()
-        self.button_handler = ButtonHandler()
-        self.servo_controller = ServoController()
-        self.system_state = SystemState()
+        self.hardware = None
+        self.local = None
+        self.event_bus = EventBus()
+        if hardware_socket:
+            self._connect_hardware(hardware_socket)
+        else:
+            self._create_hardware(fast_start, state_dir, alert_rules)
+
         self.llm_interface = LLMInterface(self.system_state)
+        self.llm_interface.set_event_bus(self.event_bus)
 
-        self.system_state.set_components(
-            self.dht_sensor,
-            self.uart_handler,
-            self.led_controller,
-            self.button_handler,
-            self.servo_controller
-        )
+        # Plant-care notes retrieved into chat prompts
+        self.knowledge_base = KnowledgeBase(os.path.join(state_dir, 'knowledge.db'))
+        self.knowledge_base.sync(KNOWLEDGE_DIR)
+        self.llm_interface.set_knowledge_base(self.knowledge_base)
 
-        self.button_handler.set_callback(self._on_button_pressed)
         self.running = False
         self.in_chat_mode = False
+        self.status_count = 0
+        self.stop_event = threading.Event()
+        self.console = Console()
         
         print("=" * 70)
         print("System initialization complete!")
         print("=" * 70)
 
-    def _on_button_pressed(self):
-        if self.in_chat_mode:
-            return  # Don't interrupt chat
-            
-        print("\n" + "=" * 70)
-        print("[MAIN] Button press detected - checking irrigation conditions")
-        print("=" * 70)
-        
-        time.sleep(0.2)
-        
-        state = self.system_state.get_full_state()
-        soil_moisture = state['soil_moisture']
-        
-        print(f"[MAIN] Current soil moisture: {soil_moisture}")
-
-        if soil_moisture is None:
-            print("[MAIN] Cannot irrigate: No soil moisture data available")
-            print("[MAIN] Waiting 2 seconds for data and trying again...")
-            time.sleep(2)
-            state = self.system_state.get_full_state()
-            soil_moisture = state['soil_moisture']
-            print(f"[MAIN] After wait, soil moisture: {soil_moisture}")
-            
-            if soil_moisture is None:
-                print("[MAIN] Still no data available. Irrigation cancelled.")
-                print("=" * 70 + "\n")
-                return
-
-        if soil_moisture == 0:
-            print("[MAIN] Cannot irrigate: Sensor is not in the soil")
-            print("=" * 70 + "\n")
-            return
-
-        print(f"[MAIN] Proceeding with irrigation check for moisture: {soil_moisture}%")
-        
-        if soil_moisture < 35:
-            print(f"[MAIN] Soil is dry ({soil_moisture}%), initiating irrigation...")
-            result = self.servo_controller.irrigate()
-            print(f"[MAIN] Irrigation result: {result}")
-        elif soil_moisture <= 63:
-            print(f"[MAIN] Manual irrigation requested (moisture: {soil_moisture}%)...")
-            result = self.servo_controller.irrigate()
-            print(f"[MAIN] Irrigation result: {result}")
-        else:
-            print(f"[MAIN] Soil moisture is ideal ({soil_moisture}%). Irrigation not recommended but proceeding...")
-            result = self.servo_controller.irrigate()
-            print(f"[MAIN] Irrigation result: {result}")
-        
-        print("=" * 70 + "\n")
+    def _create_hardware(self, fast_start, state_dir, alert_rules):
+        # Alerts are printed to the console as they fire and resolve
+        self.local = LocalHardware.create(self.event_bus, fast_start=fast_start, state_dir=state_dir,
+                                          alert_rules=alert_rules,
+                                          log_types=(IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS))
+        self.local.expose(self)
+
+        # Restarts stalled or dead read loops and reopens failed devices
+        self.watchdog = Watchdog()
+        self.local.watch(self.watchdog)
+
+    def _connect_hardware(self, socket_path):
+        """Monitor and chat through a running hardware daemon, which keeps the
+        devices, the button and the stores"""
+        self.hardware = HardwareClient(socket_path, name='cli')
+        self.hardware.connect(wait=10)
+        self.hardware.set_event_bus(self.event_bus)
+        self.hardware.subscribe((STATUS_CHANGE, IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS, ALERT,
+                                 CONFIG_RELOADED))
+        # The daemon updates its LEDs and evaluates the alert rules itself
+        self.event_bus.subscribe_callback(
+            log_event, types=(IRRIGATION_STARTED, IRRIGATION_FINISHED, BUTTON_PRESS, ALERT), name='logger'
+        )
+        self.led_controller = RemoteLEDController(self.hardware)
+        self.servo_controller = RemoteServoController(self.hardware)
+        self.event_bus.subscribe_callback(self.servo_controller.handle_event,
+                                          types=(IRRIGATION_FINISHED, CONFIG_RELOADED), name='irrigation-callbacks')
+        self.system_state = RemoteSystemState(lambda: self.hardware.call('get_state'))
 
     def _print_status(self, loop_count):
         """Print current system status"""
@@ -109,6 +97,10 @@ class PlantTalkerSystemInteractive:
         print(f"[MAIN] Temperature: {state['temperature_c']:.1f}C ({state['temperature_f']:.1f}F)" if state['temperature_c'] else "[MAIN] Temperature: Not available")
         print(f"[MAIN] Air Humidity: {state['humidity']:.1f}%" if state['humidity'] else "[MAIN] Air Humidity: Not available")
         print(f"[MAIN] Soil Moisture: {state['soil_moisture']}%" if state['soil_moisture'] is not None else "[MAIN] Soil Moisture: Not available")
+        forecast = state['moisture_forecast']
+        if forecast and forecast['hours_to_dry'] is not None:
+            print(f"[MAIN] Needs Water In: ~{forecast['hours_to_dry']:.0f}h "
+                  f"({forecast['slope_per_hour']:+.2f}%/h, confidence {forecast['confidence']:.0%})")
         print(f"[MAIN] Plant Status: {state['plant_message']}")
         print(f"[MAIN] LED State: {state['led_state']}")
         print(f"[MAIN] Irrigation Count: {state['irrigation_count']}")
@@ -117,8 +109,6 @@ class PlantTalkerSystemInteractive:
         soil_moisture = state['soil_moisture']
 
         if soil_moisture is not None:
-            self.led_controller.update_leds(soil_moisture)
-
             if soil_moisture == 0:
                 print("[MAIN] ⚠️  WARNING: Sensor is not in the soil!")
             elif soil_moisture < 35:
@@ -132,10 +122,9 @@ class PlantTalkerSystemInteractive:
         
         print("-" * 70)
 
-    def chat_mode(self):
-        """Enter chat mode to talk with the LLM"""
+    def _enter_chat(self):
+        """Switch the console to chat; monitoring keeps printing above it"""
         self.in_chat_mode = True
-        
         print("\n" + "=" * 70)
         print("Entering Chat Mode")
         print("=" * 70)
@@ -146,45 +135,142 @@ class PlantTalkerSystemInteractive:
         print("=" * 70)
         print("Ask anything about your plant system!")
         print("=" * 70 + "\n")
+        self.console.set_prompt("You: ")
+
+    def _leave_chat(self):
+        self.in_chat_mode = False
+        print("\nReturning to monitoring mode...\n")
+        self.console.set_prompt("> ")
+
+    async def _chat(self, user_input):
+        """Stream one reply; replies are answered in the order asked"""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+
+        def hand_over(chunk):
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except RuntimeError:
+                pass  # The console has closed
+
+        def produce():
+            # The whole generator runs on one thread, as it holds the LLM lock.
+            # A daemon thread, so a slow reply does not hold up shutdown
+            try:
+                for chunk in self.llm_interface.chat_stream(user_input):
+                    if self.stop_event.is_set():
+                        break
+                    hand_over(chunk)
+            except Exception as e:
+                hand_over(f"Error in chat mode: {e}")
+            finally:
+                hand_over(None)
+
+        async with self.chat_lock:
+            threading.Thread(target=produce, name='chat-reply', daemon=True).start()
+            self.console.begin_stream("Assistant: ")
+            try:
+                while True:
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        break
+                    self.console.stream(chunk)
+            finally:
+                self.console.end_stream()
+
+    def _chat_command(self, user_input):
+        command = user_input.lower()
+        if command in ['exit', 'back', 'quit']:
+            self._leave_chat()
+        elif command == 'reset':
+            self.llm_interface.reset_conversation()
+        elif command == 'status':
+            print("\n" + self.system_state.get_context_string() + "\n")
+        elif user_input:
+            self.chat_tasks.add(asyncio.create_task(self._chat(user_input)))
+            self.chat_tasks = {task for task in self.chat_tasks if not task.done()}
+
+    def _monitor_command(self, command):
+        """Handle a command typed while monitoring; False to exit"""
+        if command == 'chat':
+            self._enter_chat()
+        elif command == 'status':
+            self.status_count += 1
+            self._print_status(self.status_count)
+        elif command == 'help':
+            print("\nCommands:")
+            print("  chat   - Talk with AI about your plant")
+            print("  status - Show current system state")
+            print("  help   - Show this help message")
+            print("  Ctrl+C - Exit program\n")
+        elif command in ['exit', 'quit']:
+            print("Exiting...")
+            return False
+        elif command:
+            print(f"Unknown command: '{command}'. Type 'help' for commands.")
+        return True
+
+    async def _read_commands(self, stopping):
+        while True:
+            line = await self.console.read_line()
+            if line is None:
+                # stdin closed (e.g. started as a service): keep monitoring until stopped
+                return
+            if self.in_chat_mode:
+                self._chat_command(line.strip())
+            elif not self._monitor_command(line.strip().lower()):
+                stopping.set()
+                return
+
+    async def _print_status_updates(self, updates):
+        loop = asyncio.get_running_loop()
+        async for event in updates:
+            self.status_count += 1
+            # get_full_state() is a round trip to the daemon in hardware mode
+            await loop.run_in_executor(None, self._print_status, self.status_count)
+
+    async def _run_console(self):
+        """Multiplex typed commands, status updates and streamed chat replies,
+        so monitoring, alerts and the button keep running while chatting"""
+        loop = asyncio.get_running_loop()
+        stopping = asyncio.Event()
 
+        def on_signal():
+            print("\n" + "=" * 70)
+            print("[MAIN] Shutdown signal received...")
+            print("=" * 70)
+            stopping.set()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, on_signal)
+        self.chat_lock = asyncio.Lock()
+        self.chat_tasks = set()
+        updates = self.event_bus.subscribe_async(types=(STATUS_CHANGE,), name='console')
+        self.console.attach(loop)
+        tasks = [asyncio.create_task(self._print_status_updates(updates)),
+                 asyncio.create_task(self._read_commands(stopping))]
         try:
-            while self.in_chat_mode:
-                user_input = input("You: ").strip()
-                
-                if user_input.lower() in ['exit', 'back', 'quit']:
-                    print("\nReturning to monitoring mode...\n")
-                    break
-                
-                if user_input.lower() == 'reset':
-                    self.llm_interface.reset_conversation()
-                    continue
-                
-                if user_input.lower() == 'status':
-                    print("\n" + self.system_state.get_context_string() + "\n")
-                    continue
-                
-                if not user_input:
-                    continue
-                
-                print("\nThinking...")
-                response = self.llm_interface.chat(user_input)
-                print(f"\nAssistant: {response}\n")
-
-        except KeyboardInterrupt:
-            print("\nExiting chat mode...\n")
-        except Exception as e:
-            print(f"Error in chat mode: {e}")
+            await stopping.wait()
         finally:
-            self.in_chat_mode = False
+            updates.close()
+            for task in tasks + list(self.chat_tasks):
+                task.cancel()
+            await asyncio.gather(*tasks, *self.chat_tasks, return_exceptions=True)
+            self.console.detach()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
 
     def start(self):
         print("\n" + "=" * 70)
         print("Starting all system components...")
         print("=" * 70)
 
-        self.dht_sensor.start()
-        self.uart_handler.start()
-        self.button_handler.start()
+        if not self.hardware:
+            self.dht_sensor.start()
+            self.uart_handler.start()
+            self.button_handler.start()
+            self.journal.start()
+            self.alert_engine.start()
+            self.watchdog.start()
 
         self.running = True
         print("\n" + "=" * 70)
@@ -198,45 +284,7 @@ class PlantTalkerSystemInteractive:
         print("=" * 70 + "\n")
 
         try:
-            loop_count = 0
-            last_status_time = time.time()
-            status_interval = 30  # seconds
-            
-            while self.running:
-                # Check for user input (non-blocking)
-                if sys.stdin in select.select([sys.stdin], [], [], 0)[0]:
-                    command = sys.stdin.readline().strip().lower()
-                    
-                    if command == 'chat':
-                        self.chat_mode()
-                    elif command == 'status':
-                        loop_count += 1
-                        self._print_status(loop_count)
-                    elif command == 'help':
-                        print("\nCommands:")
-                        print("  chat   - Talk with AI about your plant")
-                        print("  status - Show current system state")
-                        print("  help   - Show this help message")
-                        print("  Ctrl+C - Exit program\n")
-                    elif command in ['exit', 'quit']:
-                        print("Exiting...")
-                        break
-                    elif command:
-                        print(f"Unknown command: '{command}'. Type 'help' for commands.")
-                
-                # Print status every 30 seconds
-                current_time = time.time()
-                if current_time - last_status_time >= status_interval:
-                    loop_count += 1
-                    self._print_status(loop_count)
-                    last_status_time = current_time
-                
-                time.sleep(0.1)  # Small delay to prevent CPU spinning
-
-        except KeyboardInterrupt:
-            print("\n" + "=" * 70)
-            print("[MAIN] Shutdown signal received...")
-            print("=" * 70)
+            asyncio.run(self._run_console())
         finally:
             self.stop()
 
@@ -245,12 +293,25 @@ class PlantTalkerSystemInteractive:
         print("[MAIN] Stopping all system components...")
         print("=" * 70)
         self.running = False
+        self.stop_event.set()
 
-        self.dht_sensor.stop()
-        self.uart_handler.stop()
-        self.button_handler.stop()
-        self.led_controller.cleanup()
-        self.servo_controller.cleanup()
+        if self.hardware:
+            self.hardware.close()
+            self.event_bus.close()
+        else:
+            # Park the valve first, so nothing below can leave it open
+            self.servo_controller.cleanup()
+            self.button_handler.stop()
+            self.watchdog.stop()
+            self.dht_sensor.stop()
+            self.uart_handler.stop()
+            self.led_controller.cleanup()
+            self.event_bus.close()
+            self.alert_engine.stop()
+            self.journal.stop()
+            self.irrigation_log.close()
+            self.history_store.close()
+        self.knowledge_base.close()
 
         print("=" * 70)
         print("[MAIN] System stopped successfully.")
@@ -263,13 +324,26 @@ def signal_handler(sig, frame):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Interactive Plant Talker System")
+    parser.add_argument('--fast-start', action='store_true',
+                        help="Run hardware self-tests in the background and skip the startup delay")
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR,
+                        help="Directory for persisted counters (default: %(default)s)")
+    parser.add_argument('--hardware-socket', metavar='PATH',
+                        help="Monitor through a running hardware daemon instead of driving the devices")
+    parser.add_argument('--alert-rules', metavar='PATH',
+                        help="JSON file overriding the alert rules (null disables a rule)")
+    args = parser.parse_args()
+
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    system = PlantTalkerSystemInteractive()
+    system = PlantTalkerSystemInteractive(fast_start=args.fast_start, state_dir=args.state_dir,
+                                          hardware_socket=args.hardware_socket, alert_rules=args.alert_rules)
 
-    print("\nStarting system in 3 seconds...")
-    time.sleep(3)
+    if not args.fast_start and not args.hardware_socket:
+        print("\nStarting system in 3 seconds...")
+        time.sleep(3)
 
     try:
         system.start()
@@ -0,0 +1,164 @@
+import time
+
+from benchmarks.sim import install_mock_pins
+from iot.libs.button_handler import ButtonHandler
+
+
+class FakeButton:
+    when_pressed = None
+    when_released = None
+    is_pressed = False
+
+
+class FailingJournal:
+    def get(self, key, default=None):
+        return default
+
+    def record(self, counters):
+        raise OSError("disk full")
+
+
+class FailingBus:
+    def publish(self, event_type, **fields):
+        raise RuntimeError("bus closed")
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def start_handler():
+    handler = ButtonHandler(button=FakeButton(), debounce=0.01, long_press=0.5, double_press_window=0.05)
+    handler.start()
+    return handler
+
+
+def bouncy_press(handler, hold=0.1):
+    """A press whose contacts chatter for a few ms on both edges"""
+    now = time.monotonic()
+    for offset, pressed in ((0, True), (0.001, False), (0.002, True),
+                            (hold, False), (hold + 0.001, True), (hold + 0.002, False)):
+        handler.edges.put((pressed, now + offset))
+
+
+def test_bounces_count_as_one_press():
+    handler = start_handler()
+    presses = []
+    handler.set_callback(lambda: presses.append(time.monotonic()))
+
+    bouncy_press(handler)
+
+    assert wait_for(lambda: presses)
+    time.sleep(0.1)
+    assert len(presses) == 1
+    assert handler.get_stats()['presses'] == 1
+    handler.stop()
+
+
+def record_gestures(handler):
+    gestures = []
+    for gesture in ('press', 'double_press', 'long_press'):
+        handler.set_callback(lambda gesture=gesture: gestures.append(gesture), gesture=gesture)
+    return gestures
+
+
+def queue_edges(handler, *pattern):
+    now = time.monotonic()
+    for offset, pressed in pattern:
+        handler.edges.put((pressed, now + offset))
+
+
+def test_two_quick_presses_are_a_double_press():
+    handler = start_handler()
+    gestures = record_gestures(handler)
+
+    queue_edges(handler, (0, True), (0.03, False), (0.06, True), (0.09, False))
+
+    assert wait_for(lambda: gestures)
+    time.sleep(0.1)
+    assert gestures == ['double_press']
+    handler.stop()
+
+
+def test_held_press_is_a_long_press():
+    handler = start_handler()
+    gestures = record_gestures(handler)
+
+    queue_edges(handler, (0, True), (0.6, False))
+
+    assert wait_for(lambda: gestures)
+    time.sleep(0.1)
+    assert gestures == ['long_press']
+    assert handler.get_stats()['presses'] == 1
+    handler.stop()
+
+
+def test_bouncy_mock_pin_gives_one_press():
+    from gpiozero import Device
+    install_mock_pins()
+    handler = ButtonHandler(21, debounce=0.01, long_press=0.5, double_press_window=0.05)
+    pin = Device.pin_factory.pin(21)
+    gestures = record_gestures(handler)
+    handler.start()
+
+    # The button pulls up, so a press drives the pin low; both edges chatter
+    for drive in (pin.drive_low, pin.drive_high, pin.drive_low, pin.drive_high, pin.drive_low):
+        drive()
+    time.sleep(0.05)
+    for drive in (pin.drive_high, pin.drive_low, pin.drive_high):
+        drive()
+
+    assert wait_for(lambda: gestures)
+    time.sleep(0.1)
+    assert gestures == ['press']
+    handler.stop()
+    handler.button.close()
+
+
+def test_failing_callback_does_not_stop_the_dispatcher():
+    handler = start_handler()
+    calls = []
+
+    def callback():
+        calls.append(1)
+        raise RuntimeError("valve jammed")
+
+    handler.set_callback(callback)
+    handler.inject_press()
+    assert wait_for(lambda: len(calls) == 1)
+    handler.inject_press()
+    assert wait_for(lambda: len(calls) == 2)
+    assert handler.thread.is_alive()
+    handler.stop()
+
+
+def test_failing_journal_and_bus_still_run_the_gesture():
+    handler = start_handler()
+    handler.set_journal(FailingJournal())
+    handler.set_event_bus(FailingBus())
+    calls = []
+    handler.set_callback(lambda: calls.append(1))
+
+    handler.inject_press()
+    assert wait_for(lambda: calls)
+    handler.inject_press()
+    assert wait_for(lambda: len(calls) == 2)
+    assert handler.get_stats()['presses'] == 2
+    handler.stop()
+
+
+def test_stop_returns_while_edges_are_pending():
+    handler = start_handler()
+    handler.set_callback(lambda: time.sleep(0.2))
+    for _ in range(5):
+        handler.inject_press(0.02)
+
+    started = time.monotonic()
+    handler.stop()
+    assert time.monotonic() - started < 2
+    assert not handler.thread.is_alive()
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from iot.libs.event_bus import EventBus, BLOCK, READING, STATUS_CHANGE
+
+
+def test_full_block_subscriber_does_not_stall_other_publishers():
+    bus = EventBus(block_timeout=1.0)
+    # Takes readings only and is never read, like a log stuck on a slow disk
+    bus.subscribe(types=[READING], maxsize=1, policy=BLOCK, name='stuck')
+    status = bus.subscribe(types=[STATUS_CHANGE], name='status')
+    bus.publish(READING, moisture=1)
+
+    blocked = threading.Thread(target=bus.publish, args=(READING,), kwargs={'moisture': 2})
+    blocked.start()
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    bus.publish(STATUS_CHANGE, mode='watering')
+    elapsed = time.monotonic() - started
+    blocked.join()
+
+    assert elapsed < 0.1
+    assert status.get_nowait().data == {'mode': 'watering'}
+
+
+def test_concurrent_publishers_keep_each_subscriber_in_seq_order():
+    bus = EventBus(block_timeout=5.0)
+    everything = bus.subscribe(maxsize=10000, name='everything')
+    received = []
+    slow = bus.subscribe_callback(lambda event: (received.append(event.seq), time.sleep(0.0005)),
+                                  types=[READING], maxsize=4, policy=BLOCK, name='slow')
+
+    def publish(event_type):
+        for n in range(200):
+            bus.publish(event_type, n=n)
+
+    publishers = [threading.Thread(target=publish, args=(event_type,))
+                  for event_type in (READING, READING, STATUS_CHANGE, STATUS_CHANGE)]
+    for publisher in publishers:
+        publisher.start()
+    for publisher in publishers:
+        publisher.join()
+
+    seqs = [event.seq for event in everything.drain()]
+    assert seqs == list(range(1, 801))
+    deadline = time.monotonic() + 5
+    while len(received) < 400 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert received == sorted(received) and len(received) == 400
+    assert slow.get_stats()['dropped'] == 0
+    bus.close()
@@ -0,0 +1,145 @@
+import threading
+import time
+
+from iot.libs.event_bus import BusEvent, IRRIGATION_FINISHED
+from iot.libs.hardware_ipc import (CachedCall, HardwareClient, HardwareError, RemoteIrrigationLog, RemoteScheduler,
+                                   RemoteServoController)
+
+
+class FakeClient:
+    """HardwareClient answering every command with `value`, or hanging or failing"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.error = None
+        self.release = threading.Event()
+        self.release.set()
+
+    def call(self, command, *args, **kwargs):
+        self.calls += 1
+        # The answer is taken when the call arrives, as the daemon would
+        value = self.value
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return value
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_stale_read_does_not_wait_for_a_hung_daemon():
+    client = FakeClient({'mode': 'idle'})
+    scheduler = RemoteScheduler(client)
+    scheduler.cached_stats.max_age = 0.0
+    client.release.clear()
+
+    start = time.monotonic()
+    assert scheduler.get_stats() == {'mode': 'idle'}
+    assert time.monotonic() - start < 0.5
+    client.release.set()
+
+
+def test_failed_refresh_keeps_last_value():
+    client = FakeClient(3)
+    cached = CachedCall(client, 'irrigation_log_version', max_age=0.0)
+    client.error = HardwareError("daemon unreachable")
+    calls = client.calls
+
+    assert cached.get() == 3
+    assert wait_for(lambda: client.calls > calls and not cached.refreshing)
+    assert cached.get() == 3
+
+
+def test_irrigation_finished_refreshes_log_version():
+    client = FakeClient(1)
+    log = RemoteIrrigationLog(client)
+    assert log.version == 1
+
+    client.value = 2
+    log.handle_event(BusEvent(1, IRRIGATION_FINISHED, {'job_id': 1, 'success': True}, 0.0))
+    assert wait_for(lambda: log.version == 2)
+
+
+def test_invalidate_during_refresh_fetches_again():
+    client = FakeClient(1)
+    cached = CachedCall(client, 'irrigation_log_version', max_age=60.0)
+    client.release.clear()
+    cached.invalidate()
+    # The refresh under way read the old value; the change after it must not be lost
+    client.value = 2
+    cached.invalidate()
+    client.release.set()
+    assert wait_for(lambda: cached.get() == 2)
+
+
+class StartingClient:
+    """Daemon whose job finishes before the start_irrigation reply arrives"""
+
+    def __init__(self):
+        self.on_start = None
+
+    def call(self, command, *args, **kwargs):
+        if command == 'get_profiles':
+            return {'profiles': {}, 'version': 0}
+        if self.on_start:
+            self.on_start()
+        return 7
+
+
+def test_completion_runs_when_the_job_finishes_before_the_reply():
+    client = StartingClient()
+    servo = RemoteServoController(client)
+    client.on_start = lambda: servo.handle_event(BusEvent(1, IRRIGATION_FINISHED, {'job_id': 7, 'success': True}, 0))
+    results = []
+
+    assert servo.start_irrigation('quick', on_complete=results.append) == 7
+
+    assert results == [True]
+    assert not servo.completions and not servo.finished
+
+
+def test_completion_runs_when_the_job_finishes_later():
+    servo = RemoteServoController(StartingClient())
+    results = []
+
+    servo.start_irrigation('quick', on_complete=results.append)
+    servo.handle_event(BusEvent(2, IRRIGATION_FINISHED, {'job_id': 7, 'success': False}, 0))
+
+    assert results == [False]
+    assert not servo.completions
+
+
+def test_reader_survives_a_failed_reconnect_handshake():
+    client = HardwareClient('/nonexistent.sock', reconnect_interval=0.01)
+    attempts = iter([ValueError("bad WELCOME"), HardwareError("garbled frame"), None])
+    frames = iter([OSError("daemon restarted")])
+
+    def read_frames():
+        error = next(frames, None)
+        if error:
+            raise error
+        client.close_event.wait()
+
+    def open_connection():
+        error = next(attempts)
+        if error:
+            raise error
+        client.connected.set()
+
+    client._read_frames = read_frames
+    client._open = open_connection
+    client.thread = threading.Thread(target=client._read_loop, daemon=True)
+    client.thread.start()
+
+    assert wait_for(lambda: client.reconnects == 1)
+    assert client.thread.is_alive() and client.connected.is_set()
+    client.close()
+    assert not client.thread.is_alive()
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from iot.libs.health_monitor import HealthMonitor
+
+TICK = 0.02
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_hung_probe_does_not_hold_up_critical_probes():
+    release = threading.Event()
+
+    def hung_llm():
+        release.wait(5)
+        return True, {}
+
+    monitor = HealthMonitor(tick=TICK)
+    monitor.add_probe('llm', hung_llm, interval=0.1, critical=False)
+    monitor.add_probe('soil_moisture', lambda: (True, {}), interval=0.1)
+    monitor.start()
+    try:
+        assert wait_for(lambda: monitor.get_report()['checks']['llm']['status'] == 'fail')
+        report = monitor.get_report()
+        assert report['ready']
+        assert 'timed out' in report['checks']['llm']['reason']
+        # Still answering after several of its intervals
+        checked_at = report['checks']['soil_moisture']['checked_at']
+        assert wait_for(lambda: monitor.get_report()['checks']['soil_moisture']['checked_at'] > checked_at)
+    finally:
+        release.set()
+        monitor.stop()
+
+
+def test_failing_probe_backs_off():
+    calls = []
+
+    def failing():
+        calls.append(time.monotonic())
+        raise ConnectionError("model server unreachable")
+
+    monitor = HealthMonitor(tick=TICK)
+    monitor.add_probe('llm', failing, interval=10, critical=False)
+    monitor.start()
+    time.sleep(TICK * 30)
+    monitor.stop()
+
+    # Retried after 1, 2, 4, 8, 16 ticks, not on each of the 30
+    assert 3 <= len(calls) <= 7
+    gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+    assert gaps[-1] > gaps[0] * 3
+    assert monitor.get_report()['checks']['llm']['error'] == "model server unreachable"
@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+
+import pytest
+
+from benchmarks.sim import VirtualServo
+from iot.libs.servo_controller import (DEFAULT_CALIBRATION, ServoController, VALVE_CLOSED, build_waveform,
+                                       load_profiles)
+
+
+def test_volume_is_converted_with_the_flow_rate():
+    steps = build_waveform({'volume_ml': 50, 'opening': 0.5, 'prepare': 0.2, 'close_hold': 0.3})
+    open_time = 50 / (DEFAULT_CALIBRATION['flow_ml_per_s'] * 0.5)
+    assert steps == [(VALVE_CLOSED, 0.2), (0.0, pytest.approx(open_time)), (VALVE_CLOSED, 0.3), (None, 0.0)]
+
+
+def test_pulses_are_separated_by_soak():
+    steps = build_waveform({'duration': 3.0, 'pulses': 3, 'soak': 10.0})
+    assert [hold for value, hold in steps if value == 1.0] == [1.0, 1.0, 1.0]
+    assert [step for step in steps[1:-2] if step[0] == VALVE_CLOSED] == [(VALVE_CLOSED, 10.0)] * 2
+
+
+@pytest.mark.parametrize('profile', [{'duration': 1, 'opening': 1.5}, {'opening': 0.5},
+                                     {'duration': DEFAULT_CALIBRATION['max_open_time'] + 1}])
+def test_invalid_profiles_are_rejected(profile):
+    with pytest.raises(ValueError):
+        build_waveform(profile)
+
+
+def test_profiles_file_overrides_the_defaults(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps({'calibration': {'flow_ml_per_s': 10.0},
+                                'profiles': {'seedlings': {'volume_ml': 20}}}))
+    profiles, calibration = load_profiles(str(path))
+
+    assert {'standard', 'pulsed', 'seedlings'} <= set(profiles)
+    assert calibration['flow_ml_per_s'] == 10.0
+    assert build_waveform(profiles['seedlings'], calibration)[1][1] == pytest.approx(2.0)
+
+
+@pytest.fixture
+def servo_controller(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps({'profiles': {'long': {'duration': 5.0, 'prepare': 0.01, 'close_hold': 0.01}}}))
+    controller = ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(path))
+    yield controller
+    controller.cleanup()
+
+
+def test_start_irrigation_returns_while_the_valve_is_open(servo_controller):
+    results = []
+    done = threading.Event()
+
+    def on_complete(success):
+        results.append(success)
+        done.set()
+
+    started = time.monotonic()
+    job_id = servo_controller.start_irrigation('long', source='test', on_complete=on_complete)
+    assert job_id is not None
+    assert time.monotonic() - started < 0.5
+    assert servo_controller.get_state()['irrigation_profile'] == 'long'
+    # The servo is busy until the cycle ends
+    assert servo_controller.start_irrigation('long', source='test') is None
+
+    assert servo_controller.cancel(emergency=True)
+    assert done.wait(2)
+    assert results == [False]
+    positions = [value for _, value in servo_controller.servo.commands if value is not None]
+    assert positions[-1] == VALVE_CLOSED
+    assert servo_controller.irrigation_count == 0
@@ -0,0 +1,127 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from benchmarks.sim import VirtualServo
+from iot.libs.event_bus import EventBus, CONFIG_RELOADED, IRRIGATION_STARTED
+from iot.libs.local_hardware import LocalHardware
+from iot.libs.servo_controller import ServoController
+
+
+class FakeDevice:
+    """Stands in for the DHT sensor, UART handler, LEDs and button"""
+
+    def __init__(self, soil_moisture=40):
+        self.soil_moisture = soil_moisture
+        self.callbacks = {}
+        self.leds = []
+
+    def set_event_bus(self, event_bus):
+        pass
+
+    def set_journal(self, journal):
+        pass
+
+    def set_read_interval(self, interval):
+        pass
+
+    def set_callback(self, callback, gesture='press'):
+        self.callbacks[gesture] = callback
+
+    def wait_for_data(self, timeout=None):
+        return True
+
+    def get_soil_moisture(self):
+        return self.soil_moisture
+
+    def update_leds(self, soil_moisture):
+        self.leds.append(soil_moisture)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def build(tmp_path, profiles=None):
+    profiles_path = tmp_path / 'profiles.json'
+    profiles_path.write_text(json.dumps(profiles or {'profiles': {'deep': {'duration': 0.05}}}))
+    bus = EventBus()
+    servo = ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(profiles_path))
+    device = FakeDevice()
+    hardware = LocalHardware(bus, device, device, device, device, servo, state_dir=str(tmp_path))
+    return hardware, device, profiles_path
+
+
+def test_every_button_gesture_is_wired(tmp_path):
+    hardware, button, _ = build(tmp_path)
+    started = hardware.event_bus.subscribe(types=[IRRIGATION_STARTED])
+    assert sorted(button.callbacks) == ['double_press', 'long_press', 'press']
+
+    button.callbacks['double_press']()
+    assert started.get(timeout=1).data['profile'] == 'deep'
+    button.callbacks['long_press']()
+    assert wait_for(lambda: not hardware.servo_controller.get_state()['irrigating'])
+    hardware.event_bus.close()
+
+
+def test_reload_reports_errors_by_file_and_publishes(tmp_path):
+    hardware, _, profiles_path = build(tmp_path)
+    reloads = hardware.event_bus.subscribe(types=[CONFIG_RELOADED])
+    profiles_path.write_text('{not json')
+
+    errors = hardware.reload()
+
+    assert list(errors) == ['irrigation_profiles']
+    event = reloads.get(timeout=1)
+    assert event.data['errors'] == errors
+    assert event.data['profiles_version'] == hardware.servo_controller.profiles_version
+    hardware.event_bus.close()
+
+
+def test_daemon_never_writes_an_older_snapshot_over_a_newer_one():
+    # The daemon imports its libs as a script would
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'iot'))
+    from iot.hardware_daemon import HardwareDaemon
+
+    class SlowState:
+        """Takes a numbered snapshot; the first caller is the slowest to return it"""
+
+        def __init__(self):
+            self.version = 0
+            self.lock = threading.Lock()
+
+        def take_snapshot(self):
+            with self.lock:
+                self.version += 1
+                version = self.version
+            time.sleep(0.05 if version == 1 else 0)
+            return {'version': version}
+
+    class Segment:
+        def __init__(self):
+            self.versions = []
+
+        def write(self, snapshot):
+            self.versions.append(snapshot['version'])
+
+    daemon = HardwareDaemon.__new__(HardwareDaemon)
+    daemon.system_state = SlowState()
+    daemon.state_segment = Segment()
+    daemon.state_lock = threading.Lock()
+
+    threads = [threading.Thread(target=daemon._publish_state) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+
+    assert daemon.state_segment.versions == sorted(daemon.state_segment.versions)
+    assert daemon.state_segment.versions[-1] == 4
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from benchmarks.sim import VirtualServo
+from iot.libs.event_bus import BusEvent, CONFIG_RELOADED, IRRIGATION_FINISHED
+from iot.libs.hardware_ipc import HardwareError, RemoteServoController
+from iot.libs.servo_controller import ServoController
+
+
+class FakeClient:
+    """HardwareClient serving get_profiles from a dict the test changes"""
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.down = False
+
+    def call(self, command, *args, **kwargs):
+        assert command == 'get_profiles'
+        if self.down:
+            raise HardwareError("daemon unreachable")
+        return dict(self.profiles)
+
+
+@pytest.fixture
+def profiles_path(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps({'profiles': {'tiny': {'duration': 0.5}}}))
+    return path
+
+
+def test_reload_bumps_profiles_version(profiles_path):
+    controller = ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(profiles_path))
+    assert controller.get_profiles()['version'] == 0
+
+    profiles_path.write_text(json.dumps({'profiles': {'tiny': {'duration': 0.5}, 'huge': {'duration': 30}}}))
+    controller.reload_profiles()
+
+    assert 'huge' in controller.profiles
+    assert controller.get_profiles()['version'] == 1
+    controller.cleanup()
+
+
+def test_reload_with_bad_file_keeps_profiles(profiles_path):
+    controller = ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(profiles_path))
+    profiles_path.write_text(json.dumps({'profiles': {'broken': {'opening': 3}}}))
+
+    with pytest.raises(ValueError):
+        controller.reload_profiles()
+
+    assert 'tiny' in controller.profiles and 'broken' not in controller.profiles
+    assert controller.profiles_version == 0
+    controller.cleanup()
+
+
+@pytest.mark.parametrize('hold', ['prepare', 'soak', 'close_hold'])
+def test_negative_holds_are_rejected(profiles_path, hold):
+    controller = ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(profiles_path))
+    profiles_path.write_text(json.dumps({'profiles': {'backwards': {'duration': 1, 'pulses': 2, hold: -5}}}))
+
+    with pytest.raises(ValueError, match=hold):
+        controller.reload_profiles()
+    with pytest.raises(ValueError, match=hold):
+        ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(profiles_path))
+
+    assert 'backwards' not in controller.profiles
+    controller.cleanup()
+
+
+def test_remote_servo_refreshes_profiles_on_config_reloaded():
+    client = FakeClient({'profiles': {'standard': {}}, 'calibration': {}, 'version': 0})
+    servo = RemoteServoController(client)
+    assert set(servo.profiles) == {'standard'}
+
+    client.profiles = {'profiles': {'light': {}}, 'calibration': {}, 'version': 1}
+    servo.handle_event(BusEvent(1, CONFIG_RELOADED, {'profiles_version': 1}, 0.0))
+
+    # Removed profiles are rejected and added ones accepted from now on
+    assert set(servo.profiles) == {'light'}
+    assert servo.profiles_version == 1
+
+
+def test_remote_servo_keeps_profiles_when_daemon_unreachable():
+    client = FakeClient({'profiles': {'standard': {}}, 'calibration': {}, 'version': 0})
+    servo = RemoteServoController(client)
+    client.down = True
+
+    servo.handle_event(BusEvent(1, CONFIG_RELOADED, {'profiles_version': 1}, 0.0))
+    assert set(servo.profiles) == {'standard'}
+
+    # Completions are still delivered
+    results = []
+    servo.completions[7] = results.append
+    servo.handle_event(BusEvent(2, IRRIGATION_FINISHED, {'job_id': 7, 'success': True}, 0.0))
+    assert results == [True]
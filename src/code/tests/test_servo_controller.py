@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+
+import pytest
+
+from benchmarks.sim import VirtualServo
+from iot.libs.event_bus import EventBus, IRRIGATION_FINISHED, IRRIGATION_STARTED
+from iot.libs.servo_controller import ServoController, VALVE_CLOSED
+
+
+class FailingJournal:
+    """StateJournal after stop(): every record raises"""
+
+    def get(self, key, default=None):
+        return default
+
+    def record(self, updates):
+        raise RuntimeError("journal is closed")
+
+
+@pytest.fixture
+def servo_controller(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps({'profiles': {'quick': {'duration': 0.01, 'prepare': 0.01, 'close_hold': 0.01}}}))
+    controller = ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(path))
+    yield controller
+    controller.cleanup()
+
+
+def irrigate_in_thread(controller, timeout=5.0):
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(result=controller.irrigate('quick', source='test')),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "irrigate() did not return"
+    return outcome['result']
+
+
+class RecordingLog:
+    def __init__(self):
+        self.cycles = []
+
+    def record_irrigation(self, source, started_at, duration, success, pre_moisture):
+        self.cycles.append(success)
+
+
+def test_journal_failure_does_not_fail_the_cycle(servo_controller):
+    bus = EventBus()
+    finished = bus.subscribe(types=(IRRIGATION_FINISHED,), name='test')
+    log = RecordingLog()
+    servo_controller.set_event_bus(bus)
+    servo_controller.set_journal(FailingJournal())
+    servo_controller.set_event_log(log)
+
+    assert irrigate_in_thread(servo_controller) is True
+
+    event = finished.get(timeout=1)
+    assert event is not None and event.data['success'] is True
+    assert servo_controller.irrigation_count == 1
+    assert log.cycles == [True]
+    assert servo_controller.get_state()['irrigating'] is False
+    # The motion lock was released, so the next cycle can start
+    assert servo_controller.motion_lock.acquire(blocking=False)
+    servo_controller.motion_lock.release()
+    bus.close()
+
+
+def test_on_complete_called_when_moisture_provider_raises(servo_controller):
+    def failing_provider():
+        raise OSError("serial port gone")
+    servo_controller.set_event_log(None, failing_provider)
+    results = []
+    done = threading.Event()
+
+    def on_complete(success):
+        results.append(success)
+        done.set()
+
+    assert servo_controller.start_irrigation('quick', source='test', on_complete=on_complete) is not None
+    assert done.wait(5)
+    assert results == [False]
+
+
+def test_successful_cycle_ends_closed(servo_controller):
+    assert irrigate_in_thread(servo_controller) is True
+    positions = [value for _, value in servo_controller.servo.commands if value is not None]
+    assert positions[-1] == VALVE_CLOSED
+    assert servo_controller.irrigation_count == 1
+
+
+class SlowFinishBus(EventBus):
+    """Bus that takes a while to publish irrigation_finished"""
+
+    def publish(self, event_type, data=None, **fields):
+        if event_type == IRRIGATION_FINISHED:
+            time.sleep(0.05)
+        return super().publish(event_type, data, **fields)
+
+
+def test_next_job_starts_after_the_previous_one_finished(servo_controller):
+    bus = SlowFinishBus()
+    events = bus.subscribe(types=(IRRIGATION_STARTED, IRRIGATION_FINISHED), name='test')
+    servo_controller.set_event_bus(bus)
+
+    first = servo_controller.start_irrigation('quick', source='test')
+    deadline = time.monotonic() + 5
+    second = None
+    while second is None and time.monotonic() < deadline:
+        second = servo_controller.start_irrigation('quick', source='test')
+    assert second is not None
+
+    order = [(event.type, event.data['job_id']) for event in iter(lambda: events.get(timeout=1), None)]
+    assert order[:3] == [(IRRIGATION_STARTED, first), (IRRIGATION_FINISHED, first), (IRRIGATION_STARTED, second)]
+    bus.close()
@@ -0,0 +1,53 @@
+import json
+import time
+
+from benchmarks.sim import SimulatedDHTDevice, SimulatedSerial, VirtualServo
+from iot.libs.alerts import AlertEngine
+from iot.libs.dht_sensor import DHTSensor
+from iot.libs.servo_controller import ServoController, VALVE_CLOSED
+from iot.libs.uart_handler import UARTHandler
+
+
+def test_cleanup_mid_irrigation_closes_the_valve_quickly(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps({'calibration': {'close_settle': 0.05},
+                                'profiles': {'long': {'duration': 5.0, 'prepare': 0.01}}}))
+    controller = ServoController(self_test=False, servo=VirtualServo(), profiles_path=str(path))
+    assert controller.start_irrigation('long', source='test') is not None
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    controller.cleanup()
+    assert time.monotonic() - started < 0.2
+
+    positions = [value for _, value in controller.servo.commands]
+    assert positions[-1] is None
+    assert [value for value in positions if value is not None][-1] == VALVE_CLOSED
+    assert controller.start_irrigation('long', source='test') is None
+
+
+def test_sensor_loops_stop_without_waiting_out_their_interval():
+    uart = UARTHandler(read_interval=10, serial_port=SimulatedSerial())
+    dht = DHTSensor(read_interval=10, dht_device=SimulatedDHTDevice())
+    uart.start()
+    dht.start()
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    uart.stop()
+    dht.stop()
+    assert time.monotonic() - started < 0.2
+
+
+def test_reloaded_rules_keep_alerts_of_kept_rules():
+    dry = {'type': 'threshold', 'field': 'soil_moisture', 'below': 35}
+    hot = {'type': 'threshold', 'field': 'temperature_c', 'above': 32}
+    engine = AlertEngine({'dry': dry})
+    engine.observe('default', {'soil_moisture': 20})
+    assert [alert['rule'] for alert in engine.get_alerts()] == ['dry']
+
+    engine.set_rules({'dry': dry, 'hot': hot})
+    assert [alert['rule'] for alert in engine.get_alerts()] == ['dry']
+
+    engine.set_rules({'hot': hot})
+    assert engine.get_alerts() == []
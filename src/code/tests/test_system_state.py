@@ -0,0 +1,49 @@
+import threading
+import time
+
+from iot.libs.system_state import SystemState
+
+
+class RacingState(SystemState):
+    """Each read returns newer state; the first read is the slowest"""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.reads_lock = threading.Lock()
+
+    def get_full_state(self):
+        with self.reads_lock:
+            self.reads += 1
+            reading = self.reads
+        time.sleep(0.05 if reading == 1 else 0)
+        return {'soil_moisture': reading}
+
+
+def test_versions_never_go_back_in_content():
+    state = RacingState()
+    snapshots = []
+
+    def take():
+        snapshots.append(state.take_snapshot())
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+
+    readings = [snapshot['state']['soil_moisture'] for snapshot in sorted(snapshots, key=lambda s: s['version'])]
+    assert readings == sorted(readings)
+    assert state.snapshot['state']['soil_moisture'] == 4
+
+
+def test_unchanged_state_keeps_its_version():
+    state = SystemState()
+    state.get_full_state = lambda: {'soil_moisture': 40, 'dht_age': time.time()}
+
+    first = state.take_snapshot()
+    second = state.take_snapshot()
+
+    assert second['version'] == first['version'] == 1
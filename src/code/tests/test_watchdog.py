@@ -0,0 +1,173 @@
+import time
+
+from benchmarks.sim import SimulatedDHTDevice, SimulatedSerial
+from iot.libs.dht_sensor import DHTSensor
+from iot.libs.uart_handler import UARTHandler
+from iot.libs.watchdog import Watchdog, watch_dht, watch_uart
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_dead_worker_is_recovered_and_counted():
+    watchdog = Watchdog(backoff_base=0.05)
+    alive = [False]
+    reasons = []
+
+    def recover(reason):
+        reasons.append(reason)
+        alive[0] = True
+
+    watchdog.watch('worker', recover, alive=lambda: alive[0])
+    watchdog.check()
+    assert reasons == ['thread died']
+    assert watchdog.get_stats()['worker']['status'] == 'failing'
+
+    watchdog.check()
+    stats = watchdog.get_stats()['worker']
+    assert stats['status'] == 'ok' and stats['recoveries'] == 1
+
+
+def test_recovery_backs_off_while_failing_and_starts_over_once_healthy():
+    watchdog = Watchdog(backoff_base=0.05, backoff_max=0.2)
+    failing = [True]
+    attempts = []
+    watchdog.watch('worker', lambda reason: attempts.append(time.monotonic()),
+                   check=lambda: 'no data' if failing[0] else None)
+
+    deadline = time.monotonic() + 0.5
+    while time.monotonic() < deadline:
+        watchdog.check()
+        time.sleep(0.005)
+
+    gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    assert 3 <= len(attempts) <= 6
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1
+    assert max(gaps) < 0.3
+
+    failing[0] = False
+    watchdog.check()
+    failing[0] = True
+    count = len(attempts)
+    watchdog.check()
+    assert len(attempts) == count + 1
+
+
+def test_failing_check_or_recover_does_not_stop_other_workers():
+    watchdog = Watchdog(backoff_base=0.05)
+    recovered = []
+
+    def broken_check():
+        raise RuntimeError("sensor object gone")
+
+    def broken_recover(reason):
+        raise OSError("no such device")
+
+    watchdog.watch('broken-check', lambda reason: recovered.append(reason), check=broken_check)
+    watchdog.watch('broken-recover', broken_recover, check=lambda: 'no data')
+    watchdog.watch('dead', lambda reason: recovered.append(reason), alive=lambda: False)
+
+    watchdog.check()
+
+    assert recovered == ['check failed: sensor object gone', 'thread died']
+    stats = watchdog.get_stats()
+    assert stats['broken-recover']['recovery_errors'] == 1
+    assert stats['broken-recover']['recoveries'] == 1
+
+
+def start_uart(serial_port):
+    uart = UARTHandler(read_interval=0.01, serial_port=serial_port)
+    uart.start()
+    assert wait_for(lambda: uart.get_soil_moisture() is not None)
+    return uart
+
+
+def test_disconnected_serial_port_is_reopened():
+    serial_port = SimulatedSerial(line_interval=0.01)
+    uart = start_uart(serial_port)
+    watchdog = Watchdog(backoff_base=0.05)
+    watch_uart(watchdog, uart, max_errors=3)
+
+    serial_port.fault = 'disconnected'
+    assert wait_for(lambda: uart.consecutive_errors >= 3)
+    watchdog.check()
+
+    updated = uart.get_data()['last_update_time']
+    assert wait_for(lambda: uart.get_data()['last_update_time'] != updated)
+    assert watchdog.get_stats()['uart']['recoveries'] == 1
+    uart.stop()
+
+
+def test_hung_read_loop_is_restarted():
+    serial_port = SimulatedSerial(line_interval=0.01)
+    uart = start_uart(serial_port)
+    watchdog = Watchdog(backoff_base=0.05)
+    watch_uart(watchdog, uart, stall_grace=0.1)
+    stalled_thread = uart.thread
+
+    serial_port.fault = 'hang'
+    time.sleep(0.2)
+    watchdog.check()
+
+    assert watchdog.get_stats()['uart']['reason'].startswith('loop stalled')
+    updated = uart.get_data()['last_update_time']
+    assert wait_for(lambda: uart.get_data()['last_update_time'] != updated)
+    assert uart.thread is not stalled_thread
+    assert wait_for(lambda: not stalled_thread.is_alive())
+    uart.stop()
+
+
+class UnpluggedSerial(SimulatedSerial):
+    """Port whose device is gone: opening it fails until it is plugged back"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.unplugged = False
+
+    def open(self):
+        if self.unplugged:
+            raise OSError(2, "No such file or directory")
+        super().open()
+
+
+def test_hung_loop_is_restarted_while_the_port_is_gone():
+    serial_port = UnpluggedSerial(line_interval=0.01)
+    uart = start_uart(serial_port)
+    watchdog = Watchdog(backoff_base=0.05)
+    watch_uart(watchdog, uart, stall_grace=0.1)
+    stalled_thread = uart.thread
+
+    serial_port.fault = 'hang'
+    serial_port.unplugged = True
+    time.sleep(0.2)
+    watchdog.check()
+
+    assert watchdog.get_stats()['uart']['recovery_errors'] == 1
+    assert uart.thread is not stalled_thread and uart.is_alive()
+    updated = uart.get_data()['last_update_time']
+    serial_port.unplugged = False
+    assert wait_for(lambda: uart.get_data()['last_update_time'] != updated)
+    uart.stop()
+
+
+def test_failing_dht_sensor_is_reinitialized():
+    device = SimulatedDHTDevice()
+    device.fault = 'failing'
+    dht = DHTSensor(read_interval=10, dht_device=device)
+    dht.start()
+    watchdog = Watchdog(backoff_base=0.05)
+    watch_dht(watchdog, dht, max_failures=1)
+
+    assert wait_for(lambda: dht.get_stats()['consecutive_failures'] >= 1)
+    watchdog.check()
+
+    assert device.fault is None
+    assert dht.get_stats()['consecutive_failures'] == 0
+    assert watchdog.get_stats()['dht']['recoveries'] == 1
+    dht.stop()